@@ -0,0 +1,241 @@
+# app/admission.py - rate limits, concurrency limits and load shedding in front of the routes
+#
+# Runs before a request gets a threadpool thread or a database connection, in
+# this order:
+#   1. /health and /health/* pass straight through: never limited, queued or shed.
+#   2. Rate limits (RATE_LIMITS), keyed by user id from the bearer token, or by
+#      client IP when there is none: 429 with Retry-After. Counters live in
+#      RATE_LIMIT_STORAGE_URL: memory:// per worker, redis://... shared. The
+#      asyncio storage is used, so a Redis round trip never blocks the loop.
+#   3. Concurrency limits per route (ADMISSION_ROUTE_LIMITS), then for the
+#      whole worker (ADMISSION_MAX_CONCURRENCY, kept below the threadpool size
+#      so health checks always find a thread). Waiting requests are admitted
+#      by priority: reads before writes, writes before the expensive routes
+#      that have their own limit.
+#   4. Shedding: a request whose expected wait exceeds ADMISSION_MAX_QUEUE_MS
+#      (queued ahead of it x recent service time), or that has waited that long,
+#      gets 503 with Retry-After instead of a response that arrives too late.
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from limits import parse_many
+from limits.aio.strategies import STRATEGIES
+from limits.storage import storage_from_string
+from starlette.datastructures import Headers
+
+from .config import Settings, get_settings
+from .utils import verify_token
+
+CRITICAL_PATHS = ("/health",)
+
+# admission priority: lower is admitted first
+HIGH, NORMAL, LOW = 0, 1, 2
+
+
+def _parse_rules(spec: str) -> List[Tuple[str, str, str]]:
+    """'POST /auth/login=10/minute, GET /payments/*=4' -> [(method, path, value)]; * for any method or path."""
+    rules = []
+    for part in spec.split(","):
+        target, sep, value = part.strip().partition("=")
+        if not sep:
+            continue
+        method, _, path = target.strip().partition(" ")
+        rules.append((method.upper(), path.strip() or "*", value.strip()))
+    return rules
+
+
+def _rate_storage(url: str):
+    """limits' asyncio storage for a storage URL written as for the sync one (memory://, redis://...)."""
+    if not url.startswith("async+"):
+        url = "async+" + url
+    # redis-py's asyncio client, the library app/cache.py already uses, rather than coredis
+    options = {"implementation": "redispy"} if url.startswith("async+redis") else {}
+    return storage_from_string(url, **options)
+
+
+def _match(rules, method: str, path: str) -> Optional[Tuple[str, str]]:
+    """The first rule for this request: (rule name, value)."""
+    for rule_method, rule_path, value in rules:
+        if rule_method not in ("*", method):
+            continue
+        if rule_path == "*" or rule_path == path or (rule_path.endswith("*") and path.startswith(rule_path[:-1])):
+            return f"{rule_method} {rule_path}", value
+    return None
+
+
+class Gate:
+    """
+    At most `limit` requests inside; the rest wait in a priority queue
+    (FIFO within a priority). Tracks an average service time so a newcomer's
+    wait can be estimated before it joins the queue.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.service_ms = 10.0  # moving average
+        self.admitted = 0
+        self.shed = 0
+
+    def expected_wait_ms(self) -> float:
+        if self.active < self.limit and not self.waiters:
+            return 0.0
+        return (len(self.waiters) + 1) * self.service_ms / self.limit
+
+    async def acquire(self, priority: int, max_wait_ms: float) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if self.expected_wait_ms() > max_wait_ms:
+            self.shed += 1
+            return False
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self.order), future)
+        heapq.heappush(self.waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            if future.done():  # admitted just as the wait ran out
+                return True
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(0)
+            else:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            raise
+        return True
+
+    def release(self, service_ms: float):
+        self.service_ms += (service_ms - self.service_ms) * 0.1
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.admitted += 1
+                future.set_result(True)  # the slot passes straight to the waiter
+                return
+        self.active -= 1
+
+    def metrics(self) -> Dict:
+        return {"limit": self.limit, "active": self.active, "queued": len(self.waiters),
+                "service_ms": round(self.service_ms, 1), "admitted": self.admitted, "shed": self.shed}
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        self.app = app
+        self.max_queue_ms = settings.admission_max_queue_ms
+        self.rate_rules = [(m, p, parse_many(v)) for m, p, v in _parse_rules(settings.rate_limits)]
+        self.rate_limiter = STRATEGIES[settings.rate_limit_strategy](_rate_storage(settings.rate_limit_storage_url))
+        self.route_rules = [(m, p, int(v)) for m, p, v in _parse_rules(settings.admission_route_limits)]
+        self.route_gates: Dict[str, Gate] = {}
+        self.worker_gate = Gate("worker", settings.admission_max_concurrency)
+        self.rate_limited = 0
+        _middlewares.append(self)
+
+    @staticmethod
+    def client_key(scope) -> str:
+        authorization = Headers(scope=scope).get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            payload = verify_token(authorization[7:].strip())
+            if payload and payload.get("user_id") is not None:
+                return f"user:{payload['user_id']}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def check_rate(self, scope, method: str, path: str) -> Optional[float]:
+        """None if allowed, else seconds until the client may retry."""
+        matched = _match(self.rate_rules, method, path)
+        if matched is None:
+            return None
+        rule, items = matched
+        key = self.client_key(scope)
+        for item in items:
+            if not await self.rate_limiter.hit(item, rule, key):
+                reset_time = (await self.rate_limiter.get_window_stats(item, rule, key)).reset_time
+                return max(1.0, reset_time - time.time())
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(CRITICAL_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        retry_after = await self.check_rate(scope, method, path)
+        if retry_after is not None:
+            self.rate_limited += 1
+            await _reject(send, 429, "Rate limit exceeded", retry_after)
+            return
+
+        gates = []
+        route = _match(self.route_rules, method, path)
+        if route is not None:
+            name, limit = route
+            gate = self.route_gates.get(name)
+            if gate is None:
+                gate = self.route_gates[name] = Gate(name, limit)
+            gates.append(gate)
+            priority = LOW
+        else:
+            priority = HIGH if method in ("GET", "HEAD") else NORMAL
+        gates.append(self.worker_gate)
+
+        admitted = []
+        started = time.perf_counter()
+        try:
+            for gate in gates:
+                waited_ms = (time.perf_counter() - started) * 1000
+                if not await gate.acquire(priority, self.max_queue_ms - waited_ms):
+                    retry = max(1.0, gate.expected_wait_ms() / 1000)
+                    await _reject(send, 503, "Server busy, retry later", retry)
+                    return
+                admitted.append(gate)
+            service_started = time.perf_counter()
+            await self.app(scope, receive, send)
+        finally:
+            service_ms = (time.perf_counter() - service_started) * 1000 if len(admitted) == len(gates) else 0.0
+            for gate in admitted:
+                gate.release(service_ms)
+
+    def metrics(self) -> Dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "gates": {gate.name: gate.metrics() for gate in [self.worker_gate, *self.route_gates.values()]},
+        }
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+_middlewares: List[AdmissionMiddleware] = []
+
+
+def admission_metrics() -> Dict:
+    """This worker's gates and counters (each uvicorn worker admits on its own)."""
+    return _middlewares[-1].metrics() if _middlewares else {}
@@ -0,0 +1,199 @@
+# app/analytics.py - occupancy and revenue computed over columnar NumPy arrays
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import String, cast, func, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+
+CHUNK_ROWS = 100_000
+AVG_MONTH_DAYS = 365.2425 / 12
+
+
+def stream_columns(db: Session, stmt, dtypes: Sequence[str]) -> List[np.ndarray]:
+    """Run `stmt` as one streaming query and return one array per selected column."""
+    chunks: List[List[np.ndarray]] = [[] for _ in dtypes]
+    result = db.execute(stmt.execution_options(yield_per=CHUNK_ROWS))
+    for rows in result.partitions():
+        for i, column in enumerate(zip(*rows)):
+            chunks[i].append(np.array(column, dtype=dtypes[i]))
+    return [np.concatenate(parts) if parts else np.empty(0, dtype=dtype) for parts, dtype in zip(chunks, dtypes)]
+
+
+def _iso(db: Session, column):
+    # Dates come back as 'YYYY-MM-DD' text that NumPy parses in C, instead of one date object per row
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM-DD")
+    return cast(column, String)
+
+
+def _days(values) -> np.ndarray:
+    return np.asarray(values, dtype="datetime64[D]").astype(np.int64)
+
+
+def covered_days(groups: np.ndarray, starts: np.ndarray, ends: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Days covered by the union of the half-open intervals [start, end) of each group.
+
+    Rows are sorted by (group, start); each interval then only counts the part
+    past the running maximum end of the intervals before it. The running max is
+    one np.maximum.accumulate over ends shifted by group * span, which keeps
+    every group on its own range so a max never leaks into the next group.
+    """
+    if not len(groups):
+        return np.zeros(n_groups, dtype=np.int64)
+    base = starts.min()
+    starts, ends = starts - base, ends - base
+    span = int(ends.max()) + 1
+    # a single int64 sort key (group, start) is much cheaper than np.lexsort
+    shift = groups.astype(np.int64) * span
+    order = np.argsort(shift + starts)
+    groups, starts, ends, shift = groups[order], starts[order], ends[order], shift[order]
+    running = np.maximum.accumulate(ends + shift)
+    previous_end = np.empty_like(running)
+    previous_end[0] = -1
+    previous_end[1:] = running[:-1] - shift[1:]  # negative when the previous row is another group
+    covered = np.clip(ends - np.maximum(starts, previous_end), 0, None)
+    return np.bincount(groups, weights=covered, minlength=n_groups).astype(np.int64)
+
+
+def _apartments(db: Session, landlord_id: Optional[int]):
+    stmt = select(models.Apartment.id, models.Apartment.name, models.Apartment.rent_price).order_by(models.Apartment.id)
+    if landlord_id is not None:
+        stmt = stmt.where(models.Apartment.landlord_id == landlord_id)
+    # sorted again here: fanned out over shards, ORDER BY only holds within each shard's rows
+    return sorted(db.execute(stmt).all())
+
+
+def _rental_intervals(db: Session, landlord_id: Optional[int], start: date, end: date):
+    # live and archived rentals both count towards history; cancelled ones never occupied anything
+    selects = []
+    for model in (models.Rental, models.ArchivedRental):
+        stmt = (
+            select(model.apartment_id, _iso(db, model.start_date), _iso(db, model.end_date))
+            .where(
+                model.status != models.RentalStatus.cancelled,
+                model.start_date.is_not(None),
+                model.start_date <= end,
+                (model.end_date.is_(None)) | (model.end_date >= start),
+            )
+        )
+        if landlord_id is not None:
+            stmt = stmt.join(models.Apartment, models.Apartment.id == model.apartment_id)\
+                .where(models.Apartment.landlord_id == landlord_id)
+        selects.append(stmt)
+    return stream_columns(db, union_all(*selects), ["int64", "datetime64[D]", "datetime64[D]"])
+
+
+def _payments(db: Session, landlord_id: Optional[int], start: date, end: date):
+    selects = []
+    for rental, payment in ((models.Rental, models.Payment), (models.ArchivedRental, models.ArchivedPayment)):
+        stmt = (
+            select(rental.apartment_id, _iso(db, payment.payment_date), payment.amount)
+            .join(rental, rental.id == payment.rental_id)
+            .where(
+                payment.status == models.PaymentStatus.completed,
+                payment.payment_date >= start,
+                payment.payment_date <= end,
+            )
+        )
+        if landlord_id is not None:
+            stmt = stmt.join(models.Apartment, models.Apartment.id == rental.apartment_id)\
+                .where(models.Apartment.landlord_id == landlord_id)
+        selects.append(stmt)
+    return stream_columns(db, union_all(*selects), ["int64", "datetime64[D]", "float64"])
+
+
+def _index(apartment_ids: np.ndarray, values: np.ndarray):
+    """Map apartment ids onto positions in the sorted `apartment_ids`; returns (positions, known mask)."""
+    positions = np.searchsorted(apartment_ids, values)
+    positions = np.minimum(positions, max(len(apartment_ids) - 1, 0))
+    known = apartment_ids[positions] == values if len(apartment_ids) else np.zeros(len(values), dtype=bool)
+    return positions, known
+
+
+def occupancy_report(db: Session, start: date, end: date, landlord_id: Optional[int] = None) -> Dict:
+    """Occupied/vacant days, occupancy rate and realized rent per apartment for [start, end]."""
+    apartments = _apartments(db, landlord_id)
+    ids = np.array([a.id for a in apartments], dtype=np.int64)
+    window_start, window_end = _days(start), _days(end + timedelta(days=1))
+    days = int(window_end - window_start)
+
+    apartment_ids, starts, ends = _rental_intervals(db, landlord_id, start, end)
+    positions, known = _index(ids, apartment_ids)
+    starts = np.maximum(starts.astype(np.int64), window_start)
+    # end_date is the last rented day; open-ended rentals run to the end of the window
+    ends = np.where(np.isnat(ends), window_end, ends.astype(np.int64) + 1)
+    ends = np.minimum(ends, window_end)
+    keep = known & (ends > starts)
+    occupied = covered_days(positions[keep], starts[keep], ends[keep], len(ids))
+
+    payment_apartments, _, amounts = _payments(db, landlord_id, start, end)
+    positions, known = _index(ids, payment_apartments)
+    revenue = np.bincount(positions[known], weights=amounts[known], minlength=len(ids))
+
+    rows = []
+    for i, apartment in enumerate(apartments):
+        occupied_days = int(occupied[i])
+        realized = float(revenue[i]) / (occupied_days / AVG_MONTH_DAYS) if occupied_days else None
+        list_price = float(apartment.rent_price) if apartment.rent_price is not None else None
+        rows.append({
+            "apartment_id": apartment.id,
+            "name": apartment.name,
+            "rent_price": list_price,
+            "occupied_days": occupied_days,
+            "vacancy_days": days - occupied_days,
+            "occupancy_rate": round(occupied_days / days, 4),
+            "revenue": round(float(revenue[i]), 2),
+            "avg_realized_rent": round(realized, 2) if realized is not None else None,
+            "realized_vs_list": round(realized / list_price, 4) if realized is not None and list_price else None,
+        })
+
+    total_occupied = int(occupied.sum())
+    capacity = days * len(ids)
+    return {
+        "start": start,
+        "end": end,
+        "days": days,
+        "apartments_count": len(ids),
+        "occupied_days": total_occupied,
+        "vacancy_days": capacity - total_occupied,
+        "occupancy_rate": round(total_occupied / capacity, 4) if capacity else 0.0,
+        "revenue": round(float(revenue.sum()), 2),
+        "apartments": rows,
+    }
+
+
+def revenue_report(db: Session, start: date, end: date, landlord_id: Optional[int] = None) -> Dict:
+    """Completed payments per apartment per calendar month of [start, end]."""
+    apartments = _apartments(db, landlord_id)
+    ids = np.array([a.id for a in apartments], dtype=np.int64)
+    first_month = np.datetime64(start, "M")
+    months = np.arange(first_month, np.datetime64(end, "M") + 1)
+
+    payment_apartments, dates, amounts = _payments(db, landlord_id, start, end)
+    positions, known = _index(ids, payment_apartments)
+    month_index = (dates[known].astype("datetime64[M]") - first_month).astype(np.int64)
+    # one bincount over (apartment, month) cells instead of a dict of running totals
+    cells = positions[known] * len(months) + month_index
+    totals = np.bincount(cells, weights=amounts[known], minlength=len(ids) * len(months))
+    totals = totals.reshape(len(ids), len(months)) if len(ids) else np.zeros((0, len(months)))
+
+    return {
+        "start": start,
+        "end": end,
+        "months": [str(m) for m in months],
+        "total": round(float(totals.sum()), 2),
+        "monthly_totals": [round(float(v), 2) for v in totals.sum(axis=0)],
+        "apartments": [
+            {
+                "apartment_id": apartment.id,
+                "name": apartment.name,
+                "total": round(float(totals[i].sum()), 2),
+                "monthly": [round(float(v), 2) for v in totals[i]],
+            }
+            for i, apartment in enumerate(apartments)
+        ],
+    }
@@ -0,0 +1,114 @@
+# app/archive.py - move finished rentals and their payments to cold tables
+import argparse
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .changes import TRACKED_ENTITIES, event_row, record_cascade_deletes, record_events
+from .config import get_settings
+
+ARCHIVABLE_STATUSES = (models.RentalStatus.ended, models.RentalStatus.cancelled)
+
+RENTAL_COLUMNS = ["id", "apartment_id", "tenant_id", "start_date", "end_date", "status", "total_amount", "created_at"]
+PAYMENT_COLUMNS = ["id", "rental_id", "payment_date", "amount", "payment_method", "status"]
+
+
+def default_cutoff() -> date:
+    # Rentals that ended more than ARCHIVE_AFTER_DAYS ago are archived by default
+    return date.today() - timedelta(days=get_settings().archive_after_days)
+
+
+def _next_batch(db: Session, cutoff: date, batch_size: int) -> List[int]:
+    return list(db.scalars(
+        select(models.Rental.id)
+        .where(
+            models.Rental.status.in_(ARCHIVABLE_STATUSES),
+            models.Rental.end_date < cutoff,
+        )
+        .order_by(models.Rental.id)
+        .limit(batch_size)
+    ))
+
+
+def archive_batch(db: Session, rental_ids: List[int]) -> int:
+    """
+    Copy one batch of rentals (and their payments) to the archive and delete the
+    originals, recording a delete event for each moved row.
+    """
+    rental_cols = [getattr(models.Rental, c) for c in RENTAL_COLUMNS]
+    payment_cols = [getattr(models.Payment, c) for c in PAYMENT_COLUMNS]
+
+    db.execute(
+        insert(models.ArchivedRental).from_select(
+            RENTAL_COLUMNS,
+            select(*rental_cols).where(models.Rental.id.in_(rental_ids)),
+        )
+    )
+    db.execute(
+        insert(models.ArchivedPayment).from_select(
+            PAYMENT_COLUMNS,
+            select(*payment_cols).where(models.Payment.rental_id.in_(rental_ids)),
+        )
+    )
+    # to the change feed the moved rows are gone: the rentals, then their payments, read before the DELETE
+    record_events(db, [event_row(TRACKED_ENTITIES[models.Rental], rental_id, "delete") for rental_id in rental_ids])
+    record_cascade_deletes(db, models.Rental, rental_ids)
+    db.execute(delete(models.Payment).where(models.Payment.rental_id.in_(rental_ids)))
+    db.execute(delete(models.Rental).where(models.Rental.id.in_(rental_ids)))
+    return len(rental_ids)
+
+
+def archive_rentals(
+    db: Session,
+    cutoff: Optional[date] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Archive ended/cancelled rentals whose end_date is before `cutoff`.
+
+    Every batch is committed on its own, so the job can be interrupted and
+    re-run at any time: it simply picks up whatever is still in the live tables.
+    """
+    cutoff = cutoff or default_cutoff()
+    batch_size = batch_size or get_settings().archive_batch_size
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rental_ids = _next_batch(db, cutoff, batch_size)
+        if not rental_ids:
+            break
+        try:
+            total += archive_batch(db, rental_ids)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        batches += 1
+        print(f"Archived {total} rentals so far (last id {rental_ids[-1]})")
+    return total
+
+
+def main():
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive ended and cancelled rentals")
+    parser.add_argument("--before", type=date.fromisoformat, default=None,
+                        help="archive rentals that ended before this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = archive_rentals(db, args.before, args.batch_size, args.max_batches)
+        print(f"Done: {total} rentals archived")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+# app/cache.py - read cache shared by every worker: in-process LRU plus an optional Redis tier
+#
+# Entries are tagged with the rows they were built from ("apartment:5") and, for
+# lists, whole tables ("apartment"). Every committed change event bumps its tags
+# (on_commit, app/changes.py) and an entry is served only while none of its tags
+# was bumped after it started loading. With CACHE_URL set the entries and the tag
+# versions live in Redis, so a write in one uvicorn worker invalidates every
+# worker at once and a value loaded by one is reused by the others; without it
+# each worker has its own entries and only sees its own writes, so other workers
+# serve theirs for up to CACHE_TTL_SECONDS + CACHE_STALE_SECONDS; routes cached
+# with shared_only=True are then not cached at all.
+#
+# Expiry never sends a crowd to the database: an entry is served for
+# CACHE_STALE_SECONDS past its TTL while one background refresh replaces it, and
+# a miss is loaded by a single caller per key (a Future in this process, SET NX
+# in Redis across workers) while the others wait for its result.
+import functools
+import inspect
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Union
+
+from cachetools import LRUCache
+from fastapi.params import Depends as DependsParam
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .changes import on_commit
+from .config import get_settings
+from .database import SessionLocal
+
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+# Foreign keys in change events that point at a cached row: an inserted payment
+# carries rental_id, a new maintenance request tenant_id, and so on.
+EVENT_REFERENCES = {
+    "tenant_id": "tenant",
+    "rental_id": "rental",
+    "apartment_id": "apartment",
+    "user_id": "user",
+}
+
+TAG_TTL_SECONDS = 24 * 3600  # Redis tag versions outlive every entry stored before the bump
+POLL_SECONDS = 0.01
+REDIS_RETRY_SECONDS = 5  # after a Redis error, bypass the cache for this long
+
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+
+
+def tag(entity: str, entity_id=None) -> str:
+    return entity if entity_id is None else f"{entity}:{entity_id}"
+
+
+def event_tags(rows: Iterable[Dict]) -> Set[str]:
+    tags = set()
+    for row in rows:
+        tags.add(row["entity"])
+        tags.add(tag(row["entity"], row["entity_id"]))
+        for field, entity in EVENT_REFERENCES.items():
+            value = (row.get("changed") or {}).get(field)
+            if value is not None:
+                tags.add(tag(entity, value))
+    return tags
+
+
+class Entry(NamedTuple):
+    value: Any
+    fresh_until: float  # time.time()
+    stale_until: float
+    generation: int  # invalidation counter read before the value was loaded
+    tags: List[str]
+
+
+class _TagVersions(LRUCache):
+    """Tag -> generation of its last bump; an evicted tag reads as `floor`, never older."""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.floor = 0
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.floor = max(self.floor, value)
+        return key, value
+
+
+class Cache:
+    """
+    get_or_load() is the whole interface: the value under `key` if it is still
+    valid, otherwise `load(db)` run once for everyone asking. Values are JSON
+    documents or bytes (the Redis tier stores them encoded); `load` returning
+    None is passed through uncached.
+
+    `shared` is a Redis client (redis.Redis, or a stand-in such as
+    fakeredis.FakeRedis); None keeps everything in this process.
+    """
+
+    def __init__(self, entries: int, ttl: float, stale: float, lock_seconds: float,
+                 shared=None, prefix: str = "cache:"):
+        self.ttl = ttl
+        self.stale = stale
+        self.lock_seconds = lock_seconds
+        self.shared = shared
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.local = LRUCache(entries)
+        self.versions = _TagVersions(entries * 4)  # only used without the shared tier
+        self.generation = 0
+        self.inflight: Dict[str, Future] = {}
+        self.refreshing: Set[str] = set()
+        self.shared_down_until = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # --- Redis tier. While Redis is unreachable nothing is served from or stored in
+    # the cache (this worker could not see other workers' invalidations): every
+    # request loads from the database as if the cache did not exist.
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}{kind}:{name}"
+
+    def _redis(self, method: str, *args, **kwargs):
+        if self.shared is None or time.monotonic() < self.shared_down_until:
+            return None
+        try:
+            return getattr(self.shared, method)(*args, **kwargs)
+        except Exception as e:  # redis.RedisError, or the stand-in's equivalent
+            print(f"Cache: Redis {method} failed, bypassing the cache for {REDIS_RETRY_SECONDS}s: {e}")
+            self.shared_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+
+    def _encode(self, entry: Entry) -> bytes:
+        raw = isinstance(entry.value, bytes)
+        header = json.dumps({"f": entry.fresh_until, "s": entry.stale_until, "g": entry.generation,
+                             "t": entry.tags, "raw": raw}, separators=(",", ":"))
+        body = entry.value if raw else json.dumps(entry.value, separators=(",", ":")).encode()
+        return header.encode() + b"\n" + body
+
+    def _decode(self, data: bytes) -> Entry:
+        header, _, body = data.partition(b"\n")
+        h = json.loads(header)
+        return Entry(body if h["raw"] else json.loads(body), h["f"], h["s"], h["g"], h["t"])
+
+    # --- validity
+
+    def _current_generation(self) -> Optional[int]:
+        if self.shared is None:
+            with self.lock:
+                return self.generation
+        value = self._redis("get", self._key("generation", "all"))
+        if value is None and time.monotonic() < self.shared_down_until:
+            return None
+        return int(value or 0)
+
+    def _valid(self, entry: Entry) -> bool:
+        if not entry.tags:
+            return True
+        if self.shared is None:
+            with self.lock:
+                return all(self.versions.get(t, self.versions.floor) <= entry.generation for t in entry.tags)
+        versions = self._redis("mget", [self._key("tag", t) for t in entry.tags])
+        if versions is None:
+            return False
+        return all(int(v or 0) <= entry.generation for v in versions)
+
+    def _lookup(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            entry = self.local.get(key)
+        if self.shared is not None and (entry is None or time.time() >= entry.fresh_until):
+            # another worker may have refreshed it already
+            data = self._redis("get", self._key("entry", key))
+            if data is not None:
+                entry = self._decode(data)
+                with self.lock:
+                    self.local[key] = entry
+        if entry is None or time.time() >= entry.stale_until or not self._valid(entry):
+            return None
+        return entry
+
+    def invalidate(self, tags: Iterable[str]):
+        """Bump these tags: entries built from them before now are never served again."""
+        tags = list(tags)
+        if not tags:
+            return
+        if self.shared is None:
+            with self.lock:
+                self.generation += 1
+                for t in tags:
+                    self.versions[t] = self.generation
+            return
+        generation = self._redis("incr", self._key("generation", "all"))
+        if generation is None:
+            # the bump is lost; drop this worker's copies at least
+            with self.lock:
+                self.local.clear()
+            return
+        pipe = self.shared.pipeline(transaction=False)
+        for t in tags:
+            pipe.set(self._key("tag", t), generation, px=TAG_TTL_SECONDS * 1000)
+        self._redis_pipeline(pipe)
+
+    def _redis_pipeline(self, pipe):
+        if time.monotonic() < self.shared_down_until:
+            return
+        try:
+            pipe.execute()
+        except Exception as e:
+            print(f"Cache: Redis pipeline failed, bypassing the cache for {REDIS_RETRY_SECONDS}s: {e}")
+            self.shared_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    # --- loading
+
+    def _load_and_store(self, key: str, load: Callable[[Session], Any], tags: Tags,
+                        db: Optional[Session], ttl: Optional[float]) -> Entry:
+        generation = self._current_generation()
+        if db is None:
+            with SessionLocal() as session:
+                value = load(session)
+        else:
+            value = load(db)
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        if value is None or generation is None:
+            return Entry(value, now, now, -1, [])
+        entry = Entry(value, now + ttl, now + ttl + self.stale, generation,
+                      sorted(set(tags(value) if callable(tags) else tags)))
+        with self.lock:
+            self.local[key] = entry
+        if self.shared is not None:
+            self._redis("set", self._key("entry", key), self._encode(entry), px=max(1, int((ttl + self.stale) * 1000)))
+        return entry
+
+    def _acquire(self, key: str) -> Optional[str]:
+        """Cross-worker lock on loading `key`; a token, "" without Redis, None if someone else holds it."""
+        if self.shared is None or time.monotonic() < self.shared_down_until:
+            return ""
+        token = secrets.token_hex(8)
+        acquired = self._redis("set", self._key("lock", key), token, nx=True, px=int(self.lock_seconds * 1000))
+        if acquired:
+            return token
+        return "" if time.monotonic() < self.shared_down_until else None
+
+    def _release(self, key: str, token: str):
+        if token and self._redis("get", self._key("lock", key)) == token.encode():
+            self._redis("delete", self._key("lock", key))
+
+    def _load_across_workers(self, key, load, tags, db, ttl) -> Entry:
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            token = self._acquire(key)
+            if token is not None:
+                try:
+                    return self._load_and_store(key, load, tags, db, ttl)
+                finally:
+                    self._release(key, token)
+            # another worker is loading it: wait for its entry, or take over once its lock would have expired
+            time.sleep(POLL_SECONDS)
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            if time.monotonic() >= deadline:
+                return self._load_and_store(key, load, tags, db, ttl)
+
+    def _load_once(self, key, load, tags, db, ttl) -> Any:
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            try:
+                entry = future.result(timeout=self.lock_seconds)  # re-raises the leader's exception (e.g. a 404)
+            except FutureTimeout:
+                entry = None
+            # the leader may have started loading before a write this caller must see
+            if entry is not None and (entry.value is None or self._valid(entry)):
+                return entry.value
+            return self._load_and_store(key, load, tags, db, ttl).value
+        try:
+            entry = self._load_across_workers(key, load, tags, db, ttl)
+            future.set_result(entry)
+            return entry.value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def _refresh(self, key, load, tags, ttl):
+        token = None
+        try:
+            token = self._acquire(key)
+            if token is not None:  # otherwise another worker is refreshing it
+                self._load_and_store(key, load, tags, None, ttl)
+        except Exception as e:
+            print(f"Cache: background refresh of {key} failed: {e}")
+        finally:
+            if token:
+                self._release(key, token)
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _refresh_in_background(self, key, load, tags, ttl):
+        with self.lock:
+            if key in self.refreshing or key in self.inflight:
+                return
+            self.refreshing.add(key)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        self._pool.submit(self._refresh, key, load, tags, ttl)
+
+    def get_or_load(self, key: str, load: Callable[[Session], Any], tags: Tags,
+                    db: Optional[Session] = None, ttl: Optional[float] = None) -> Any:
+        """
+        `load(db)` builds the value from the database; background refreshes call
+        it with a session of their own, so it may only depend on its arguments
+        and what it closes over. `tags` is a list, or a function of the loaded
+        value for tags that depend on the data.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            if time.time() < entry.fresh_until:
+                return entry.value
+            self._refresh_in_background(key, load, tags, ttl)
+            return entry.value
+        return self._load_once(key, load, tags, db, ttl)
+
+
+_cache: Optional[Cache] = None
+
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        shared = None
+        if settings.cache_url:
+            if redis is None:
+                raise RuntimeError("CACHE_URL is set but the redis package is not installed")
+            shared = redis.Redis.from_url(settings.cache_url)
+        _cache = Cache(settings.cache_entries, settings.cache_ttl_seconds, settings.cache_stale_seconds,
+                       settings.cache_lock_seconds, shared, settings.cache_prefix)
+    return _cache
+
+
+def set_cache(cache: Optional[Cache]):
+    """Replace the process's cache (e.g. with one on fakeredis); None rebuilds it from the settings."""
+    global _cache
+    _cache = cache
+
+
+@on_commit
+def _invalidate(rows: List[Dict]):
+    # always, even before this worker has cached anything: the Redis tier is shared
+    get_cache().invalidate(event_tags(rows))
+
+
+def cached(name: str, model, tags: Union[Iterable[str], Callable[[Any, Dict], Iterable[str]]] = (),
+           ttl: Optional[float] = None, shared_only: bool = False):
+    """
+    Cache a GET route's JSON body. Goes under @router.get:
+
+        @router.get("/roles", response_model=List[schemas.Role])
+        @cached("roles", List[schemas.Role], tags=["role"])
+        def get_roles(db: Session = Depends(get_db)): ...
+
+    The key is `name` plus every parameter that isn't a Depends(); the route must
+    not vary by anything else (such as the current user). The body is rendered
+    through `model` like FastAPI's response_model; a route that returns a
+    Response has its body cached as is. `tags` may be a function of the parsed
+    body and the route's parameters. With `shared_only` the route is cached only
+    when CACHE_URL is set: for reads a client writes back with If-Match, another
+    worker's stale copy would answer every retry with the same old version.
+    """
+    adapter = TypeAdapter(model)
+
+    def decorate(fn):
+        varying = [p.name for p in inspect.signature(fn).parameters.values()
+                   if not isinstance(p.default, DependsParam)]
+
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            cache = get_cache()
+            if shared_only and cache.shared is None:
+                return fn(**kwargs)
+
+            def load(db: Session) -> bytes:
+                result = fn(**{**kwargs, "db": db})
+                if isinstance(result, Response):
+                    return result.body
+                document = adapter.dump_python(adapter.validate_python(result, from_attributes=True), mode="json")
+                # same encoding as FastAPI's JSONResponse
+                return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode()
+
+            body_tags = (lambda body: tags(json.loads(body), kwargs)) if callable(tags) else tags
+            key = name + ":" + json.dumps([kwargs.get(p) for p in varying], default=str)
+            body = cache.get_or_load(key, load, body_tags, kwargs.get("db"), ttl)
+            return Response(body, media_type="application/json")
+        return wrapper
+    return decorate
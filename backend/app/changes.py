@@ -0,0 +1,333 @@
+# app/changes.py - transactional outbox feeding GET /changes
+#
+# Events are ordered by seq, which is taken from a sequence when the event is
+# inserted, not when its transaction commits: a reader can see seq 11 while 10
+# is still in flight, and a cursor moved past 11 would skip 10 for good. On
+# SQLite writers are serialized by the database lock, so seq order is commit
+# order. On Postgres every transaction that writes events first announces the
+# sequence's current value with a shared transaction-level advisory lock, which
+# every session can see in pg_locks and which goes away at commit or rollback;
+# readers only serve events below the lowest announced value (visible_until).
+import argparse
+import enum
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, inspect, literal, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import get_settings
+from .database import SESSION_FACTORIES, RoutingSession, SessionLocal, get_shard_router
+
+# Model -> entity name used in the feed
+TRACKED_ENTITIES = {
+    models.Role: "role",
+    models.User: "user",
+    models.Apartment: "apartment",
+    models.Tenant: "tenant",
+    models.Rental: "rental",
+    models.Payment: "payment",
+    models.MaintenanceRequest: "maintenance_request",
+}
+
+# Children the database removes through ON DELETE CASCADE: parent -> [(child, foreign key)]
+CASCADES = {
+    models.Apartment: [
+        (models.Rental, models.Rental.apartment_id),
+        (models.MaintenanceRequest, models.MaintenanceRequest.apartment_id),
+    ],
+    models.Tenant: [
+        (models.Rental, models.Rental.tenant_id),
+        (models.MaintenanceRequest, models.MaintenanceRequest.tenant_id),
+    ],
+    models.Rental: [(models.Payment, models.Payment.rental_id)],
+}
+
+# Columns that must never leave the database through the feed
+HIDDEN_FIELDS = {"hashed_password"}
+
+# pg_locks classid of the in-flight announcements (two-key form, apart from single-key locks)
+IN_FLIGHT_LOCK_CLASS = 27027
+
+# Called with a transaction's event rows once it commits (e.g. cache invalidation)
+_commit_listeners: List[Callable[[List[Dict]], None]] = []
+
+
+def on_commit(callback: Callable[[List[Dict]], None]):
+    _commit_listeners.append(callback)
+    return callback
+
+
+def _pending(session: Session) -> List[Dict]:
+    return session.info.setdefault("change_rows", [])
+
+
+def _jsonable(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _changed_fields(obj, op: str) -> Dict:
+    state = inspect(obj)
+    changed = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in HIDDEN_FIELDS:
+            continue
+        if op == "insert":
+            value = state.dict.get(key)
+            if value is not None:
+                changed[key] = _jsonable(value)
+        elif state.attrs[key].history.has_changes():
+            changed[key] = _jsonable(state.dict.get(key))
+    if changed and state.mapper.version_id_col is not None:
+        # the row's new version, for If-Match on its next update
+        key = state.mapper.get_property_by_column(state.mapper.version_id_col).key
+        changed[key] = state.dict.get(key)
+    return changed
+
+
+def event_row(entity: str, entity_id: int, op: str, changed: Optional[Dict] = None) -> Dict:
+    return {"entity": entity, "entity_id": entity_id, "op": op, "changed": changed or {}}
+
+
+def _announce(conn: Connection):
+    """Mark the transaction as in flight from the sequence's current value on; once per transaction."""
+    if conn.dialect.name != "postgresql":
+        return
+    transaction = conn.get_transaction()
+    if conn.info.get("announced") is transaction:
+        return
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock_shared(:cls, last_value::int) FROM change_events_seq_seq"),
+        {"cls": IN_FLIGHT_LOCK_CLASS},
+    )
+    conn.info["announced"] = transaction
+
+
+def visible_until(db: Session) -> Optional[int]:
+    """
+    Exclusive upper bound of the seqs that are safe to serve: every event below
+    it has committed or never will. None when seq order is commit order.
+
+    The sequence is read before the locks: a writer not yet announced then can
+    only take seqs above it. Run the events query afterwards, in its own READ
+    COMMITTED statement, so it sees everything committed by then.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    bound = db.scalar(text("SELECT last_value FROM change_events_seq_seq")) + 1
+    in_flight = db.scalar(
+        text("SELECT min(objid::bigint) FROM pg_locks WHERE locktype = 'advisory' AND classid = :cls AND objsubid = 2"),
+        {"cls": IN_FLIGHT_LOCK_CLASS},
+    )
+    return bound if in_flight is None else min(bound, in_flight)
+
+
+def record_events(db: Session, rows: List[Dict]):
+    """Append events for writes that bypass the ORM unit of work (bulk UPDATE/DELETE)."""
+    if rows:
+        _announce(db.connection() if isinstance(db, Session) else db)
+        # Core insert: an executemany without the ORM bulk-insert bookkeeping
+        db.execute(insert(models.ChangeEvent.__table__), rows)
+        if _commit_listeners and isinstance(db, Session):
+            _pending(db).extend(rows)
+
+
+def record_cascade_deletes(db, model, parent_ids, source=None, skip: Optional[Dict[type, Set[int]]] = None):
+    """
+    Append delete events for the rows ON DELETE CASCADE is about to remove.
+
+    Must run before the parent DELETE. Each level is one INSERT ... SELECT, so
+    no child row is loaded into Python however many there are. `parent_ids`
+    may be a list or a SELECT of ids; `db` a Session or a Connection.
+
+    `source` is the connection the children live on when it is not `db`'s
+    database (a landlord shard, see app/sharding.py): their ids are read from
+    it and the events inserted into `db`. `skip` holds ids per model that get
+    their events elsewhere (loaded children the flush deletes itself); neither
+    they nor their own children are recorded here.
+    """
+    skip = skip or {}
+    if source is None and isinstance(db, RoutingSession):
+        # sharded: the children may be on any shard, the events go to main
+        for shard in get_shard_router().names:
+            record_cascade_deletes(
+                db.connection(), model, parent_ids, db.connection(bind_arguments={"shard_id": shard}), skip
+            )
+        return
+    _announce(db.connection() if isinstance(db, Session) else db)
+    for child, foreign_key in CASCADES.get(model, []):
+        condition = [foreign_key.in_(parent_ids)]
+        if skip.get(child):
+            condition.append(child.id.notin_(skip[child]))
+        child_ids = select(child.id).where(*condition)
+        if source is not None:
+            child_ids = list(source.scalars(child_ids))
+            if child_ids:
+                db.execute(insert(models.ChangeEvent.__table__), [
+                    event_row(TRACKED_ENTITIES[child], child_id, "delete") for child_id in child_ids
+                ])
+                record_cascade_deletes(db, child, child_ids, source, skip)
+            continue
+        db.execute(
+            insert(models.ChangeEvent.__table__).from_select(
+                ["entity", "entity_id", "op"],
+                select(literal(TRACKED_ENTITIES[child]), child.id, literal("delete")).where(*condition),
+            )
+        )
+        record_cascade_deletes(db, child, child_ids, skip=skip)
+
+
+def _collect(session: Session) -> Iterable[Dict]:
+    for obj in session.new:
+        entity = TRACKED_ENTITIES.get(type(obj))
+        if entity:
+            yield event_row(entity, obj.id, "insert", _changed_fields(obj, "insert"))
+    for obj in session.dirty:
+        entity = TRACKED_ENTITIES.get(type(obj))
+        if entity and session.is_modified(obj, include_collections=False):
+            changed = _changed_fields(obj, "update")
+            if changed:
+                yield event_row(entity, obj.id, "update", changed)
+    for obj in session.deleted:
+        entity = TRACKED_ENTITIES.get(type(obj))
+        if entity:
+            yield event_row(entity, obj.id, "delete")
+
+
+def _listen(identifier: str):
+    # sessions come from ShardedSessionLocal instead of SessionLocal when SHARD_URLS is set
+    def register(fn):
+        for factory in SESSION_FACTORIES:
+            event.listen(factory, identifier, fn)
+        return fn
+    return register
+
+
+@_listen("after_flush")
+def _record_flush(session: Session, flush_context):
+    rows = list(_collect(session))
+    if rows:
+        # Executed on the flush's own connection, so it commits or rolls back with the write
+        _announce(session.connection())
+        session.connection().execute(insert(models.ChangeEvent.__table__), rows)
+        if _commit_listeners:
+            _pending(session).extend(rows)
+
+
+@_listen("after_commit")
+def _notify_commit(session: Session):
+    rows = session.info.pop("change_rows", None)
+    if rows:
+        for callback in _commit_listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Commit listener {callback.__name__} failed: {e}")
+
+
+@_listen("after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("change_rows", None)
+
+
+@_listen("before_flush")
+def _record_cascades(session: Session, flush_context, instances):
+    router = get_shard_router() if isinstance(session, RoutingSession) else None
+    deleted: Dict[tuple, List[int]] = {}
+    # loaded rows the flush deletes get their events from _record_flush, not a second time as children
+    in_session: Dict[type, Set[int]] = {}
+    for obj in session.deleted:
+        in_session.setdefault(type(obj), set()).add(obj.id)
+    for obj in session.deleted:
+        if type(obj) in CASCADES:
+            for shard in (router.child_shards(obj) if router else [None]):
+                deleted.setdefault((type(obj), shard), []).append(obj.id)
+    for (model, shard), ids in deleted.items():
+        # the children are only visible before the parent's DELETE is emitted
+        source = session.connection(bind_arguments={"shard_id": shard}) if shard else None
+        record_cascade_deletes(session.connection(), model, ids, source, in_session)
+
+
+def serialize_event(ev: models.ChangeEvent) -> Dict:
+    changed = ev.changed or {}
+    return {
+        "seq": ev.seq,
+        "entity": ev.entity,
+        "id": ev.entity_id,
+        "op": ev.op,
+        # the row's version after this change, as in API responses and If-Match; None for deletes
+        "version": changed.get("version"),
+        "changed": changed,
+        "created_at": ev.created_at.isoformat() if ev.created_at else None,
+    }
+
+
+def oldest_available_seq(db: Session) -> Optional[int]:
+    return db.scalar(select(func.min(models.ChangeEvent.seq)))
+
+
+def compact_changes(db: Session, older_than_days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """
+    Delete events older than the retention window in bounded batches.
+
+    The newest event is always kept so the feed's horizon (oldest seq - 1)
+    stays meaningful: clients whose cursor is behind it get 410 and resync.
+    """
+    if older_than_days is None:
+        older_than_days = get_settings().change_retention_days
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    newest = db.scalar(select(func.max(models.ChangeEvent.seq)))
+    if newest is None:
+        return 0
+
+    total = 0
+    while True:
+        upper = db.scalar(
+            select(models.ChangeEvent.seq)
+            .where(models.ChangeEvent.created_at < cutoff, models.ChangeEvent.seq < newest)
+            .order_by(models.ChangeEvent.seq)
+            .offset(batch_size - 1)
+            .limit(1)
+        )
+        if upper is None:
+            upper = db.scalar(
+                select(func.max(models.ChangeEvent.seq))
+                .where(models.ChangeEvent.created_at < cutoff, models.ChangeEvent.seq < newest)
+            )
+            if upper is None:
+                break
+        result = db.execute(delete(models.ChangeEvent).where(models.ChangeEvent.seq <= upper))
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change feed maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="delete events older than the retention window")
+    compact.add_argument("--days", type=int, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "compact":
+            print(f"Deleted {compact_changes(db, args.days)} change events")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# app/compression.py - response compression with a cache of compressed bodies
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .config import Settings, get_settings
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _compressors(settings: Settings) -> Dict[str, Callable[[bytes], bytes]]:
+    available = {"gzip": lambda body: gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)}
+    if brotli is not None:
+        available["br"] = lambda body: brotli.compress(body, quality=settings.compression_brotli_quality)
+    if zstandard is not None:
+        # a ZstdCompressor is not thread-safe, and large bodies are compressed in the threadpool
+        local = threading.local()
+
+        def zstd(body: bytes) -> bytes:
+            compressor = getattr(local, "compressor", None)
+            if compressor is None:
+                compressor = local.compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level)
+            return compressor.compress(body)
+
+        available["zstd"] = zstd
+    return available
+
+
+def _compressible(start_message, headers: Headers) -> bool:
+    return (
+        start_message["status"] == 200
+        and "content-encoding" not in headers
+        and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+class CpuBudget:
+    """Token bucket of compression milliseconds, refilled continuously."""
+
+    def __init__(self, ms_per_second: float):
+        self.capacity = ms_per_second
+        self.tokens = ms_per_second
+        self.updated = time.monotonic()
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity)
+        self.updated = now
+        return self.tokens > 0
+
+    def spend(self, ms: float):
+        self.tokens -= ms
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by entries and bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple[str, str], body: bytes):
+        if len(body) > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = body
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete (non-streaming) responses with the best encoding the
+    client accepts. GETs under compression_cache_paths also get a content-hash
+    ETag (answering If-None-Match with 304) and their compressed bodies are
+    kept in an LRU, so a hot page is compressed once rather than on every hit.
+    """
+
+    def __init__(self, app, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        self.app = app
+        self.min_size = settings.compression_min_size
+        self.offload_size = settings.compression_offload_size
+        self.compressors = _compressors(settings)
+        self.preference = [
+            e.strip() for e in settings.compression_encodings.split(",") if e.strip() in self.compressors
+        ]
+        self.cache_paths = tuple(p.strip() for p in settings.compression_cache_paths.split(",") if p.strip())
+        self.cache = CompressedBodyCache(settings.compression_cache_entries, settings.compression_cache_bytes)
+        # milliseconds of compression work allowed per second per worker; beyond it responses go out uncompressed
+        self.budget = CpuBudget(settings.compression_cpu_budget_ms)
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        for encoding in self.preference:
+            if accepted.get(encoding, wildcard) > 0:
+                return encoding
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = self.choose_encoding(request_headers.get("accept-encoding", ""))
+        cacheable = scope["method"] == "GET" and scope["path"].startswith(self.cache_paths)
+        if encoding is None and not cacheable:
+            async def vary_send(message):
+                # sent as is, but another Accept-Encoding would get a compressed body: caches must know
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(raw=list(message["headers"]))
+                    if _compressible(message, headers):
+                        headers.add_vary_header("Accept-Encoding")
+                        message = {**message, "headers": headers.raw}
+                await send(message)
+
+            await self.app(scope, receive, vary_send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None and not passthrough:
+                    # e.g. http.response.pathsend: the server sends the file, leave it alone
+                    passthrough = True
+                    await send(start_message)
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # streaming body: leave it alone
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            await self.finish(start_message, message.get("body", b""), encoding, cacheable, request_headers, send)
+
+        await self.app(scope, receive, wrapped_send)
+
+    async def finish(self, start_message, body: bytes, encoding, cacheable, request_headers, send):
+        headers = MutableHeaders(raw=start_message["headers"])
+        if not _compressible(start_message, headers):
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+        # whether or not this one ends up compressed, the representation depends on Accept-Encoding
+        headers.add_vary_header("Accept-Encoding")
+
+        etag = None
+        if cacheable and "no-store" not in headers.get("cache-control", ""):
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            headers["etag"] = etag
+            if etag in request_headers.get("if-none-match", ""):
+                del headers["content-length"]
+                await send({**start_message, "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if encoding is not None and len(body) >= self.min_size:
+            compressed = self.cache.get((etag, encoding)) if etag else None
+            if compressed is None and self.budget.available():
+                compressed = await self.compress(encoding, body)
+                if etag:
+                    self.cache.put((etag, encoding), compressed)
+            if compressed is not None and len(compressed) < len(body):
+                body = compressed
+                headers["content-encoding"] = encoding
+
+        headers["content-length"] = str(len(body))
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
+
+    async def compress(self, encoding: str, body: bytes) -> bytes:
+        compressor = self.compressors[encoding]
+        started = time.perf_counter()
+        # large bodies are compressed in the threadpool instead of on the event loop
+        if len(body) >= self.offload_size:
+            compressed = await run_in_threadpool(compressor, body)
+        else:
+            compressed = compressor(body)
+        self.budget.spend((time.perf_counter() - started) * 1000)
+        return compressed
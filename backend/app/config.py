@@ -0,0 +1,147 @@
+# app/config.py - all environment settings, loaded once on first use
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+def _bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: Optional[str] = None
+    jwt_secret_key: Optional[str] = None
+    access_token_expire_minutes: int = 30
+
+    # connection pool (see app/pool.py)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 300
+    db_pre_ping: str = "idle"
+    db_pre_ping_idle_seconds: float = 30
+    db_pool_mode: str = "session"
+    db_echo: bool = False
+
+    # landlord sharding (see app/sharding.py): "name=url,name=url"; empty keeps one database.
+    # DATABASE_URL is always the "main" shard and holds the global tables.
+    shard_urls: str = ""
+    shard_directory_ttl_seconds: float = 5
+
+    # response compression (see app/compression.py)
+    compression_encodings: str = "zstd,br,gzip"
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    compression_zstd_level: int = 3
+    compression_cpu_budget_ms: float = 250
+    compression_offload_size: int = 64 * 1024
+    compression_cache_entries: int = 256
+    compression_cache_bytes: int = 32 * 1024 * 1024
+    compression_cache_paths: str = "/apartments/,/rentals/,/payments/"
+
+    # typeahead search (see app/search.py)
+    search_index: bool = False
+    search_candidates: int = 200
+
+    # maintenance full-text search (see app/fulltext.py)
+    maintenance_search_candidates: int = 1000
+
+    # read cache (see app/cache.py): CACHE_URL=redis://... shares entries and
+    # invalidations between workers; empty keeps a separate cache per worker
+    cache_url: str = ""
+    cache_prefix: str = "rental:cache:"
+    cache_entries: int = 10000  # in-process tier
+    cache_ttl_seconds: float = 30
+    cache_stale_seconds: float = 30  # served past the TTL while one refresh runs
+    cache_lock_seconds: float = 5  # longest a caller waits for another's load
+
+    # admission control (see app/admission.py). Rules are "METHOD /path=value"
+    # separated by commas; * matches any method, a trailing * any path suffix,
+    # and the first matching rule applies. Rate values are limits-style
+    # "10/second;100/minute" (every window must have room: a burst and a rate).
+    rate_limits: str = "POST /auth/login=5/second;20/minute, POST /auth/signup=10/minute, *=50/second;1000/minute"
+    rate_limit_storage_url: str = "memory://"  # redis://... shares counters between workers
+    rate_limit_strategy: str = "sliding-window-counter"
+    admission_route_limits: str = "POST /auth/login=4, GET /payments/=4, GET /analytics/*=4"
+    admission_max_concurrency: int = 32  # per worker; keep below the 40-thread threadpool
+    admission_max_queue_ms: float = 500  # shed (503) rather than queue longer than this
+
+    # tenant portal (see app/portal.py), cached in the read cache
+    me_cache_ttl_seconds: float = 30
+
+    # geographic search (see app/geo.py): /apartments/nearby and /within answer 400
+    # when their box holds more listings than this (shrink the radius, zoom in)
+    geo_max_candidates: int = 5000
+    geo_max_radius_m: float = 50_000
+
+    # maintenance photos (see app/photos.py)
+    photo_store_dir: str = "photos"  # content-addressed files; shared storage when there are several hosts
+    photo_max_bytes: int = 25 * 1024 * 1024  # per file
+    photo_max_files: int = 10  # per upload request
+    photo_thumbnail_sizes: str = "256,1024"  # longest side in pixels; the first is the default
+    photo_workers: int = 2  # Pillow processes per API worker
+    photo_accel_redirect: str = ""  # e.g. /protected-photos: let nginx send the file (X-Accel-Redirect)
+
+    # landlord monthly statements (see app/statements.py)
+    statement_workers: int = 4  # landlord ranges built in parallel (per shard)
+
+    # background jobs (see app/jobs.py). JOB_CONCURRENCY caps running jobs per
+    # worker process by kind: "kind=n" pairs, a trailing * matches a prefix.
+    job_concurrency: str = "email.*=4, *=2"
+    job_max_attempts: int = 8  # then the job is dead-lettered
+    job_backoff_seconds: float = 10  # doubles with every failed attempt
+    job_backoff_max_seconds: float = 3600
+    job_lease_seconds: float = 300  # a running job not finished by then is retried
+    job_poll_seconds: float = 1
+    job_retention_days: int = 7  # finished jobs kept this long
+
+    # outgoing email (see app/mail.py): file:///path writes .eml files, smtp://host:port,
+    # sendgrid:// uses SENDGRID_API_KEY; empty writes files to the temp directory
+    email_transport: str = ""
+    email_from: str = "no-reply@example.com"
+    sendgrid_api_key: str = ""
+
+    # bank statement reconciliation (see app/reconcile.py)
+    reconcile_window_days: int = 3
+    reconcile_report_limit: int = 1000
+
+    # background maintenance jobs
+    archive_after_days: int = 365
+    archive_batch_size: int = 500
+    change_retention_days: int = 30
+    lease_sweep_interval_seconds: float = 3600  # 0 disables the in-process sweeper
+    lease_sweep_batch_size: int = 1000
+
+    # startup
+    boot_time_budget_ms: float = 1000
+
+    def require_database_url(self) -> str:
+        if not self.database_url:
+            raise ValueError("DATABASE_URL not found in .env file")
+        return self.database_url
+
+    def require_jwt_secret_key(self) -> str:
+        if not self.jwt_secret_key:
+            raise ValueError("JWT_SECRET_KEY not found in .env file. Please set JWT_SECRET_KEY")
+        return self.jwt_secret_key
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        converters = {int: int, float: float, bool: _bool}
+        values = {}
+        for name, field in cls.__dataclass_fields__.items():
+            raw = os.getenv(name.upper())
+            if raw is not None:
+                values[name] = converters.get(field.type, str)(raw)
+        return cls(**values)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    load_dotenv()
+    return Settings.from_env()
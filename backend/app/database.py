@@ -1,30 +1,139 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+from typing import Dict
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.horizontal_shard import ShardedSession, execute_and_instances
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
+from .config import get_settings
+from .pool import engine_options, install_idle_pre_ping
+
+MAIN_SHARD = "main"
+
+
+def _create_engine(database_url: str, settings) -> Engine:
+    # Create engine with connection pooling (sizes, pre-ping and PgBouncer mode come from DB_* env vars)
+    engine = create_engine(database_url, **engine_options(database_url, settings))
+    install_idle_pre_ping(engine, settings)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
+
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """SHARD_URLS is "name=url,name=url"; the main database is always shard "main"."""
+    shards = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, sep, url = item.partition("=")
+        if not sep or not name.strip() or name.strip() == MAIN_SHARD:
+            raise ValueError(f"Bad SHARD_URLS entry {item!r}: expected name=url with a name other than 'main'")
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+@lru_cache
+def get_engine() -> Engine:
+    """
+    Create the engine on first use. Importing the app opens no connections and
+    reads no settings; the schema itself is managed by Alembic (see migrations/).
+    """
+    settings = get_settings()
+    engine = _create_engine(settings.require_database_url(), settings)
+    SessionLocal.configure(bind=engine)
+    if settings.shard_urls:
+        _configure_shards(engine, settings)
+    return engine
+
+
+def _configure_shards(main: Engine, settings):
+    global _shard_router
+    from .sharding import ShardRouter  # imports the models, which import this module
+
+    engines = {MAIN_SHARD: main}
+    for name, url in parse_shard_urls(settings.shard_urls).items():
+        engines[name] = _create_engine(url, settings)
+    _shard_router = ShardRouter(engines, settings)
+    ShardedSessionLocal.configure(
+        shards=engines,
+        shard_chooser=_shard_router.shard_chooser,
+        identity_chooser=_shard_router.identity_chooser,
+        execute_chooser=_shard_router.execute_chooser,
+    )
+
 
-# Database URL from environment
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in .env file")
+def get_shard_router():
+    """The ShardRouter when SHARD_URLS is set, else None."""
+    get_engine()
+    return _shard_router
 
-# Create engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=True  # Set to False in production
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores FOREIGN KEY clauses (including ON DELETE CASCADE) unless asked per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _execute_and_merge(orm_context):
+    # ShardedSession concatenates each shard's rows: a fanned-out COUNT/SUM/MIN/MAX becomes one row again
+    result = execute_and_instances(orm_context)
+    if not orm_context.is_select:
+        return result
+    from .sharding import aggregate_merges, merge_aggregate_rows
+
+    merges = aggregate_merges(orm_context.statement)
+    if merges is None:
+        return result
+    frozen = result.freeze()
+    if len(frozen.data) <= 1:
+        return frozen()
+    return frozen.with_new_rows([merge_aggregate_rows(frozen.data, merges)])()
+
+
+class RoutingSession(ShardedSession):
+    """ShardedSession whose unmapped statements (Core inserts, get_bind()) go to the main shard."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        event.remove(self, "do_orm_execute", execute_and_instances)
+        event.listen(self, "do_orm_execute", _execute_and_merge, retval=True)
+
+    def _choose_shard_and_assign(self, mapper, instance, **kw):
+        if mapper is None and instance is None:
+            return self.shard_chooser(None, None, **kw)
+        return super()._choose_shard_and_assign(mapper, instance, **kw)
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        if "bind" not in local_kw:
+            if self.kw.get("bind") is None:
+                get_engine()
+            if _shard_router is not None:
+                # same options, but every statement is routed to a landlord's shard (app/sharding.py)
+                return ShardedSessionLocal(**local_kw)
+        return super().__call__(**local_kw)
+
+
+_shard_router = None
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+ShardedSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+# Session-level listeners (the change feed) are registered on both factories
+SESSION_FACTORIES = (SessionLocal, ShardedSessionLocal)
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request):
+    # Sub-requests of POST /batch share the batch's session (and its identity map)
+    shared = request.scope.get("batch.db")
+    if shared is not None:
+        yield shared
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,168 @@
+# app/fulltext.py - ranked full-text search over maintenance request descriptions
+#
+# Postgres matches the description_tsv generated column (GIN index) with
+# websearch_to_tsquery and ranks with ts_rank_cd; SQLite matches the FTS5 table
+# maintenance_requests_fts and ranks with bm25. Both come from migration 0009.
+import html
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import column, func, literal_column, select, table
+from sqlalchemy.orm import Session, joinedload
+
+from . import models
+from .config import get_settings
+from .utils import get_many
+
+TEXT_SEARCH_CONFIG = "english"  # must match the generated column in 0009
+MARK_START, MARK_END = "<mark>", "</mark>"
+# what the database wraps matches in: private-use characters, swapped for the tags once the text is escaped
+_SEL_START, _SEL_END = "\ue000", "\ue001"
+
+_fts = table("maintenance_requests_fts", column("rowid"), column("description"))
+_FTS = literal_column("maintenance_requests_fts")
+_TSV = literal_column("maintenance_requests.description_tsv")
+_TOKEN = re.compile(r"(-?)(?:\"([^\"]*)\"|(\S+))")
+
+
+def fts5_query(q: str) -> Optional[str]:
+    """
+    websearch_to_tsquery's syntax for FTS5: words and "quoted phrases" must all
+    match, `or` separates alternatives and -word excludes. Every term is quoted,
+    so punctuation in user input can't produce an FTS5 syntax error.
+    """
+    groups: List[List[str]] = [[]]
+    excluded: List[str] = []
+    for negate, phrase, word in _TOKEN.findall(q):
+        if not phrase and word.lower() == "or" and not negate:
+            groups.append([])
+            continue
+        terms = re.findall(r"\w+", phrase or word)
+        if not terms:
+            continue
+        quoted = '"' + " ".join(terms) + '"'
+        (excluded if negate else groups[-1]).append(quoted)
+    alternatives = [" AND ".join(group) for group in groups if group]
+    if not alternatives:
+        return None
+    match = " OR ".join(f"({alt})" for alt in alternatives)
+    if excluded:
+        match = f"({match}) NOT ({' OR '.join(excluded)})"
+    return match
+
+
+def highlighted(snippet: Optional[str]) -> str:
+    """The database's snippet as HTML: the description escaped, only the matches wrapped in <mark>."""
+    return html.escape(snippet or "").replace(_SEL_START, MARK_START).replace(_SEL_END, MARK_END)
+
+
+def _filters(
+    status: Optional[models.MaintenanceStatus],
+    apartment_id: Optional[int],
+    tenant_id: Optional[int],
+    landlord_id: Optional[int],
+    start_date: Optional[date],
+    end_date: Optional[date],
+) -> List:
+    request = models.MaintenanceRequest
+    where = []
+    if status is not None:
+        where.append(request.status == status)
+    if apartment_id is not None:
+        where.append(request.apartment_id == apartment_id)
+    if tenant_id is not None:
+        where.append(request.tenant_id == tenant_id)
+    if landlord_id is not None:
+        where.append(request.apartment_id.in_(
+            select(models.Apartment.id).where(models.Apartment.landlord_id == landlord_id)
+        ))
+    if start_date is not None:
+        where.append(request.request_date >= start_date)
+    if end_date is not None:
+        where.append(request.request_date <= end_date)
+    return where
+
+
+def search_requests(
+    db: Session,
+    q: str,
+    status: Optional[models.MaintenanceStatus] = None,
+    apartment_id: Optional[int] = None,
+    tenant_id: Optional[int] = None,
+    landlord_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 20,
+) -> Dict:
+    """
+    Best matches for `q`, each with its rank and a snippet around the matched terms.
+
+    The index lookup and filters run in the database. Postgres ranks at most
+    MAINTENANCE_SEARCH_CANDIDATES matches, the most recent ones (request_date,
+    then id): for a common term the planner walks the (request_date, id) index
+    backwards and stops after that many, so a term that matches millions of
+    requests costs about the same as a rare one, and the same query always
+    ranks the same candidates. FTS5's bm25 is cheap enough to rank every match
+    and keep the best that many. When `capped` is true on Postgres, older
+    matches were not ranked: narrow the filters (e.g. start_date) until it is
+    false. Snippets are only built for the page returned, and are escaped HTML
+    in which only the matched terms are markup.
+    """
+    request = models.MaintenanceRequest
+    candidates = get_settings().maintenance_search_candidates
+    where = _filters(status, apartment_id, tenant_id, landlord_id, start_date, end_date)
+    postgres = db.get_bind().dialect.name == "postgresql"
+
+    if postgres:
+        query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+        stmt = (
+            select(request.id, func.ts_rank_cd(_TSV, query).label("rank"))
+            .where(_TSV.op("@@")(query), *where)
+            .order_by(request.request_date.desc(), request.id.desc())
+        )
+    else:
+        match = fts5_query(q)
+        if match is None:
+            return {"query": q, "capped": False, "hits": []}
+        # bm25 is lower for better matches
+        stmt = (
+            select(request.id, (-func.bm25(_FTS)).label("rank"))
+            .select_from(_fts.join(request.__table__, request.id == _fts.c.rowid))
+            .where(_FTS.op("MATCH")(match), *where)
+            .order_by(func.bm25(_FTS))
+        )
+    ranked = db.execute(stmt.limit(candidates)).all()  # each shard returns its own candidates
+    capped = len(ranked) >= candidates
+    ranked.sort(key=lambda row: (-row.rank, -row.id))
+    page = ranked[skip:skip + limit]
+    if not page:
+        return {"query": q, "capped": capped, "hits": []}
+
+    ids = [row.id for row in page]
+    if postgres:
+        options = f"StartSel={_SEL_START}, StopSel={_SEL_END}, MaxWords=30, MinWords=10, MaxFragments=2"
+        snippets = dict(db.execute(
+            select(request.id, func.ts_headline(TEXT_SEARCH_CONFIG, request.description, query, options))
+            .where(request.id.in_(ids))
+        ).all())
+    else:
+        snippets = dict(db.execute(
+            select(request.id, func.snippet(_FTS, 0, _SEL_START, _SEL_END, "…", 16))
+            .select_from(_fts.join(request.__table__, request.id == _fts.c.rowid))
+            .where(_FTS.op("MATCH")(match), request.id.in_(ids))
+        ).all())
+    requests = {r.id: r for r in get_many(
+        db, request, ids,
+        joinedload(request.apartment).joinedload(models.Apartment.landlord),
+        joinedload(request.tenant).joinedload(models.Tenant.user),
+    )}
+    return {
+        "query": q,
+        "capped": capped,
+        "hits": [
+            {"request": requests[row.id], "rank": float(row.rank), "snippet": highlighted(snippets.get(row.id))}
+            for row in page if row.id in requests
+        ],
+    }
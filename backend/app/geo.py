@@ -0,0 +1,176 @@
+# app/geo.py - apartments near a point or inside a map viewport
+#
+# Coordinates are copied into the apartment_listings read model together with
+# a geocell: latitude and longitude quantized to GEOCELL_BITS each and
+# bit-interleaved (a Z-order / Morton code, the integer form of a geohash). A
+# cell at any coarser level is then one contiguous geocell range, so a box is
+# covered by at most nine ranges of the btree index on geocell: a few
+# logarithmic range scans, plus the rows in those cells, whatever the table
+# size. The exact latitude/longitude test, the status/price filters and (for
+# /nearby) the great-circle distance are applied to those candidates only, and
+# a search whose box holds more than GEO_MAX_CANDIDATES listings is refused
+# (zoom in / shrink the radius) rather than allowed to degrade into a scan.
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, case, or_, select
+from sqlalchemy.orm import Session
+
+from . import listings, models
+
+GEOCELL_BITS = 26  # per axis: finest cells are ~0.6 m tall
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def _spread(v: int) -> int:
+    """Insert a zero bit above every bit of a 32-bit value."""
+    v &= 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+
+def _quantize(value: float, low: float, span: float) -> int:
+    return min((1 << GEOCELL_BITS) - 1, max(0, int((value - low) / span * (1 << GEOCELL_BITS))))
+
+
+def geocell(latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+    if latitude is None or longitude is None:
+        return None
+    return _spread(_quantize(longitude, -180, 360)) | (_spread(_quantize(latitude, -90, 180)) << 1)
+
+
+def cell_ranges(south: float, west: float, north: float, east: float) -> List[Tuple[int, int]]:
+    """Inclusive geocell ranges covering the box; west > east crosses the antimeridian."""
+    if west > east:
+        return _merge(cell_ranges(south, west, north, 180) + cell_ranges(south, -180, north, east))
+    # the finest level whose cells are at least half the box on both axes: at most 3 x 3 of them
+    level = GEOCELL_BITS
+    for extent, span in ((north - south, 180), (east - west, 360)):
+        if extent > 0:
+            level = min(level, int(math.log2(span / extent)) + 1)
+    shift = GEOCELL_BITS - max(0, level)
+    x0, x1 = _quantize(west, -180, 360) >> shift, _quantize(east, -180, 360) >> shift
+    y0, y1 = _quantize(south, -90, 180) >> shift, _quantize(north, -90, 180) >> shift
+    ranges = []
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            code = _spread(x) | (_spread(y) << 1)
+            ranges.append((code << 2 * shift, ((code + 1) << 2 * shift) - 1))
+    return _merge(ranges)
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def circle_box(latitude: float, longitude: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) around a circle; a circle reaching a pole spans every longitude."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    south, north = latitude - dlat, latitude + dlat
+    if south <= -90 or north >= 90:
+        return max(south, -90), -180, min(north, 90), 180
+    dlon = math.degrees(math.asin(min(1.0, math.sin(radius_m / EARTH_RADIUS_M) / math.cos(math.radians(latitude)))))
+    if dlon >= 180:
+        return south, -180, north, 180
+    west, east = longitude - dlon, longitude + dlon
+    # wrap into [-180, 180]; west > east then means the box crosses the antimeridian
+    return south, (west + 540) % 360 - 180, north, (east + 540) % 360 - 180
+
+
+def _in_box(south: float, west: float, north: float, east: float) -> List:
+    listing = models.ApartmentListing
+    ranges = cell_ranges(south, west, north, east)
+    longitude = (listing.longitude.between(west, east) if west <= east
+                 else or_(listing.longitude >= west, listing.longitude <= east))
+    return [
+        or_(*(listing.geocell.between(low, high) for low, high in ranges)),
+        listing.latitude.between(south, north),
+        longitude,
+    ]
+
+
+def candidates(db: Session, box: Tuple[float, float, float, float], max_candidates: int, **filters) -> Optional[List]:
+    """
+    (apartment_id, latitude, longitude, geocell, document) of the listings in
+    `box` that pass the listing filters; None when the box holds more than
+    `max_candidates` listings. The filters are selected as a flag rather than
+    put in the WHERE clause: a planner without statistics (SQLite until
+    ANALYZE) would scan the status index instead of the geocell ranges.
+    """
+    listing = models.ApartmentListing
+    conditions = listings.listing_filters(**filters)
+    columns = [listing.apartment_id, listing.latitude, listing.longitude, listing.geocell, listing.document]
+    if conditions:
+        columns.append(case((and_(*conditions), True), else_=False).label("matches"))
+    rows = db.execute(select(*columns).where(*_in_box(*box)).limit(max_candidates + 1)).all()
+    if len(rows) > max_candidates:
+        return None
+    return [row[:5] for row in rows if not conditions or row.matches]
+
+
+def within(
+    db: Session,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    skip: int,
+    limit: int,
+    max_candidates: int,
+    **filters,
+) -> Optional[List[str]]:
+    """Documents of the listings in a viewport, in geocell order (neighbours stay together across pages)."""
+    rows = candidates(db, (south, west, north, east), max_candidates, **filters)
+    if rows is None:
+        return None
+    rows.sort(key=lambda row: (row[3], row[0]))
+    return [row[4] for row in rows[skip:skip + limit]]
+
+
+def nearby(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    skip: int,
+    limit: int,
+    max_candidates: int,
+    **filters,
+) -> Optional[List[Tuple[str, float]]]:
+    """
+    (document, distance in meters) of listings within `radius_m`, nearest first.
+    None when more than `max_candidates` listings fall in the circle's box.
+    """
+    rows = candidates(db, circle_box(latitude, longitude, radius_m), max_candidates, **filters)
+    if rows is None:
+        return None
+    hits = []
+    for apartment_id, lat, lon, _, document in rows:
+        distance = distance_m(latitude, longitude, lat, lon)
+        if distance <= radius_m:
+            hits.append((distance, apartment_id, document))
+    hits.sort()
+    return [(document, distance) for distance, _, document in hits[skip:skip + limit]]
+
+
+def render_nearby(hits: List[Tuple[str, float]]) -> str:
+    """JSON array of the stored documents, each with its distance_m appended."""
+    return "[" + ",".join(f'{document[:-1]},"distance_m":{distance:.1f}}}' for document, distance in hits) + "]"
@@ -0,0 +1,121 @@
+# app/geocode.py - load apartment coordinates from an offline geocoding file
+#
+#   python -m app.geocode locations.csv [--dry-run] [--overwrite]
+#
+# The CSV has latitude and longitude columns plus either apartment_id or
+# address; addresses are matched case- and whitespace-insensitively, and one
+# address shared by several apartments sets them all. No geocoding service is
+# called: the file comes from whatever batch geocoder or export produced it.
+# Apartments are updated through the ORM in chunks, so each one gets a new
+# version, a change event and a rewritten listing (with its geocell) exactly
+# as for an API update.
+import argparse
+import csv
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from . import cache, listings, models  # noqa: F401  (their session hooks: listings, change events, invalidation)
+from .database import SessionLocal
+
+BATCH_SIZE = 500
+
+
+def normalize_address(address: str) -> str:
+    return re.sub(r"[\s,]+", " ", address).strip().lower()
+
+
+def _coordinates(row: Dict[str, str]) -> Optional[Tuple[float, float]]:
+    try:
+        latitude, longitude = float(row["latitude"]), float(row["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def read_locations(path: str) -> Tuple[Dict[int, Tuple[float, float]], Dict[str, Tuple[float, float]], int]:
+    """(coordinates by apartment id, coordinates by normalized address, rows rejected)."""
+    by_id: Dict[int, Tuple[float, float]] = {}
+    by_address: Dict[str, Tuple[float, float]] = {}
+    rejected = 0
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            coordinates = _coordinates(row)
+            apartment_id = (row.get("apartment_id") or "").strip()
+            address = normalize_address(row.get("address") or "")
+            if coordinates is None or not (apartment_id.isdigit() or address):
+                print(f"Line {line}: skipped, needs latitude, longitude and apartment_id or address")
+                rejected += 1
+            elif apartment_id.isdigit():
+                by_id[int(apartment_id)] = coordinates
+            else:
+                by_address[address] = coordinates
+    return by_id, by_address, rejected
+
+
+def apply_locations(
+    by_id: Dict[int, Tuple[float, float]],
+    by_address: Dict[str, Tuple[float, float]],
+    overwrite: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Set apartment coordinates; apartment_id rows win over address rows for the same apartment."""
+    counts = defaultdict(int)
+    db = SessionLocal()
+    try:
+        targets: Dict[int, Tuple[float, float]] = {}
+        if by_address:
+            rows = db.execute(select(models.Apartment.id, models.Apartment.address)).all()
+            for apartment_id, address in rows:
+                coordinates = by_address.get(normalize_address(address or ""))
+                if coordinates is not None:
+                    targets[apartment_id] = coordinates
+        targets.update(by_id)
+
+        ids: List[int] = sorted(targets)
+        for start in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[start:start + BATCH_SIZE]
+            apartments = db.scalars(select(models.Apartment).where(models.Apartment.id.in_(chunk))).all()
+            counts["missing"] += len(chunk) - len(apartments)
+            for apartment in apartments:
+                latitude, longitude = targets[apartment.id]
+                if (apartment.latitude, apartment.longitude) == (latitude, longitude):
+                    counts["unchanged"] += 1
+                elif apartment.latitude is not None and not overwrite:
+                    counts["kept"] += 1
+                else:
+                    apartment.latitude, apartment.longitude = latitude, longitude
+                    counts["updated"] += 1
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            db.expunge_all()
+    finally:
+        db.close()
+    return dict(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import apartment coordinates from a geocoding CSV")
+    parser.add_argument("path", help="CSV with latitude, longitude and apartment_id or address columns")
+    parser.add_argument("--overwrite", action="store_true", help="replace coordinates apartments already have")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    by_id, by_address, rejected = read_locations(args.path)
+    counts = apply_locations(by_id, by_address, overwrite=args.overwrite, dry_run=args.dry_run)
+    print(("Would update" if args.dry_run else "Updated") + f" {counts.get('updated', 0)} apartments: "
+          f"{counts.get('unchanged', 0)} unchanged, {counts.get('kept', 0)} kept (use --overwrite), "
+          f"{counts.get('missing', 0)} ids not found, {rejected} rows rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# app/imaging.py - Pillow work for app/photos.py, run in its process pool
+#
+# Kept apart from app/photos.py so the pool's (spawned) processes import only
+# this module and Pillow, not the web app. Everything here takes and returns
+# paths and plain values: images never cross the process boundary.
+import os
+from typing import Iterable, NamedTuple
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_QUALITY = 85
+
+
+class ImageInfo(NamedTuple):
+    content_type: str
+    width: int
+    height: int
+
+
+def _save_thumbnail(image: Image.Image, path: str, size: int):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+    if thumbnail.mode not in ("RGB", "L"):
+        thumbnail = thumbnail.convert("RGB")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    thumbnail.save(tmp, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    os.replace(tmp, path)  # readers never see a partial thumbnail
+
+
+def inspect_image(path: str, thumbnails: Iterable = ()) -> ImageInfo:
+    """
+    Decode the image at `path` (raising if it is not one Pillow can read) and
+    write the (size, path) thumbnails: JPEGs no larger than size x size, turned
+    upright by their EXIF orientation and without any of the original's
+    metadata.
+    """
+    with Image.open(path) as image:
+        content_type = Image.MIME.get(image.format)
+        if content_type is None:
+            raise ValueError(f"unsupported image format {image.format}")
+        image.load()  # decodes every pixel: truncated or corrupt files fail here
+        upright = ImageOps.exif_transpose(image)
+        for size, thumbnail_path in thumbnails:
+            _save_thumbnail(upright, thumbnail_path, size)
+        return ImageInfo(content_type, upright.width, upright.height)
+
+
+def make_thumbnail(path: str, size: int, thumbnail_path: str):
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))  # JPEG: decode at reduced scale when that is enough
+        _save_thumbnail(ImageOps.exif_transpose(image), thumbnail_path, size)
@@ -0,0 +1,294 @@
+# app/jobs.py - durable background jobs stored in the app database
+#
+# A request that wants a slow side effect (an email, a webhook) calls enqueue()
+# before it commits: the job row is one more INSERT in the same transaction,
+# so it exists exactly when the write does and the request never waits for
+# the side effect itself. Worker processes (`python -m app.jobs work`) claim
+# due jobs with
+#
+#   UPDATE jobs SET status = 'running', ... WHERE id IN
+#     (SELECT id FROM jobs WHERE <due> ORDER BY run_at LIMIT n FOR UPDATE SKIP LOCKED)
+#
+# so any number of workers share the queue without blocking each other.
+# SQLite has no row locks and drops the FOR UPDATE; its single writer makes
+# the UPDATE atomic anyway.
+#
+# A failed job goes back to the queue with exponential backoff (plus jitter)
+# and is dead-lettered (status "dead", kept with its last error) after
+# JOB_MAX_ATTEMPTS. A claim is a lease: a job whose worker died is claimed
+# again once JOB_LEASE_SECONDS pass, so delivery is at least once and
+# handlers must tolerate running twice. JOB_CONCURRENCY caps how many jobs of
+# each kind one worker process runs at a time.
+import argparse
+import os
+import random
+import signal
+import socket
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.engine import Engine
+
+from . import models
+from .config import Settings, get_settings
+from .database import get_engine
+
+QUEUED, RUNNING, DONE, DEAD = "queued", "running", "done", "dead"
+PURGE_BATCH = 5000
+
+_handlers: Dict[str, Callable[[Dict], None]] = {}
+
+
+def job(kind: str):
+    """Register the handler for a job kind; it is called with the job's payload."""
+    def register(fn: Callable[[Dict], None]):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db, kind: str, payload: Dict, delay_seconds: float = 0):
+    """Queue a job in `db`'s transaction: it runs only if the transaction commits."""
+    enqueue_many(db, kind, [payload], delay_seconds)
+
+
+def enqueue_many(db, kind: str, payloads: Iterable[Dict], delay_seconds: float = 0):
+    run_at = _now() + timedelta(seconds=delay_seconds)
+    rows = [{"kind": kind, "payload": payload, "status": QUEUED, "attempts": 0, "run_at": run_at}
+            for payload in payloads]
+    if rows:
+        db.execute(insert(models.Job.__table__), rows)
+
+
+def _parse_limits(spec: str) -> List[Tuple[str, int]]:
+    limits = []
+    for part in spec.split(","):
+        pattern, sep, value = part.strip().partition("=")
+        if sep:
+            limits.append((pattern.strip(), int(value)))
+    return limits
+
+
+def limit_for(limits: List[Tuple[str, int]], kind: str) -> int:
+    """Concurrency for a kind: the first "kind=n" or "prefix*=n" rule that matches, else 1."""
+    for pattern, limit in limits:
+        if pattern == kind or pattern == "*" or (pattern.endswith("*") and kind.startswith(pattern[:-1])):
+            return limit
+    return 1
+
+
+def backoff_seconds(attempts: int, settings: Settings) -> float:
+    """Delay before retry number `attempts`: doubling from JOB_BACKOFF_SECONDS, capped, with jitter."""
+    delay = min(settings.job_backoff_max_seconds, settings.job_backoff_seconds * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    def __init__(self, engine: Optional[Engine] = None, settings: Optional[Settings] = None,
+                 kinds: Optional[Iterable[str]] = None):
+        self.engine = engine or get_engine()
+        self.settings = settings or get_settings()
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        limits = _parse_limits(self.settings.job_concurrency)
+        self.limits = {kind: limit_for(limits, kind) for kind in (kinds or _handlers)}
+        self.running = Counter()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()  # a slot freed up, or stop() was called
+        self.pool = ThreadPoolExecutor(max_workers=max(1, sum(self.limits.values())), thread_name_prefix="job")
+        self.counts = Counter()
+
+    def claim(self, kind: str, count: int) -> List:
+        """Lease up to `count` due jobs of one kind to this worker."""
+        table = models.Job.__table__
+        now = _now()
+        due = (
+            select(table.c.id)
+            .where(
+                table.c.kind == kind,
+                or_(
+                    and_(table.c.status == QUEUED, table.c.run_at <= now),
+                    and_(table.c.status == RUNNING, table.c.locked_until < now),  # its worker died
+                ),
+            )
+            .order_by(table.c.run_at)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(
+                update(table)
+                .where(table.c.id.in_(due.scalar_subquery()))
+                .values(
+                    status=RUNNING,
+                    attempts=table.c.attempts + 1,
+                    locked_by=self.name,
+                    locked_until=now + timedelta(seconds=self.settings.job_lease_seconds),
+                )
+                .returning(table.c.id, table.c.kind, table.c.payload, table.c.attempts)
+            ).all()
+
+    def _finish(self, job_id: int, **values):
+        table = models.Job.__table__
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status == RUNNING, table.c.locked_by == self.name)
+                .values(locked_by=None, locked_until=None, **values)
+            ).rowcount
+        if not updated:
+            print(f"Job {job_id}: lease lost before it finished; another worker has retried it")
+
+    def _count(self, outcome: str):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def execute(self, row):
+        job_id, kind, payload, attempts = row
+        try:
+            try:
+                _handlers[kind](payload)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempts >= self.settings.job_max_attempts:
+                    print(f"Job {job_id} ({kind}) dead after {attempts} attempts: {error}")
+                    self._finish(job_id, status=DEAD, last_error=error, finished_at=_now())
+                    self._count(DEAD)
+                else:
+                    delay = backoff_seconds(attempts, self.settings)
+                    print(f"Job {job_id} ({kind}) attempt {attempts} failed, retrying in {delay:.0f} s: {error}")
+                    self._finish(job_id, status=QUEUED, last_error=error,
+                                 run_at=_now() + timedelta(seconds=delay))
+                    self._count("retried")
+                return
+            self._finish(job_id, status=DONE, finished_at=_now())
+            self._count(DONE)
+        except Exception as e:
+            print(f"Job {job_id} ({kind}): could not record the outcome: {e}")
+        finally:
+            with self.lock:
+                self.running[kind] -= 1
+            self.wakeup.set()
+
+    def poll(self) -> int:
+        """Claim and start as many due jobs as every kind has free slots for; returns how many."""
+        started = 0
+        for kind, limit in self.limits.items():
+            with self.lock:
+                free = limit - self.running[kind]
+            if free <= 0 or self.stopping.is_set():
+                continue
+            for row in self.claim(kind, free):
+                with self.lock:
+                    self.running[kind] += 1
+                self.pool.submit(self.execute, row)
+                started += 1
+        return started
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def busy(self) -> bool:
+        with self.lock:
+            return any(self.running.values())
+
+    def run(self, drain: bool = False):
+        """Poll until stopped (SIGTERM/SIGINT); with `drain`, until no job is due or running."""
+        try:
+            while not self.stopping.is_set():
+                self.wakeup.clear()
+                try:
+                    started = self.poll()
+                except Exception as e:
+                    print(f"Job poll failed: {e}")
+                    started = 0
+                if drain and not started and not self.busy():
+                    break
+                if not started:
+                    # sleep until the next poll, or until a running job frees its slot
+                    self.wakeup.wait(self.settings.job_poll_seconds if not drain else 0.05)
+        finally:
+            self.pool.shutdown(wait=True)  # let running jobs finish
+
+
+def queue_status(engine: Optional[Engine] = None) -> List[Dict]:
+    table = models.Job.__table__
+    with (engine or get_engine()).connect() as conn:
+        rows = conn.execute(
+            select(table.c.kind, table.c.status, func.count(), func.min(table.c.run_at))
+            .group_by(table.c.kind, table.c.status)
+            .order_by(table.c.kind, table.c.status)
+        ).all()
+    return [{"kind": kind, "status": status, "jobs": count, "oldest_run_at": oldest} for kind, status, count, oldest in rows]
+
+
+def retry_dead(kind: Optional[str] = None, engine: Optional[Engine] = None) -> int:
+    """Put dead-lettered jobs back in the queue with a fresh set of attempts."""
+    table = models.Job.__table__
+    stmt = update(table).where(table.c.status == DEAD)
+    if kind:
+        stmt = stmt.where(table.c.kind == kind)
+    with (engine or get_engine()).begin() as conn:
+        return conn.execute(
+            stmt.values(status=QUEUED, attempts=0, run_at=_now(), finished_at=None)
+        ).rowcount
+
+
+def purge(older_than_days: Optional[int] = None, engine: Optional[Engine] = None) -> int:
+    """Delete finished jobs older than the retention window, in bounded batches. Dead jobs stay."""
+    if older_than_days is None:
+        older_than_days = get_settings().job_retention_days
+    table = models.Job.__table__
+    cutoff = _now() - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        batch = select(table.c.id).where(table.c.status == DONE, table.c.finished_at < cutoff).limit(PURGE_BATCH)
+        with (engine or get_engine()).begin() as conn:
+            deleted = conn.execute(delete(table).where(table.c.id.in_(batch.scalar_subquery()))).rowcount
+        total += deleted
+        if deleted < PURGE_BATCH:
+            return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker and queue administration")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("work", help="run jobs until stopped")
+    work.add_argument("--drain", action="store_true", help="exit once nothing is due or running")
+    sub.add_parser("status", help="jobs per kind and status")
+    retry = sub.add_parser("retry-dead", help="requeue dead-lettered jobs")
+    retry.add_argument("--kind", default=None)
+    clean = sub.add_parser("purge", help="delete finished jobs past JOB_RETENTION_DAYS")
+    clean.add_argument("--days", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "work":
+        from . import notifications  # noqa: F401  (registers the email handlers)
+
+        worker = Worker()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+        print(f"Job worker {worker.name}: {', '.join(f'{k}={n}' for k, n in worker.limits.items())}")
+        worker.run(drain=args.drain)
+        print(f"Job worker {worker.name} stopped: {dict(worker.counts)}")
+    elif args.command == "status":
+        for row in queue_status():
+            print("  ".join(f"{key}={value}" for key, value in row.items()))
+    elif args.command == "retry-dead":
+        print(f"Requeued {retry_dead(args.kind)} dead jobs")
+    elif args.command == "purge":
+        print(f"Deleted {purge(args.days)} finished jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# app/listings.py - apartment_listings, the read model GET /apartments/ is served from
+#
+# Each row holds the ApartmentResponse document exactly as the API returns it, so
+# a listing request is one indexed scan whose text is joined into the response
+# body: no join with users, no ORM objects, no pydantic. Documents are rewritten
+# in the transaction of every write that changes them (session hooks below for
+# ORM writes, refresh_listings() for bulk statements) and the whole table can be
+# rebuilt with `python -m app.listings --rebuild`.
+import argparse
+import itertools
+import json
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, exists, inspect, select
+from sqlalchemy.orm import Session
+
+from . import geo, models, schemas
+from .database import SESSION_FACTORIES, SessionLocal
+
+BATCH_SIZE = 1000
+
+
+def _apartment_rows():
+    apartment = models.Apartment
+    occupied = exists().where(
+        models.Rental.apartment_id == apartment.id,
+        models.Rental.status == models.RentalStatus.active,
+    )
+    return select(
+        apartment.id, apartment.name, apartment.address, apartment.rent_price, apartment.description,
+        apartment.status, apartment.landlord_id, apartment.created_at, apartment.version,
+        apartment.latitude, apartment.longitude, occupied.label("occupied"),
+    )
+
+
+def _listings(db: Session, rows) -> List[Dict]:
+    usernames = dict(db.execute(
+        select(models.User.id, models.User.username).where(models.User.id.in_({r.landlord_id for r in rows}))
+    ).all())
+    listings = []
+    for row in rows:
+        status = row.status.value if row.status is not None else None
+        document = schemas.ApartmentResponse.model_validate({
+            **row._mapping,
+            "status": status,
+            "landlord": {"id": row.landlord_id, "username": usernames[row.landlord_id]}
+            if row.landlord_id in usernames else None,
+        }).model_dump(mode="json")
+        listings.append({
+            "apartment_id": row.id,
+            "landlord_id": row.landlord_id,
+            "status": status,
+            "rent_price": row.rent_price,
+            "occupied": bool(row.occupied),
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "geocell": geo.geocell(row.latitude, row.longitude),
+            # same encoding as FastAPI's JSONResponse
+            "document": json.dumps(document, ensure_ascii=False, separators=(",", ":")),
+        })
+    return listings
+
+
+def refresh_listings(db: Session, apartment_ids: Iterable[int]) -> int:
+    """
+    Rewrite the listings of these apartments from the live tables, dropping those
+    of deleted apartments. Call inside the transaction that changed them.
+    """
+    ids = sorted({i for i in apartment_ids if i is not None})
+    table = models.ApartmentListing.__table__
+    written = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        listings = _listings(db, db.execute(_apartment_rows().where(models.Apartment.id.in_(chunk))).all())
+        db.execute(delete(table).where(table.c.apartment_id.in_(chunk)))
+        if listings:
+            db.execute(table.insert(), listings)
+        written += len(listings)
+    return written
+
+
+def rebuild(db: Session) -> int:
+    """Recreate every listing from the live tables (after the migration, or to repair drift)."""
+    table = models.ApartmentListing.__table__
+    db.execute(delete(table))
+    written = 0
+    rows = db.execute(_apartment_rows().execution_options(yield_per=BATCH_SIZE))
+    for chunk in rows.partitions(BATCH_SIZE):
+        listings = _listings(db, chunk)
+        db.execute(table.insert(), listings)
+        written += len(listings)
+    db.commit()
+    return written
+
+
+def listing_filters(
+    landlord_id: Optional[int] = None,
+    status: Optional[str] = None,
+    min_rent: Optional[float] = None,
+    max_rent: Optional[float] = None,
+    occupied: Optional[bool] = None,
+) -> List:
+    """Conditions on apartment_listings for the listing filters that are set."""
+    listing = models.ApartmentListing
+    conditions = []
+    if landlord_id is not None:
+        conditions.append(listing.landlord_id == landlord_id)
+    if status is not None:
+        conditions.append(listing.status == status)
+    if min_rent is not None:
+        conditions.append(listing.rent_price >= Decimal(str(min_rent)))
+    if max_rent is not None:
+        conditions.append(listing.rent_price <= Decimal(str(max_rent)))
+    if occupied is not None:
+        conditions.append(listing.occupied.is_(occupied))
+    return conditions
+
+
+def listing_query(
+    landlord_id: Optional[int] = None,
+    status: Optional[str] = None,
+    min_rent: Optional[float] = None,
+    max_rent: Optional[float] = None,
+    occupied: Optional[bool] = None,
+):
+    listing = models.ApartmentListing
+    return select(listing.document).order_by(listing.apartment_id)\
+        .where(*listing_filters(landlord_id, status, min_rent, max_rent, occupied))
+
+
+def render_listings(db: Session, stmt, skip: int, limit: int) -> str:
+    """The listing page as a JSON array, stitched together from the stored documents."""
+    return "[" + ",".join(db.scalars(stmt.offset(skip).limit(limit))) + "]"
+
+
+# --- keeping listings current for ORM writes
+
+
+def _changed(obj, *keys) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def _stale_before_flush(session: Session, flush_context, instances):
+    # A deleted tenant takes its rentals with it through ON DELETE CASCADE; their
+    # apartments can only be found before the DELETE is emitted
+    tenant_ids = [obj.id for obj in session.deleted if isinstance(obj, models.Tenant)]
+    if tenant_ids:
+        session.info.setdefault("stale_listings", set()).update(session.scalars(
+            select(models.Rental.apartment_id).where(
+                models.Rental.tenant_id.in_(tenant_ids), models.Rental.status == models.RentalStatus.active
+            )
+        ))
+
+
+def _refresh_after_flush(session: Session, flush_context):
+    stale: Set[int] = session.info.pop("stale_listings", set())
+    renamed = []
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.Apartment):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            stale.add(obj.id)
+        elif isinstance(obj, models.Rental):
+            if obj in session.dirty and not _changed(obj, "status", "apartment_id"):
+                continue
+            history = inspect(obj).attrs.apartment_id.history
+            stale.update(history.deleted or ())
+            stale.add(obj.apartment_id)
+        elif isinstance(obj, models.User) and obj in session.dirty and _changed(obj, "username"):
+            renamed.append(obj.id)
+    if renamed:
+        stale.update(session.scalars(select(models.Apartment.id).where(models.Apartment.landlord_id.in_(renamed))))
+    if stale:
+        refresh_listings(session, stale)
+
+
+for _factory in SESSION_FACTORIES:
+    event.listen(_factory, "before_flush", _stale_before_flush)
+    event.listen(_factory, "after_flush", _refresh_after_flush)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apartment listing read model")
+    parser.add_argument("--rebuild", action="store_true", help="recreate every listing from the live tables")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(db)} apartment listings")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
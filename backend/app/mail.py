@@ -0,0 +1,112 @@
+# app/mail.py - outgoing email through a pluggable transport
+#
+# EMAIL_TRANSPORT picks where messages go:
+#   file:///var/mail/outbox   one .eml file per message (tests and local development)
+#   smtp://host:port          plain SMTP, e.g. a local MailHog/smtp4dev
+#   sendgrid://               the SendGrid API with SENDGRID_API_KEY
+# Empty means file:// in the temp directory. Sending is only ever done from
+# background jobs (app/notifications.py), never inside a request.
+import os
+import smtplib
+import tempfile
+import time
+import uuid
+from email.message import EmailMessage
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+from .config import Settings, get_settings
+
+try:
+    import sendgrid
+    from sendgrid.helpers.mail import Mail
+except ImportError:  # optional
+    sendgrid = None
+
+
+class Message(NamedTuple):
+    to: str
+    subject: str
+    body: str
+
+
+def _mime(message: Message, sender: str) -> EmailMessage:
+    mime = EmailMessage()
+    mime["From"] = sender
+    mime["To"] = message.to
+    mime["Subject"] = message.subject
+    mime.set_content(message.body)
+    return mime
+
+
+class FileTransport:
+    def __init__(self, directory: str, sender: str):
+        self.directory = directory
+        self.sender = sender
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message: Message):
+        path = os.path.join(self.directory, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml")
+        with open(path, "wb") as handle:
+            handle.write(bytes(_mime(message, self.sender)))
+
+
+class SmtpTransport:
+    def __init__(self, host: str, port: int, sender: str):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send(self, message: Message):
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.send_message(_mime(message, self.sender))
+
+
+class SendGridTransport:
+    def __init__(self, api_key: str, sender: str):
+        if sendgrid is None:
+            raise ValueError("EMAIL_TRANSPORT=sendgrid:// needs the sendgrid package")
+        if not api_key:
+            raise ValueError("EMAIL_TRANSPORT=sendgrid:// needs SENDGRID_API_KEY")
+        self.client = sendgrid.SendGridAPIClient(api_key)
+        self.sender = sender
+
+    def send(self, message: Message):
+        response = self.client.send(Mail(
+            from_email=self.sender, to_emails=message.to, subject=message.subject, plain_text_content=message.body,
+        ))
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid answered {response.status_code}: {response.body}")
+
+
+def make_transport(settings: Optional[Settings] = None):
+    settings = settings or get_settings()
+    url = urlparse(settings.email_transport or "file://" + os.path.join(tempfile.gettempdir(), "apartment-rental-mail"))
+    if url.scheme == "file":
+        return FileTransport(url.path, settings.email_from)
+    if url.scheme == "smtp":
+        return SmtpTransport(url.hostname or "localhost", url.port or 25, settings.email_from)
+    if url.scheme == "sendgrid":
+        return SendGridTransport(settings.sendgrid_api_key, settings.email_from)
+    raise ValueError(f"Unknown EMAIL_TRANSPORT {settings.email_transport!r}")
+
+
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = make_transport()
+    return _transport
+
+
+def set_transport(transport):
+    """Swap the transport (anything with send(Message)); returns the previous one."""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
+def send(message: Message):
+    get_transport().send(message)
@@ -1,17 +1,61 @@
 # main.py - Enhanced version
-from fastapi import FastAPI, Depends
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 
 from app import models
-from .database import engine, Base
+from .config import get_settings
+from .database import get_engine
+from .compression import CompressionMiddleware
+from .admission import AdmissionMiddleware, admission_metrics
+from .pool import pool_metrics
+from . import photos
+from .sweeper import run_periodically
 from .routers import auth, users
 from .routers.auth import get_current_active_user  # Import auth dependency
-from .routers import apartments, tenants, rentals, payments, maintenance
+from .routers import apartments, tenants, rentals, payments, maintenance, changes, batch, analytics, me, statements
 from sqlalchemy.orm import Session
-# Create tables
-Base.metadata.create_all(bind=engine)
+import os
+
+# Tables are no longer created here: run `alembic upgrade head` (see migrations/) before starting workers.
+_import_ms = (time.perf_counter() - _import_started) * 1000
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    settings = get_settings()
+    get_engine()  # builds the pool; connections are opened lazily on first checkout
+    boot_ms = (time.perf_counter() - started) * 1000
+    total_ms = _import_ms + boot_ms
+    app.state.boot_timings = {"import_ms": round(_import_ms, 1), "startup_ms": round(boot_ms, 1)}
+    print(f"Worker {os.getpid()} ready in {total_ms:.0f} ms (import {_import_ms:.0f} ms, startup {boot_ms:.0f} ms)")
+    if total_ms > settings.boot_time_budget_ms:
+        print(f"WARNING: boot took {total_ms:.0f} ms, over the {settings.boot_time_budget_ms:.0f} ms budget")
+
+    # Every worker runs the loop; the leader lock makes sure only one of them actually sweeps
+    sweeper = None
+    if settings.lease_sweep_interval_seconds > 0:
+        sweeper = asyncio.create_task(run_periodically(settings.lease_sweep_interval_seconds))
+    yield
+    if sweeper is not None:
+        sweeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweeper
+    photos.shutdown()  # the Pillow process pool, if any upload started it
+
 
-app = FastAPI(title="Apartment Rental API", version="1.0.0")
+app = FastAPI(title="Apartment Rental API", version="1.0.0", lifespan=lifespan)
+
+# Innermost, so its 429/503 responses still get CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 # CORS
 app.add_middleware(
@@ -21,6 +65,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+
+# An UPDATE ... WHERE id = ? AND version = ? matched nothing: another request
+# updated (or deleted) the row after this one read it. See utils.check_if_match.
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    print(f"Optimistic concurrency conflict on {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        content={"detail": "Modified by another request; reload it and retry"},
+    )
+
 
 # Include routers with auth dependencies for protected routes
 app.include_router(auth.router)  # Auth routes are public
@@ -30,6 +87,11 @@ app.include_router(tenants.router)
 app.include_router(rentals.router)
 app.include_router(payments.router)
 app.include_router(maintenance.router)
+app.include_router(changes.router)
+app.include_router(batch.router)
+app.include_router(analytics.router)
+app.include_router(me.router)
+app.include_router(statements.router)
 
 @app.get("/")
 def read_root():
@@ -39,6 +101,16 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/pool")
+def pool_health():
+    # Per-worker numbers: each uvicorn worker process has its own pool
+    return {"pid": os.getpid(), **pool_metrics(get_engine())}
+
+@app.get("/health/admission")
+def admission_health():
+    # Per-worker too: every worker has its own gates (and, with memory://, rate counters)
+    return {"pid": os.getpid(), **admission_metrics()}
+
 def seed_roles(db: Session):
     roles = ["Admin", "Landlord", "Tenant"]
     for i, name in enumerate(roles, start=1):
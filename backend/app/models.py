@@ -3,13 +3,20 @@ import enum
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
+    Boolean,
     String,
     Text,
     Date,
     DateTime,
     DECIMAL,
+    Float,
+    JSON,
     ForeignKey,
+    Index,
+    UniqueConstraint,
     func,
+    text,
     Enum as SQLEnum,   # use this for DB enum columns
 )
 from sqlalchemy.orm import relationship
@@ -61,8 +68,11 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
-    role_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
+    role_id = Column(Integer, ForeignKey("roles.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # bumped by every UPDATE, which also checks it (optimistic concurrency, see utils.check_if_match)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
     role = relationship("Role", back_populates="users")
     apartments = relationship("Apartment", back_populates="landlord")
@@ -79,70 +89,299 @@ class Apartment(Base):
     rent_price = Column(DECIMAL(10, 2))
     description = Column(Text)
     status = Column(SQLEnum(ApartmentStatus, name="apartment_status"), default=ApartmentStatus.available)
-    landlord_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    landlord_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    # WGS84 degrees, filled by `python -m app.geocode` from an offline geocoding file
+    latitude = Column(Float)
+    longitude = Column(Float)
+    __mapper_args__ = {"version_id_col": version}
 
     landlord = relationship("User", back_populates="apartments")  # ✅ allows access to landlord.username
-    rentals = relationship("Rental", back_populates="apartment", cascade="all, delete-orphan")
-    maintenance_requests = relationship("MaintenanceRequest", back_populates="apartment", cascade="all, delete-orphan")
+    # passive_deletes: the database removes children via ON DELETE CASCADE instead of the ORM loading them
+    rentals = relationship("Rental", back_populates="apartment", cascade="all, delete-orphan", passive_deletes=True)
+    maintenance_requests = relationship(
+        "MaintenanceRequest", back_populates="apartment", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Tenant(Base):
     __tablename__ = "tenants"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     phone = Column(String(20))
     address = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
     user = relationship("User", back_populates="tenant_profile")
-    rentals = relationship("Rental", back_populates="tenant", cascade="all, delete-orphan")
-    maintenance_requests = relationship("MaintenanceRequest", back_populates="tenant", cascade="all, delete-orphan")
+    rentals = relationship("Rental", back_populates="tenant", cascade="all, delete-orphan", passive_deletes=True)
+    maintenance_requests = relationship(
+        "MaintenanceRequest", back_populates="tenant", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Rental(Base):
     __tablename__ = "rentals"
+    __table_args__ = (
+        # Partial index for the lease sweeper (app/sweeper.py): only active rentals, by end_date
+        Index(
+            "ix_rentals_active_end_date",
+            "end_date",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+        # archived rentals keep their ids (app/archive.py): SQLite must never hand them out again
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    apartment_id = Column(Integer, ForeignKey("apartments.id"), nullable=False)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    apartment_id = Column(Integer, ForeignKey("apartments.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
     start_date = Column(Date)
     end_date = Column(Date)
     status = Column(SQLEnum(RentalStatus, name="rental_status"), default=RentalStatus.active)
     total_amount = Column(DECIMAL(10, 2))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
     apartment = relationship("Apartment", back_populates="rentals")
     tenant = relationship("Tenant", back_populates="rentals")
-    payments = relationship("Payment", back_populates="rental", cascade="all, delete-orphan")
+    payments = relationship("Payment", back_populates="rental", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Payment(Base):
     __tablename__ = "payments"
+    # like rentals, archived payments keep their ids
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False)
+    rental_id = Column(Integer, ForeignKey("rentals.id", ondelete="CASCADE"), nullable=False, index=True)
     payment_date = Column(Date, nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     payment_method = Column(SQLEnum(PaymentMethod, name="payment_method"), nullable=False)
     status = Column(SQLEnum(PaymentStatus, name="payment_status"), nullable=False)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
     rental = relationship("Rental", back_populates="payments")
 
 
+# Cold storage for ended/cancelled rentals and their payments (see app/archive.py).
+# Columns mirror Rental/Payment so rows can be moved with INSERT ... SELECT.
+class ArchivedRental(Base):
+    __tablename__ = "rentals_archive"
+
+    archived = True
+
+    id = Column(Integer, primary_key=True)
+    apartment_id = Column(Integer, ForeignKey("apartments.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    start_date = Column(Date)
+    end_date = Column(Date)
+    status = Column(SQLEnum(RentalStatus, name="rental_status"))
+    total_amount = Column(DECIMAL(10, 2))
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    apartment = relationship("Apartment")
+    tenant = relationship("Tenant")
+    payments = relationship("ArchivedPayment", back_populates="rental", passive_deletes=True)
+
+
+class ArchivedPayment(Base):
+    __tablename__ = "payments_archive"
+
+    archived = True
+
+    id = Column(Integer, primary_key=True)
+    rental_id = Column(Integer, ForeignKey("rentals_archive.id", ondelete="CASCADE"), nullable=False, index=True)
+    payment_date = Column(Date, nullable=False)
+    amount = Column(DECIMAL(10, 2), nullable=False)
+    payment_method = Column(SQLEnum(PaymentMethod, name="payment_method"), nullable=False)
+    status = Column(SQLEnum(PaymentStatus, name="payment_status"), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    rental = relationship("ArchivedRental", back_populates="payments")
+
+
 class MaintenanceRequest(Base):
     __tablename__ = "maintenance_requests"
+    __table_args__ = (
+        # newest first: the order full-text search takes its candidates in (app/fulltext.py)
+        Index("ix_maintenance_requests_request_date_id", "request_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    apartment_id = Column(Integer, ForeignKey("apartments.id"), nullable=False)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    apartment_id = Column(Integer, ForeignKey("apartments.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
     description = Column(Text, nullable=False)
     request_date = Column(Date, nullable=False)
     status = Column(SQLEnum(MaintenanceStatus, name="maintenance_status"), default=MaintenanceStatus.pending)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
     apartment = relationship("Apartment", back_populates="maintenance_requests")
     tenant = relationship("Tenant", back_populates="maintenance_requests")
+    status_changes = relationship(
+        "MaintenanceStatusChange", back_populates="request", cascade="all, delete-orphan",
+        passive_deletes=True, order_by="MaintenanceStatusChange.id"
+    )
+    photos = relationship(
+        "MaintenancePhoto", back_populates="request", cascade="all, delete-orphan",
+        passive_deletes=True, order_by="MaintenancePhoto.id"
+    )
+
+
+# Append-only status history, written by the maintenance router (see app/sla.py).
+# from_status is NULL on the row written when the request is created.
+class MaintenanceStatusChange(Base):
+    __tablename__ = "maintenance_status_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_id = Column(
+        Integer, ForeignKey("maintenance_requests.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    from_status = Column(SQLEnum(MaintenanceStatus, name="maintenance_status"))
+    to_status = Column(SQLEnum(MaintenanceStatus, name="maintenance_status"), nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
+    request = relationship("MaintenanceRequest", back_populates="status_changes")
+
+
+# Photos attached to maintenance requests (see app/photos.py). The bytes live in
+# the content-addressed photo store under their SHA-256; rows of identical
+# uploads share one stored file.
+class MaintenancePhoto(Base):
+    __tablename__ = "maintenance_photos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_id = Column(
+        Integer, ForeignKey("maintenance_requests.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    sha256 = Column(String(64), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(50), nullable=False)  # from the decoded image, not the client
+    size = Column(BigInteger, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    request = relationship("MaintenanceRequest", back_populates="photos")
+
+
+# SLA rollup: a log-bucketed histogram of durations per landlord, apartment and month.
+# One row per non-empty bucket; GET /maintenance/sla merges rows instead of rescanning history.
+# Ids are plain integers so the statistics outlive deleted apartments.
+class MaintenanceSlaBucket(Base):
+    __tablename__ = "maintenance_sla_buckets"
+    __table_args__ = (
+        UniqueConstraint(
+            "landlord_id", "apartment_id", "month", "metric", "bucket", name="uq_maintenance_sla_buckets_cell"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    landlord_id = Column(Integer, nullable=False, index=True)
+    apartment_id = Column(Integer, nullable=False)
+    month = Column(String(7), nullable=False)  # "YYYY-MM" the transition happened in
+    metric = Column(String(10), nullable=False)  # "start" (-> in_progress) or "resolve" (-> completed)
+    bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Read model behind GET /apartments/ (see app/listings.py): the serialized
+# ApartmentResponse plus the columns the listing is filtered on. Plain ids, no
+# foreign keys: it is derived from the live tables and can be rebuilt at any time.
+class ApartmentListing(Base):
+    __tablename__ = "apartment_listings"
+    __table_args__ = (
+        Index("ix_apartment_listings_status_rent_price", "status", "rent_price"),
+        Index("ix_apartment_listings_geocell", "geocell"),
+    )
+
+    apartment_id = Column(Integer, primary_key=True)
+    landlord_id = Column(Integer, nullable=False, index=True)
+    status = Column(String(20))
+    rent_price = Column(DECIMAL(10, 2))
+    occupied = Column(Boolean, nullable=False, default=False)  # has an active rental
+    document = Column(Text, nullable=False)  # JSON, served as-is
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geocell = Column(BigInteger)  # Z-order cell of the coordinates (see app/geo.py), None without them
+
+
+# Monthly landlord statements (see app/statements.py). Snapshots are never
+# updated: regenerating a period adds the next revision and the newest is served.
+class LandlordStatement(Base):
+    __tablename__ = "landlord_statements"
+    __table_args__ = (
+        UniqueConstraint("landlord_id", "period", "revision", name="uq_landlord_statements_revision"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    landlord_id = Column(Integer, nullable=False)
+    period = Column(String(7), nullable=False)  # "YYYY-MM"
+    revision = Column(Integer, nullable=False)
+    document = Column(Text, nullable=False)  # JSON, served as-is
+    generated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Background job queue (see app/jobs.py): inserted in the transaction of the
+# request that wants the side effect, claimed and run by `python -m app.jobs work`.
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(10), nullable=False)  # queued / running / done / dead
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime(timezone=True), nullable=False)  # not before; the retry time after a failure
+    locked_by = Column(String(100))
+    locked_until = Column(DateTime(timezone=True))  # a running job past this is reclaimed
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+
+# Transactional outbox: one row per ORM write, appended in the same transaction
+# by app/changes.py and exposed to clients through GET /changes.
+class ChangeEvent(Base):
+    __tablename__ = "change_events"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(50), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # insert / update / delete
+    changed = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+# Landlords pinned to a shard by app/sharding.py (rebalanced ones); everybody else is hashed.
+class LandlordShard(Base):
+    __tablename__ = "landlord_shards"
+
+    landlord_id = Column(Integer, primary_key=True)
+    shard = Column(String(50), nullable=False)
+    moved_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Id counters for sharded tables on SQLite (Postgres uses the tables' sequences on main):
+# app/sharding.py takes ids from here so they stay unique across every shard.
+class IdBlock(Base):
+    __tablename__ = "id_blocks"
+
+    table_name = Column(String(64), primary_key=True)
+    next_id = Column(BigInteger, nullable=False)
 
 
 # class Role(Base):
@@ -0,0 +1,80 @@
+# app/notifications.py - emails sent from background jobs (see app/jobs.py)
+#
+# Requests only call the notify_* helpers, which queue a job in their own
+# transaction; the worker loads the rows again and sends. A row deleted in
+# between is skipped. Delivery is at least once: a worker that dies after
+# sending but before recording it sends again.
+from typing import Iterable
+
+from . import models
+from .database import SessionLocal
+from .jobs import enqueue_many, job
+from .mail import Message, send
+
+MAINTENANCE_REQUEST = "email.maintenance_request"
+PAYMENT_RECEIPT = "email.payment_receipt"
+LEASE_EXPIRED = "email.lease_expired"
+
+
+def notify_maintenance_request(db, request_id: int):
+    enqueue_many(db, MAINTENANCE_REQUEST, [{"request_id": request_id}])
+
+
+def notify_payments_completed(db, payment_ids: Iterable[int]):
+    enqueue_many(db, PAYMENT_RECEIPT, [{"payment_id": payment_id} for payment_id in payment_ids])
+
+
+def notify_leases_expired(db, rental_ids: Iterable[int]):
+    enqueue_many(db, LEASE_EXPIRED, [{"rental_id": rental_id} for rental_id in rental_ids])
+
+
+@job(MAINTENANCE_REQUEST)
+def send_maintenance_request(payload):
+    db = SessionLocal()
+    try:
+        req = db.get(models.MaintenanceRequest, payload["request_id"])
+        if req is None:
+            return
+        apartment = req.apartment
+        send(Message(
+            to=apartment.landlord.email,
+            subject=f"New maintenance request for {apartment.name}",
+            body=(f"{req.tenant.user.username} reported on {req.request_date.isoformat()}:\n\n"
+                  f"{req.description}\n\nRequest #{req.id}, status {req.status.value}."),
+        ))
+    finally:
+        db.close()
+
+
+@job(PAYMENT_RECEIPT)
+def send_payment_receipt(payload):
+    db = SessionLocal()
+    try:
+        payment = db.get(models.Payment, payload["payment_id"])
+        if payment is None or payment.status is not models.PaymentStatus.completed:
+            return
+        rental = payment.rental
+        send(Message(
+            to=rental.tenant.user.email,
+            subject=f"Payment receipt: {payment.amount} for {rental.apartment.name}",
+            body=(f"We received {payment.amount} by {payment.payment_method.value.replace('_', ' ')} "
+                  f"on {payment.payment_date.isoformat()} for rental #{rental.id} "
+                  f"({rental.apartment.name}, {rental.apartment.address}).\n\nPayment #{payment.id}."),
+        ))
+    finally:
+        db.close()
+
+
+@job(LEASE_EXPIRED)
+def send_lease_expired(payload):
+    db = SessionLocal()
+    try:
+        rental = db.get(models.Rental, payload["rental_id"])
+        if rental is None:
+            return
+        apartment = rental.apartment
+        body = (f"Your lease of {apartment.name} ({apartment.address}) ended on "
+                f"{rental.end_date.isoformat() if rental.end_date else 'its end date'}.")
+        send(Message(to=rental.tenant.user.email, subject=f"Lease ended: {apartment.name}", body=body))
+    finally:
+        db.close()
@@ -0,0 +1,306 @@
+# app/photos.py - maintenance request photos: streamed uploads into a content-addressed store
+#
+# Uploads are never buffered: the multipart body is fed to python-multipart's
+# push parser (the one Starlette uses) chunk by chunk as it arrives, and each
+# file part is written with aiofiles to a temporary file in the store while
+# its SHA-256 is computed. A request holds about one network chunk per upload
+# in memory, whatever the size or number of its files. The file is then
+# renamed to blobs/ab/cd/<sha256>; a photo uploaded twice is stored once, and
+# `python -m app.photos gc` deletes files no photo row refers to any more.
+#
+# Decoding, validating and thumbnailing with Pillow is CPU-bound: it runs in a
+# process pool of PHOTO_WORKERS processes (app/imaging.py), so it blocks
+# neither the event loop nor, through the GIL, the threadpool. Downloads are
+# FileResponses: Range requests get 206 partial content, and a server that
+# implements the ASGI pathsend extension sends the file itself. Behind nginx,
+# PHOTO_ACCEL_REDIRECT hands the file to nginx (X-Accel-Redirect), which sends
+# it with sendfile(2) without it passing through Python at all.
+import argparse
+import asyncio
+import glob
+import hashlib
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import aiofiles
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import select
+from starlette.responses import FileResponse, Response
+
+from . import imaging, models
+from .config import Settings, get_settings
+from .database import SessionLocal
+
+IMMUTABLE = "private, max-age=31536000, immutable"  # a photo's bytes never change
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class StoredPhoto(NamedTuple):
+    sha256: str
+    filename: str
+    size: int
+    info: imaging.ImageInfo
+
+
+class _Upload:
+    def __init__(self, filename: str, tmp_path: str, file):
+        self.filename = filename
+        self.tmp_path = tmp_path
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.complete = False
+
+
+def thumbnail_sizes(settings: Optional[Settings] = None) -> List[int]:
+    settings = settings or get_settings()
+    return [int(size) for size in settings.photo_thumbnail_sizes.split(",") if size.strip()]
+
+
+def _relative(sha256: str, *parts: str) -> str:
+    return "/".join((parts[0], sha256[:2], sha256[2:4], *parts[1:]))
+
+
+def blob_name(sha256: str) -> str:
+    return _relative(sha256, "blobs", sha256)
+
+
+def thumbnail_name(sha256: str, size: int) -> str:
+    return _relative(sha256, "thumbnails", f"{sha256}-{size}.jpg")
+
+
+def store_path(name: str, settings: Optional[Settings] = None) -> str:
+    return os.path.join((settings or get_settings()).photo_store_dir, *name.split("/"))
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: a forked child would inherit this process's
+        # threads' locks and pooled connections in whatever state they were in
+        _pool = ProcessPoolExecutor(
+            max_workers=get_settings().photo_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def run_imaging(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _clean_filename(raw: bytes) -> str:
+    name = raw.decode("utf-8", "replace").replace("\\", "/").rsplit("/", 1)[-1]
+    return "".join(c for c in name if c.isprintable())[:255] or "photo"
+
+
+async def _receive_files(request: Request, settings: Settings, tmp_dir: str) -> List[_Upload]:
+    _, params = parse_options_header(request.headers.get("content-type"))
+    if b"boundary" not in params:
+        raise HTTPException(status_code=415, detail="Send the photos as multipart/form-data")
+
+    events = []
+    field, value, headers = bytearray(), bytearray(), {}
+
+    def on_header_end():
+        headers[bytes(field).lower()] = bytes(value)
+        field.clear()
+        value.clear()
+
+    def on_headers_finished():
+        events.append(("begin", dict(headers)))
+        headers.clear()
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": lambda data, start, end: field.extend(data[start:end]),
+        "on_header_value": lambda data, start, end: value.extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+    uploads: List[_Upload] = []
+    current: Optional[_Upload] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, payload in events:
+                if kind == "begin":
+                    _, disposition = parse_options_header(payload.get(b"content-disposition"))
+                    if b"filename" not in disposition:
+                        current = None  # a plain form field: ignored
+                        continue
+                    if len(uploads) == settings.photo_max_files:
+                        raise HTTPException(
+                            status_code=413, detail=f"At most {settings.photo_max_files} photos per upload"
+                        )
+                    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+                    file = await aiofiles.open(tmp_path, "wb")
+                    current = _Upload(_clean_filename(disposition[b"filename"]), tmp_path, file)
+                    uploads.append(current)
+                elif current is None:
+                    continue
+                elif kind == "data":
+                    current.size += len(payload)
+                    if current.size > settings.photo_max_bytes:
+                        raise HTTPException(
+                            status_code=413, detail=f"{current.filename} is over {settings.photo_max_bytes} bytes"
+                        )
+                    current.hash.update(payload)
+                    await current.file.write(payload)
+                else:
+                    await current.file.close()
+                    current.complete = True
+                    current = None
+            events.clear()
+        parser.finalize()
+    except MultipartParseError as e:
+        await _discard(uploads)
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:  # including the client going away mid-upload
+        await _discard(uploads)
+        raise
+    if not uploads or not all(upload.complete for upload in uploads):
+        await _discard(uploads)
+        raise HTTPException(status_code=400, detail="No complete photo in the upload")
+    return uploads
+
+
+async def _discard(uploads: List[_Upload]):
+    for upload in uploads:
+        if not upload.complete:
+            await upload.file.close()
+        try:
+            os.remove(upload.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def _store(upload: _Upload, sha256: str, settings: Settings):
+    path = store_path(blob_name(sha256), settings)
+    try:
+        os.utime(path)  # already stored: keep that copy, and show gc it is in use again
+        os.remove(upload.tmp_path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(upload.tmp_path, path)
+
+
+async def receive_photos(request: Request) -> List[StoredPhoto]:
+    """
+    Stream every file of a multipart upload into the store. Each must decode as
+    an image; its thumbnails are made on the way in. Nothing is stored unless
+    every file is accepted.
+    """
+    settings = get_settings()
+    tmp_dir = os.path.join(settings.photo_store_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    uploads = await _receive_files(request, settings, tmp_dir)
+
+    async def inspect(upload: _Upload) -> imaging.ImageInfo:
+        sha256 = upload.hash.hexdigest()
+        thumbnails = []
+        for size in thumbnail_sizes(settings):
+            path = store_path(thumbnail_name(sha256, size), settings)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                thumbnails.append((size, path))
+        try:
+            return await run_imaging(imaging.inspect_image, upload.tmp_path, thumbnails)
+        except Exception as e:
+            print(f"Photo upload {upload.filename!r} rejected: {type(e).__name__}: {e}")
+            raise HTTPException(status_code=415, detail=f"{upload.filename} is not a supported image")
+
+    try:
+        infos = await asyncio.gather(*(inspect(upload) for upload in uploads))
+    except BaseException:
+        await _discard(uploads)
+        raise
+    stored = []
+    for upload, info in zip(uploads, infos):
+        sha256 = upload.hash.hexdigest()
+        _store(upload, sha256, settings)
+        stored.append(StoredPhoto(sha256, upload.filename, upload.size, info))
+    return stored
+
+
+def _file_response(name: str, media_type: str, filename: Optional[str] = None) -> Response:
+    settings = get_settings()
+    path = store_path(name, settings)
+    if not os.path.exists(path):
+        print(f"Photo file {path} is missing from the store")
+        raise HTTPException(status_code=404, detail="Photo file not found")
+    if settings.photo_accel_redirect:
+        headers = {"X-Accel-Redirect": f"{settings.photo_accel_redirect.rstrip('/')}/{name}", "Cache-Control": IMMUTABLE}
+        return Response(headers=headers, media_type=media_type)
+    return FileResponse(path, media_type=media_type, filename=filename,
+                        content_disposition_type="inline", headers={"Cache-Control": IMMUTABLE})
+
+
+def photo_response(photo: models.MaintenancePhoto) -> Response:
+    return _file_response(blob_name(photo.sha256), photo.content_type, photo.filename)
+
+
+async def thumbnail_response(photo: models.MaintenancePhoto, size: int) -> Response:
+    """The thumbnail, made now if it is missing (a size added to PHOTO_THUMBNAIL_SIZES later)."""
+    settings = get_settings()
+    path = store_path(thumbnail_name(photo.sha256, size), settings)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await run_imaging(imaging.make_thumbnail, store_path(blob_name(photo.sha256), settings), size, path)
+    return _file_response(thumbnail_name(photo.sha256, size), "image/jpeg")
+
+
+def collect_garbage(grace_hours: float = 24) -> Dict[str, int]:
+    """
+    Delete stored files no photo row refers to, and abandoned temporary files.
+    Only files untouched for `grace_hours` go: an upload stores its file before
+    it commits the row pointing at it.
+    """
+    settings = get_settings()
+    cutoff = time.time() - grace_hours * 3600
+    db = SessionLocal()
+    try:
+        referenced = set(db.scalars(select(models.MaintenancePhoto.sha256).distinct()))
+    finally:
+        db.close()
+    removed = {"blobs": 0, "thumbnails": 0, "tmp": 0}
+    for kind in ("blobs", "thumbnails"):
+        for path in glob.glob(os.path.join(settings.photo_store_dir, kind, "*", "*", "*")):
+            sha256 = os.path.basename(path).split("-", 1)[0]
+            if sha256 not in referenced and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed[kind] += 1
+    for path in glob.glob(os.path.join(settings.photo_store_dir, "tmp", "*")):
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed["tmp"] += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance photo store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="delete stored files that no photo refers to")
+    gc.add_argument("--grace-hours", type=float, default=24)
+    args = parser.parse_args()
+    if args.command == "gc":
+        removed = collect_garbage(args.grace_hours)
+        print(f"Removed {removed['blobs']} photos, {removed['thumbnails']} thumbnails, {removed['tmp']} abandoned uploads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# app/pool.py - connection pool configuration and per-worker pool metrics
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from .config import Settings
+
+# DB_PRE_PING: always = ping on every checkout, idle = ping only connections idle
+# for DB_PRE_PING_IDLE_SECONDS, never.
+# DB_POOL_MODE: session = normal Postgres connections, transaction = PgBouncer
+# transaction pooling.
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout latency and how many threads are waiting for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        self._max_waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent = deque(maxlen=1024)
+
+    def connect(self):
+        with self._stats_lock:
+            self._waiting += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._waiting -= 1
+                self._checkouts += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+                self._recent.append(elapsed)
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            recent = sorted(self._recent)
+            checkouts = self._checkouts
+            stats = {
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "waiting": self._waiting,
+                "max_waiting": self._max_waiting,
+                "checkout_ms_avg": round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_ms_max": round(self._wait_max * 1000, 3),
+            }
+        stats["checkout_ms_p95"] = round(recent[int(len(recent) * 0.95) - 1] * 1000, 3) if recent else 0.0
+        stats.update({
+            "pool_size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": self.overflow(),
+        })
+        return stats
+
+
+def engine_options(database_url: str, settings: Settings) -> dict:
+    """create_engine() keyword arguments for `database_url` built from the DB_* settings."""
+    url = make_url(database_url)
+    options = {"echo": settings.db_echo}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite keeps SQLAlchemy's default single-connection pool
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pre_ping.lower() == "always",
+    )
+    if settings.db_pool_mode.lower() == "transaction":
+        # PgBouncer hands the server connection to someone else after each
+        # transaction: no server-side prepared statements, no session state.
+        connect_args = {}
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif url.get_driver_name() == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+        options["connect_args"] = connect_args
+        options["pool_reset_on_return"] = "rollback"
+    return options
+
+
+def install_idle_pre_ping(engine, settings: Settings):
+    """Ping connections on checkout only when they have sat idle in the pool for a while."""
+    if settings.db_pre_ping.lower() != "idle":
+        return
+    idle_seconds = settings.db_pre_ping_idle_seconds
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            # tells the pool to discard this connection and retry with a new one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def pool_metrics(engine) -> dict:
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.metrics()
+    return {"pool": pool.status()}
@@ -0,0 +1,75 @@
+# app/portal.py - the tenant portal ("/me"): one batched load, cached per user
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import models, schemas
+from .cache import get_cache, tag
+from .config import get_settings
+
+
+def load_portal(db: Session, user_id: int) -> Optional[Dict]:
+    """
+    Everything the portal home page shows, in three queries: the tenant joined with
+    its maintenance requests (and their apartments), its rentals with apartments,
+    and their payments. None if the user has no tenant profile.
+    """
+    tenant = db.scalars(
+        select(models.Tenant)
+        .where(models.Tenant.user_id == user_id)
+        .options(
+            joinedload(models.Tenant.maintenance_requests)
+            .joinedload(models.MaintenanceRequest.apartment)
+            .joinedload(models.Apartment.landlord),
+            selectinload(models.Tenant.rentals).options(
+                joinedload(models.Rental.apartment).joinedload(models.Apartment.landlord),
+                selectinload(models.Rental.payments),
+            ),
+        )
+    ).unique().first()
+    if tenant is None:
+        return None
+
+    rentals = sorted(tenant.rentals, key=lambda r: r.id, reverse=True)
+    portal = schemas.TenantPortal.model_validate({
+        "tenant": tenant,
+        "rentals": rentals,
+        "payments": sorted((p for r in rentals for p in r.payments), key=lambda p: (p.payment_date, p.id), reverse=True),
+        "maintenance": sorted(tenant.maintenance_requests, key=lambda m: m.id, reverse=True),
+    }, from_attributes=True)
+    return portal.model_dump(mode="json")
+
+
+def portal_tags(user_id: int, portal: Dict) -> Set[str]:
+    """Rows the cached portal was built from; a change to any of them drops the entry."""
+    tags = {tag("user", user_id), tag("tenant", portal["tenant"]["id"])}
+    for rental in portal["rentals"]:
+        tags.add(tag("rental", rental["id"]))
+        tags.add(tag("apartment", rental["apartment_id"]))
+    for payment in portal["payments"]:
+        tags.add(tag("payment", payment["id"]))
+    for request in portal["maintenance"]:
+        tags.add(tag("maintenance_request", request["id"]))
+        tags.add(tag("apartment", request["apartment_id"]))
+    for row in (*portal["rentals"], *portal["maintenance"]):
+        # each apartment embeds its landlord's id and username
+        if row.get("apartment"):
+            tags.add(tag("user", row["apartment"]["landlord_id"]))
+    return tags
+
+
+def get_portal(db: Session, user: models.User) -> Optional[Dict]:
+    """
+    The user's portal from the shared cache (app/cache.py). Entries are dropped
+    when a committed change touches any row they were built from, and expire
+    after ME_CACHE_TTL_SECONDS regardless.
+    """
+    user_id = user.id  # the refresh may run after this request's session is gone
+    return get_cache().get_or_load(
+        f"portal:{user_id}",
+        lambda session: load_portal(session, user_id),
+        lambda portal: portal_tags(user_id, portal),
+        db,
+        get_settings().me_cache_ttl_seconds,
+    )
@@ -0,0 +1,124 @@
+# app/projection.py - sparse fieldsets (?fields=, ?expand=) for list routes
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only
+
+from . import schemas
+
+
+@lru_cache(maxsize=256)
+def _sparse_model(schema, fields: Tuple[str, ...], expand: Tuple[str, ...]):
+    """Response model restricted to `fields` plus the expanded relations, one class per combination."""
+    definitions = {}
+    for name in fields + expand:
+        info = schema.model_fields[name]
+        definitions[name] = (info.annotation, info)
+    suffix = abs(hash((fields, expand)))
+    return create_model(
+        f"{schema.__name__}Sparse{suffix}",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=256)
+def _list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+class Projection:
+    def __init__(self, resource: "SparseResource", fields: Tuple[str, ...], expand: Tuple[str, ...]):
+        self.resource = resource
+        self.fields = fields
+        self.expand = expand
+
+    def options(self, model) -> list:
+        """Loader options for `model`: load only the requested columns and join only expanded relations."""
+        mapper = inspect(model)
+        columns = set(self.fields) & set(mapper.column_attrs.keys())
+        columns.add("id")
+        opts = []
+        for name in self.expand:
+            for path in self.resource.expansions[name]:
+                rel = getattr(model, path[0])
+                # keep the FK so the joined row can be attached to its parent
+                columns.update(col.key for col in rel.property.local_columns if col.key in mapper.column_attrs)
+                opt = joinedload(rel)
+                target = rel.property.mapper.class_
+                for step in path[1:]:
+                    attr = getattr(target, step)
+                    opt = opt.joinedload(attr)
+                    target = attr.property.mapper.class_
+                opts.append(opt)
+        opts.insert(0, load_only(*[getattr(model, c) for c in sorted(columns)]))
+        return opts
+
+    def render(self, items: Sequence) -> Response:
+        adapter = _list_adapter(_sparse_model(self.resource.schema, self.fields, self.expand))
+        body = adapter.dump_json(adapter.validate_python(list(items), from_attributes=True))
+        return Response(content=body, media_type="application/json")
+
+
+class SparseResource:
+    """
+    Describes which fields of a response schema can be selected and which
+    relations can be expanded. `expansions` maps an expand name to the
+    relationship paths that must be eager-loaded to render it.
+    """
+
+    def __init__(self, schema, expansions: Dict[str, List[Tuple[str, ...]]]):
+        self.schema = schema
+        self.expansions = expansions
+        self.scalar_fields = tuple(n for n in schema.model_fields if n not in expansions)
+
+    def parse(self, fields: Optional[str], expand: Optional[str]) -> Optional[Projection]:
+        if not fields and not expand:
+            return None
+        wanted = _split(fields) if fields else list(self.scalar_fields)
+        expanded = _split(expand) if expand else []
+
+        bad = [f for f in wanted if f not in self.scalar_fields]
+        if bad:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field(s) {', '.join(bad)}. Available: {', '.join(self.scalar_fields)}",
+            )
+        bad = [e for e in expanded if e not in self.expansions]
+        if bad:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot expand {', '.join(bad)}. Available: {', '.join(self.expansions)}",
+            )
+        if "id" not in wanted:
+            wanted.insert(0, "id")
+        # normalise order so equivalent requests share one cached model
+        order = list(self.schema.model_fields)
+        return Projection(
+            self,
+            tuple(sorted(set(wanted), key=order.index)),
+            tuple(sorted(set(expanded), key=order.index)),
+        )
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+USERS = SparseResource(schemas.User, {"role": [("role",)]})
+APARTMENTS = SparseResource(schemas.ApartmentResponse, {"landlord": [("landlord",)]})
+TENANTS = SparseResource(schemas.TenantResponse, {"user": [("user",)]})
+RENTALS = SparseResource(schemas.RentalResponse, {
+    "apartment": [("apartment", "landlord")],
+    "tenant": [("tenant", "user")],
+})
+PAYMENTS = SparseResource(schemas.PaymentResponse, {
+    "rental": [("rental", "apartment", "landlord"), ("rental", "tenant", "user")],
+})
+MAINTENANCE = SparseResource(schemas.MaintenanceResponse, {
+    "apartment": [("apartment", "landlord")],
+    "tenant": [("tenant", "user")],
+})
@@ -0,0 +1,195 @@
+# app/reconcile.py - match bank statement lines against pending payments
+import csv
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .changes import event_row, record_events
+from .config import get_settings
+from .notifications import notify_payments_completed
+
+DATE_COLUMNS = ("date", "booking date", "value date", "transaction date")
+AMOUNT_COLUMNS = ("amount", "credit")
+REFERENCE_COLUMNS = ("reference", "description", "details", "memo")
+
+# "RENT-12", "rental #12", "R12" ... -> rental id 12
+RENTAL_REFERENCE = re.compile(r"\b(?:rental|rent|r)[\s#:_-]*(\d+)\b", re.IGNORECASE)
+
+UPDATE_CHUNK = 5000
+
+
+def _cents(value) -> int:
+    # statement and payment amounts have two decimals, well inside float precision
+    return round(float(value) * 100)
+
+
+def _pick_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    normalized = [h.strip().lower() for h in header]
+    for name in names:
+        if name in normalized:
+            return normalized.index(name)
+    return None
+
+
+def parse_reference(reference: str) -> Optional[int]:
+    match = RENTAL_REFERENCE.search(reference or "")
+    return int(match.group(1)) if match else None
+
+
+class PendingIndex:
+    """
+    Pending payments keyed by (amount in cents, day ordinal). A statement line
+    whose reference names a rental takes that rental's payment nearest its day
+    within the window; otherwise (or if there is none) it probes its own day
+    first, then one day either side, and so on out to the window.
+    """
+    def __init__(self, window_days: int):
+        self.window_days = window_days
+        # cents -> day ordinal -> [(payment id, rental id)]; an amount nobody owes costs one lookup
+        self.by_amount: Dict[int, Dict[int, List[Tuple[int, int]]]] = defaultdict(dict)
+        self.size = 0
+
+    @classmethod
+    def load(cls, db: Session, window_days: int, landlord_id: Optional[int] = None) -> "PendingIndex":
+        index = cls(window_days)
+        stmt = (
+            select(models.Payment.id, models.Payment.rental_id, models.Payment.payment_date, models.Payment.amount)
+            .where(models.Payment.status == models.PaymentStatus.pending)
+            .order_by(models.Payment.id)
+        )
+        if landlord_id is not None:
+            stmt = stmt.join(models.Rental).join(models.Apartment)\
+                .where(models.Apartment.landlord_id == landlord_id)
+        for payment_id, rental_id, payment_date, amount in db.execute(stmt.execution_options(yield_per=10000)):
+            days = index.by_amount[_cents(amount)]
+            days.setdefault(payment_date.toordinal(), []).append((payment_id, rental_id))
+            index.size += 1
+        return index
+
+    def _probes(self, day: int) -> Iterable[int]:
+        yield day
+        for offset in range(1, self.window_days + 1):
+            yield day - offset
+            yield day + offset
+
+    def match(self, cents: int, day: int, reference: str) -> Optional[int]:
+        days = self.by_amount.get(cents)
+        if not days:
+            return None
+        rental_id = parse_reference(reference)
+        if rental_id is not None:
+            # the referenced rental wins over another rental's payment on a nearer day
+            for probe in self._probes(day):
+                bucket = days.get(probe)
+                for position, (payment_id, candidate) in enumerate(bucket or ()):
+                    if candidate == rental_id:
+                        del bucket[position]
+                        return payment_id
+        for probe in self._probes(day):
+            bucket = days.get(probe)
+            if bucket:
+                payment_id, _ = bucket.pop(0)
+                return payment_id
+        return None
+
+
+def _read_lines(lines: Iterable[str], date_format: Optional[str]):
+    """Yield (line number, date or None, cents or None, reference, raw row) for every data row."""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Statement is empty")
+    date_col = _pick_column(header, DATE_COLUMNS)
+    amount_col = _pick_column(header, AMOUNT_COLUMNS)
+    reference_col = _pick_column(header, REFERENCE_COLUMNS)
+    if date_col is None or amount_col is None:
+        raise ValueError(f"Statement needs a date and an amount column, got: {', '.join(header)}")
+
+    parse_date = date.fromisoformat if not date_format else (lambda v: datetime.strptime(v, date_format).date())
+    for number, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        try:
+            day = parse_date(row[date_col].strip())
+            cents = _cents(row[amount_col].strip().replace(",", ""))
+        except (ValueError, OverflowError, IndexError):  # OverflowError: "inf"
+            day, cents = None, None
+        reference = row[reference_col].strip() if reference_col is not None and reference_col < len(row) else ""
+        yield number, day, cents, reference, row
+
+
+def reconcile_statement(
+    db: Session,
+    lines: Iterable[str],
+    window_days: Optional[int] = None,
+    date_format: Optional[str] = None,
+    landlord_id: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Match a CSV bank statement against pending payments in a single pass and
+    mark the matched ones completed. Memory is bounded by the number of pending
+    payments plus the capped unmatched report, not by the statement size.
+    """
+    settings = get_settings()
+    if window_days is None:
+        window_days = settings.reconcile_window_days
+    index = PendingIndex.load(db, window_days, landlord_id)
+
+    matched: List[int] = []
+    unmatched: List[Dict] = []
+    counts = {"lines": 0, "invalid": 0, "debits": 0, "unmatched": 0}
+    for number, day, cents, reference, row in _read_lines(lines, date_format):
+        counts["lines"] += 1
+        reason = None
+        if day is None:
+            counts["invalid"] += 1
+            reason = "invalid date or amount"
+        elif cents <= 0:
+            counts["debits"] += 1
+            continue
+        else:
+            payment_id = index.match(cents, day.toordinal(), reference)
+            if payment_id is not None:
+                matched.append(payment_id)
+                continue
+            counts["unmatched"] += 1
+            reason = "no pending payment"
+        if len(unmatched) < settings.reconcile_report_limit:
+            unmatched.append({"line": number, "reason": reason, "row": row})
+
+    updated = 0
+    if not dry_run and matched:
+        # One transaction; the IN lists are chunked to stay under driver parameter limits
+        completed = models.PaymentStatus.completed
+        for start in range(0, len(matched), UPDATE_CHUNK):
+            chunk = matched[start:start + UPDATE_CHUNK]
+            # still-pending guard: a payment settled by hand since the index was loaded is left alone
+            changed = db.execute(
+                update(models.Payment)
+                .where(models.Payment.id.in_(chunk), models.Payment.status == models.PaymentStatus.pending)
+                .values(status=completed, version=models.Payment.version + 1)
+                .returning(models.Payment.id, models.Payment.version)
+                .execution_options(synchronize_session=False)
+            ).all()
+            record_events(db, [event_row("payment", pid, "update", {"status": completed.value, "version": version})
+                               for pid, version in changed])
+            notify_payments_completed(db, [pid for pid, _ in changed])
+            updated += len(changed)
+        db.commit()
+    print(f"Reconciled statement: {counts['lines']} lines, {len(matched)} matched of {index.size} pending")
+
+    return {
+        **counts,
+        "matched": len(matched),
+        "updated": updated,
+        "pending_before": index.size,
+        "dry_run": dry_run,
+        "matched_payment_ids": matched[:settings.reconcile_report_limit],
+        "unmatched_lines": unmatched,
+    }
@@ -0,0 +1,66 @@
+# app/routers/analytics.py
+from datetime import date
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.routers.auth import get_current_user
+from .. import models, schemas
+from ..database import get_db
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+MAX_WINDOW_DAYS = 366 * 20
+
+
+def _scope(current_user: models.User, landlord_id: Optional[int]) -> Optional[int]:
+    # Admins may look at any landlord (or all of them); landlords only at themselves
+    if current_user.role.name == "Admin":
+        return landlord_id
+    if current_user.role.name == "Landlord" and landlord_id in (None, current_user.id):
+        return current_user.id
+    raise HTTPException(status_code=403, detail="Not allowed to view these analytics")
+
+
+def _window(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    # Defaults to the last twelve calendar months, including the current one
+    end = end or date.today()
+    if start is None:
+        month = end.year * 12 + end.month - 1 - 11
+        start = date(month // 12, month % 12 + 1, 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail="Date range is limited to 20 years")
+    return start, end
+
+
+@router.get("/occupancy", response_model=schemas.OccupancyReport)
+def occupancy(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    landlord_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    from ..analytics import occupancy_report  # NumPy is only imported once analytics are used
+
+    landlord_id = _scope(current_user, landlord_id)
+    start, end = _window(start, end)
+    return occupancy_report(db, start, end, landlord_id)
+
+
+@router.get("/revenue", response_model=schemas.RevenueReport)
+def revenue(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    landlord_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    from ..analytics import revenue_report
+
+    landlord_id = _scope(current_user, landlord_id)
+    start, end = _window(start, end)
+    return revenue_report(db, start, end, landlord_id)
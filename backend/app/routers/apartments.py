@@ -1,12 +1,19 @@
 # app/routers/apartments.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import Response
+from typing import List, Optional
+from sqlalchemy import delete, exists, select
 from sqlalchemy.orm import Session
 
 from app.routers.auth import get_current_user
-from .. import models, schemas
-from ..database import get_db
-from ..utils import get_apartment_or_404
+from .. import geo, models, schemas
+from ..cache import cached, tag
+from ..config import get_settings
+from ..changes import event_row, record_cascade_deletes, record_events
+from ..database import get_db, get_shard_router
+from ..listings import listing_query, refresh_listings, render_listings
+from ..projection import APARTMENTS
+from ..utils import check_if_match, get_apartment_or_404, get_many
 from sqlalchemy.orm import joinedload
 
 
@@ -36,22 +43,181 @@ def create_apartment(
     return db_apartment
 
 
+def _page_tags(page, params):
+    # any apartment write can move an apartment into or out of a page
+    tags = {"apartment"}
+    if params["occupied"] is not None:
+        tags.add("rental")
+    landlord_ids = {apartment.get("landlord_id") for apartment in page}
+    if None in landlord_ids:  # projected away: any landlord rename may matter
+        tags.add("user")
+    tags.update(tag("user", i) for i in landlord_ids if i is not None)
+    return tags
+
+
 @router.get("/", response_model=List[schemas.ApartmentResponse])
-def list_apartments(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    apartments = db.query(models.Apartment)\
-        .options(joinedload(models.Apartment.landlord))\
-        .offset(skip).limit(limit).all()
-    return apartments
+@cached("apartments", List[schemas.ApartmentResponse], tags=_page_tags)
+def list_apartments(
+    skip: int = 0,
+    limit: int = 50,
+    ids: Optional[List[int]] = Query(None),
+    landlord_id: Optional[int] = None,
+    apartment_status: Optional[models.ApartmentStatus] = Query(None, alias="status"),
+    min_rent: Optional[float] = None,
+    max_rent: Optional[float] = None,
+    occupied: Optional[bool] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Plain listings are served from the apartment_listings read model (see
+    app/listings.py) without touching the ORM; `ids`, `fields` and `expand`
+    load the apartments themselves.
+    """
+    projection = APARTMENTS.parse(fields, expand)
+    if not ids and projection is None:
+        stmt = listing_query(landlord_id, apartment_status.value if apartment_status else None, min_rent, max_rent, occupied)
+        # one body rather than a stream, so CompressionMiddleware still compresses and caches it
+        return Response(render_listings(db, stmt, skip, limit), media_type="application/json")
+
+    options = projection.options(models.Apartment) if projection else [joinedload(models.Apartment.landlord)]
+    if ids:
+        apartments = get_many(db, models.Apartment, ids, *options)
+    else:
+        stmt = select(models.Apartment).options(*options).order_by(models.Apartment.id)
+        if landlord_id is not None:
+            stmt = stmt.where(models.Apartment.landlord_id == landlord_id)  # one shard when sharded
+        if apartment_status is not None:
+            stmt = stmt.where(models.Apartment.status == apartment_status)
+        if min_rent is not None:
+            stmt = stmt.where(models.Apartment.rent_price >= min_rent)
+        if max_rent is not None:
+            stmt = stmt.where(models.Apartment.rent_price <= max_rent)
+        if occupied is not None:
+            active = exists().where(
+                models.Rental.apartment_id == models.Apartment.id,
+                models.Rental.status == models.RentalStatus.active,
+            )
+            stmt = stmt.where(active if occupied else ~active)
+        if get_shard_router() is not None and landlord_id is None:
+            from ..sharding import merged_page
+            apartments = merged_page(stmt, lambda a: a.id, skip, limit)
+        else:
+            apartments = db.scalars(stmt.offset(skip).limit(limit)).unique().all()
+    return projection.render(apartments) if projection else apartments
+
+
+@router.get("/nearby", response_model=List[schemas.ApartmentNearbyResponse])
+def nearby_apartments(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(..., gt=0, description="meters"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    apartment_status: Optional[models.ApartmentStatus] = Query(None, alias="status"),
+    min_rent: Optional[float] = None,
+    max_rent: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """Geocoded listings within `radius` meters of (lat, lon), nearest first (see app/geo.py)."""
+    settings = get_settings()
+    if radius > settings.geo_max_radius_m:
+        raise HTTPException(status_code=400, detail=f"radius is limited to {settings.geo_max_radius_m:g} m")
+    hits = geo.nearby(
+        db, lat, lon, radius, skip, limit, settings.geo_max_candidates,
+        status=apartment_status.value if apartment_status else None, min_rent=min_rent, max_rent=max_rent,
+    )
+    if hits is None:
+        raise HTTPException(status_code=400, detail="Too many apartments in this area; use a smaller radius")
+    return Response(geo.render_nearby(hits), media_type="application/json")
+
+
+@router.get("/within", response_model=List[schemas.ApartmentResponse])
+def apartments_within(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=1000),
+    apartment_status: Optional[models.ApartmentStatus] = Query(None, alias="status"),
+    min_rent: Optional[float] = None,
+    max_rent: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Geocoded listings inside a map viewport; west > east is a viewport that
+    crosses the antimeridian.
+    """
+    if south > north:
+        raise HTTPException(status_code=400, detail="south must not be greater than north")
+    documents = geo.within(
+        db, south, west, north, east, skip, limit, get_settings().geo_max_candidates,
+        status=apartment_status.value if apartment_status else None, min_rent=min_rent, max_rent=max_rent,
+    )
+    if documents is None:
+        raise HTTPException(status_code=400, detail="Too many apartments in this area; zoom in")
+    return Response("[" + ",".join(documents) + "]", media_type="application/json")
+
+
+@router.delete("/", response_model=schemas.BulkDeleteResponse)
+def delete_apartments(
+    landlord_id: Optional[int] = None,
+    ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Delete every apartment matching the filters in one statement. Rentals,
+    payments and maintenance requests go with them through ON DELETE CASCADE,
+    so nothing is loaded into the session however much history there is.
+    """
+    if landlord_id is None and not ids:
+        raise HTTPException(status_code=400, detail="Pass landlord_id and/or ids")
+
+    where = []
+    if landlord_id is not None:
+        where.append(models.Apartment.landlord_id == landlord_id)
+    if ids:
+        where.append(models.Apartment.id.in_(ids))
+    # Only landlord who owns the apartments or admin can delete
+    if current_user.role.name != "Admin":
+        if landlord_id is not None and landlord_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not allowed to delete these apartments")
+        where.append(models.Apartment.landlord_id == current_user.id)
+
+    apartment_ids = list(db.scalars(select(models.Apartment.id).where(*where)))
+    if apartment_ids:
+        record_cascade_deletes(db, models.Apartment, apartment_ids)
+        record_events(db, [event_row("apartment", i, "delete") for i in apartment_ids])
+        db.execute(
+            delete(models.Apartment)
+            .where(models.Apartment.id.in_(apartment_ids))
+            .execution_options(synchronize_session=False)
+        )
+        refresh_listings(db, apartment_ids)
+    db.commit()
+    print(f"Deleted {len(apartment_ids)} apartments")
+    return {"deleted": len(apartment_ids), "ids": apartment_ids}
 
 
 @router.get("/{apartment_id}", response_model=schemas.ApartmentResponse)
+@cached("apartment", schemas.ApartmentResponse, shared_only=True,
+        tags=lambda apartment, _: [tag("apartment", apartment["id"]), tag("user", apartment["landlord_id"])])
 def get_apartment(apartment_id: int, db: Session = Depends(get_db)):
+    """
+    One apartment, with the `version` to send back as If-Match. Cached only when
+    CACHE_URL is set: a worker's own cache would keep serving the old version
+    after another worker's write, and every If-Match retry would fail again.
+    """
     return get_apartment_or_404(db, apartment_id)
 
 @router.put("/{apartment_id}", response_model=schemas.ApartmentResponse)
 def update_apartment(
     apartment_id: int,
     ap: schemas.ApartmentCreate,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -60,6 +226,7 @@ def update_apartment(
     # Only landlord who owns apartment or admin can update
     if current_user.role.name != "Admin" and db_ap.landlord_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed to update this apartment")
+    check_if_match(db_ap, if_match)
 
     db_ap.name = ap.name
     db_ap.address = ap.address
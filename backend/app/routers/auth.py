@@ -1,14 +1,14 @@
 # routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_
 from datetime import timedelta
 from jose import JWTError
 from typing import Optional
 from .. import schemas, models, utils
+from ..config import get_settings
 from ..database import get_db
-import os
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -19,7 +19,7 @@ oauth2_password_form = OAuth2PasswordRequestForm
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 @router.post("/login", response_model=schemas.Token)
-async def login(
+def login(
     form_data: OAuth2PasswordRequestForm = Depends(oauth2_password_form),
     db: Session = Depends(get_db)
 ):
@@ -31,7 +31,7 @@ async def login(
     # Find user by email (case insensitive)
     normalized_email = form_data.username.lower()
     user = db.query(models.User).filter(
-        models.User.username.ilike(normalized_email)
+        func.lower(models.User.username) == normalized_email
     ).first()
     
     if not user:
@@ -50,7 +50,7 @@ async def login(
         )
     
     # Create token with user info
-    access_token_expires = timedelta(minutes=utils.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token_expires = timedelta(minutes=get_settings().access_token_expire_minutes)
     access_token = utils.create_access_token(
         data={
             "sub": user.email,
@@ -74,8 +74,8 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check existing user
     existing_user = db.query(models.User).filter(
         or_(
-            models.User.username.ilike(user.username),
-            models.User.email.ilike(user.email)
+            func.lower(models.User.username) == user.username.lower(),
+            func.lower(models.User.email) == user.email.lower()
         )
     ).first()
     
@@ -110,9 +110,15 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 # JWT dependency using OAuth2PasswordBearer
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),  # Use the bearer scheme here
     db: Session = Depends(get_db)
 ):
+    # POST /batch resolves the user once for all of its sub-requests
+    batch_user = request.scope.get("batch.user")
+    if batch_user is not None:
+        return batch_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -134,6 +140,12 @@ async def get_current_user(
         raise credentials_exception
     return user
 
+def resolve_user_from_token(token: str, db: Session) -> Optional[models.User]:
+    payload = utils.verify_token(token)
+    if not payload or payload.get("sub") is None or payload.get("user_id") is None:
+        return None
+    return db.query(models.User).filter(models.User.id == payload["user_id"]).first()
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     return current_user
 
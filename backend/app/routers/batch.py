@@ -0,0 +1,97 @@
+# app/routers/batch.py
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from .. import schemas
+from ..database import SessionLocal
+from .auth import resolve_user_from_token
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+FORWARDED_HEADERS = (b"authorization", b"accept-language")
+
+
+async def _dispatch(request: Request, sub: schemas.BatchSubRequest, db, user) -> schemas.BatchSubResponse:
+    """Run one read sub-request through the full app in-process."""
+    url = urlsplit(sub.path)
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k in FORWARDED_HEADERS],
+        "batch.db": db,
+        "batch.user": user,
+    }
+    result = {"status": 500, "body": bytearray()}
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for a disconnect; report one once the body is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                finished.set()
+
+    await request.app(scope, receive, send)
+
+    body = bytes(result["body"])
+    try:
+        parsed = json.loads(body) if body else None
+    except ValueError:
+        parsed = body.decode(errors="replace")
+    return schemas.BatchSubResponse(path=sub.path, status=result["status"], body=parsed)
+
+
+@router.post("/", response_model=schemas.BatchResponse)
+async def batch(payload: schemas.BatchRequest, request: Request):
+    """
+    Run several GET sub-requests in one round trip.
+
+    All sub-requests share one DB session (so objects loaded by one are reused
+    by the next through the identity map) and the caller's token is checked once.
+    """
+    for sub in payload.requests:
+        if sub.method.upper() != "GET":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only GET sub-requests are supported")
+        if not sub.path.startswith("/") or urlsplit(sub.path).path.rstrip("/") == "/batch":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid sub-request path '{sub.path}'")
+
+    db = SessionLocal()
+    try:
+        user = None
+        auth = request.headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            user = await run_in_threadpool(resolve_user_from_token, auth[7:], db)
+
+        responses = []
+        for sub in payload.requests:
+            response = await _dispatch(request, sub, db, user)
+            if response.status >= 500:
+                db.rollback()
+            responses.append(response)
+        return schemas.BatchResponse(responses=responses)
+    finally:
+        db.close()
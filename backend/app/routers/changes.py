@@ -0,0 +1,67 @@
+# app/routers/changes.py
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..changes import oldest_available_seq, serialize_event, visible_until
+from ..database import SessionLocal, get_db
+from .auth import get_current_user
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+def _stream_page(since: int, limit: int, entity: Optional[str]):
+    # Own session: the request-scoped one is closed before the body is streamed
+    db = SessionLocal()
+    try:
+        stmt = select(models.ChangeEvent).where(models.ChangeEvent.seq > since)
+        until = visible_until(db)
+        if until is not None:
+            # events from still-open transactions may sit below newer committed ones
+            stmt = stmt.where(models.ChangeEvent.seq < until)
+        if entity:
+            stmt = stmt.where(models.ChangeEvent.entity == entity)
+        stmt = stmt.order_by(models.ChangeEvent.seq).limit(limit + 1)
+
+        yield '{"events":['
+        last_seq = since
+        count = 0
+        has_more = False
+        for ev in db.scalars(stmt.execution_options(yield_per=200)):
+            if count == limit:
+                has_more = True
+                break
+            yield ("," if count else "") + json.dumps(serialize_event(ev))
+            last_seq = ev.seq
+            count += 1
+        yield f'],"next_since":{last_seq},"has_more":{json.dumps(has_more)}}}'
+    finally:
+        db.close()
+
+
+@router.get("/")
+def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    entity: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Events with seq > since, in order. Pass next_since back as `since` until has_more is false.
+
+    `seq` orders the feed; `version` is the row's own version after the change
+    (what API responses carry and If-Match expects), null for deletes.
+    """
+    oldest = oldest_available_seq(db)
+    if oldest is not None and since < oldest - 1:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Changes before seq {oldest} were compacted; do a full resync",
+        )
+    return StreamingResponse(_stream_page(since, limit, entity), media_type="application/json")
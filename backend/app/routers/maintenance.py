@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 from datetime import date
-from .. import models, schemas
-from ..database import get_db
-from ..utils import get_apartment_or_404, get_tenant_or_404
+from app.routers.auth import get_current_user
+from .. import models, photos, schemas
+from ..database import SessionLocal, get_db
+from ..fulltext import search_requests
+from ..notifications import notify_maintenance_request
+from ..projection import MAINTENANCE
+from ..sla import GROUP_KEYS, record_status_change, sla_report
+from ..utils import check_if_match, get_apartment_or_404, get_many, get_tenant_or_404, paginate
 
 router = APIRouter(prefix="/maintenance", tags=["Maintenance Requests"])
 
@@ -30,22 +37,88 @@ def create_maintenance(req: schemas.MaintenanceCreate, db: Session = Depends(get
         status=req.status
     )
     db.add(db_req)
+    db.flush()
+    record_status_change(db, db_req, None)
+    notify_maintenance_request(db, db_req.id)
     db.commit()
     db.refresh(db_req)
     return db_req
 
+# ✅ SLA report: p50/p90/p99 hours to start and to resolve requests
+@router.get("/sla", response_model=schemas.SlaReport)
+def maintenance_sla(
+    group_by: List[str] = Query(list(GROUP_KEYS)),
+    landlord_id: Optional[int] = None,
+    apartment_id: Optional[int] = None,
+    start_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    end_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Admins see every landlord; landlords only their own apartments
+    if current_user.role.name == "Landlord" and landlord_id in (None, current_user.id):
+        landlord_id = current_user.id
+    elif current_user.role.name != "Admin":
+        raise HTTPException(status_code=403, detail="Not allowed to view maintenance SLAs")
+    unknown = set(group_by) - set(GROUP_KEYS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by: {', '.join(sorted(unknown))}")
+    return sla_report(db, group_by, landlord_id, apartment_id, start_month, end_month)
+
+# ✅ Full-text search over request descriptions
+@router.get("/search", response_model=schemas.MaintenanceSearchResults)
+def search_maintenance(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[models.MaintenanceStatus] = None,
+    apartment_id: Optional[int] = None,
+    tenant_id: Optional[int] = None,
+    landlord_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Ranked full-text search; `q` takes words, "quoted phrases", `or` and -excluded words.
+
+    Snippets are escaped HTML with the matched terms in <mark></mark>. At most
+    MAINTENANCE_SEARCH_CANDIDATES matches are ranked. `capped` means there were
+    more: on Postgres the ranked ones are then the most recent matches, so
+    narrow the filters (e.g. start_date) until `capped` is false to rank older ones.
+    """
+    # Admins search every request; landlords only their own apartments'
+    if current_user.role.name == "Landlord" and landlord_id in (None, current_user.id):
+        landlord_id = current_user.id
+    elif current_user.role.name != "Admin":
+        raise HTTPException(status_code=403, detail="Not allowed to search maintenance requests")
+    return search_requests(db, q, status, apartment_id, tenant_id, landlord_id, start_date, end_date, skip, limit)
+
 # ✅ Get all Maintenance Requests
 @router.get("/", response_model=List[schemas.MaintenanceResponse])
-def list_requests(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    reqs = (
-        db.query(models.MaintenanceRequest)
-        .options(joinedload(models.MaintenanceRequest.apartment))
-        .options(joinedload(models.MaintenanceRequest.tenant).joinedload(models.Tenant.user))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return reqs
+def list_requests(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[List[int]] = Query(None),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = MAINTENANCE.parse(fields, expand)
+    if projection:
+        options = projection.options(models.MaintenanceRequest)
+    else:
+        options = [
+            joinedload(models.MaintenanceRequest.apartment).joinedload(models.Apartment.landlord),
+            joinedload(models.MaintenanceRequest.tenant).joinedload(models.Tenant.user),
+        ]
+    if ids:
+        reqs = get_many(db, models.MaintenanceRequest, ids, *options)
+    else:
+        stmt = select(models.MaintenanceRequest).options(*options).order_by(models.MaintenanceRequest.id)
+        reqs = paginate(db, stmt, skip, limit)
+    return projection.render(reqs) if projection else reqs
 
 # ✅ Get Maintenance Request by ID
 @router.get("/{request_id}", response_model=schemas.MaintenanceResponse)
@@ -63,11 +136,18 @@ def get_request(request_id: int, db: Session = Depends(get_db)):
 
 # ✅ Update Maintenance Request
 @router.put("/{request_id}", response_model=schemas.MaintenanceResponse)
-def update_request(request_id: int, payload: schemas.MaintenanceCreate, db: Session = Depends(get_db)):
+def update_request(
+    request_id: int,
+    payload: schemas.MaintenanceCreate,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     req = db.get(models.MaintenanceRequest, request_id)
     if not req:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Maintenance request not found")
+    check_if_match(req, if_match)
 
+    previous_status = req.status
     req.apartment_id = payload.apartment_id
     req.tenant_id = payload.tenant_id
     req.description = payload.description
@@ -75,6 +155,8 @@ def update_request(request_id: int, payload: schemas.MaintenanceCreate, db: Sess
     req.status = payload.status
 
     db.add(req)
+    db.flush()
+    record_status_change(db, req, previous_status)
     db.commit()
     db.refresh(req)
     return req
@@ -87,4 +169,123 @@ def delete_request(request_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Maintenance request not found")
     db.delete(req)
     db.commit()
-    return None
\ No newline at end of file
+    return None
+
+
+# --- photos (see app/photos.py)
+
+def _photo_request(db: Session, request_id: int, user: models.User) -> models.MaintenanceRequest:
+    # the tenant who filed the request, the apartment's landlord and admins
+    req = db.get(models.MaintenanceRequest, request_id)
+    if not req:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Maintenance request not found")
+    if user.role.name != "Admin" and user.id not in (req.apartment.landlord_id, req.tenant.user_id):
+        raise HTTPException(status_code=403, detail="Not allowed to access this request's photos")
+    return req
+
+
+def _photo(db: Session, request_id: int, photo_id: int, user: models.User) -> models.MaintenancePhoto:
+    _photo_request(db, request_id, user)
+    photo = db.get(models.MaintenancePhoto, photo_id)
+    if not photo or photo.request_id != request_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    return photo
+
+
+def _add_photos(request_id: int, user: models.User, stored: List[photos.StoredPhoto]):
+    # a new session: the request's own was released before the upload, and its
+    # identity map would answer the re-check below from memory
+    db = SessionLocal()
+    try:
+        req = _photo_request(db, request_id, user)  # again: it may have been deleted during the upload
+        rows = [
+            models.MaintenancePhoto(
+                request=req, sha256=p.sha256, filename=p.filename, content_type=p.info.content_type,
+                size=p.size, width=p.info.width, height=p.info.height, uploaded_by=user.id,
+            )
+            for p in stored
+        ]
+        db.add_all(rows)
+        db.commit()
+        for row in rows:
+            db.refresh(row)
+        return rows
+    finally:
+        db.close()
+
+
+# ✅ Attach photos: multipart/form-data with one or more image files
+@router.post(
+    "/{request_id}/photos",
+    response_model=List[schemas.MaintenancePhotoResponse],
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+    }}}}},
+)
+async def upload_photos(
+    request_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # async so the body can be streamed to the photo store; database work goes to the threadpool
+    await run_in_threadpool(_photo_request, db, request_id, current_user)
+    # end the checks' transaction: its pooled connection is not held while the body streams in
+    await run_in_threadpool(db.close)
+    stored = await photos.receive_photos(request)
+    return await run_in_threadpool(_add_photos, request_id, current_user, stored)
+
+# ✅ List a request's photos
+@router.get("/{request_id}/photos", response_model=List[schemas.MaintenancePhotoResponse])
+def list_photos(
+    request_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    req = _photo_request(db, request_id, current_user)
+    return db.scalars(
+        select(models.MaintenancePhoto)
+        .where(models.MaintenancePhoto.request_id == req.id)
+        .order_by(models.MaintenancePhoto.id)
+    ).all()
+
+# ✅ Download a photo (supports Range requests)
+@router.get("/{request_id}/photos/{photo_id}")
+def download_photo(
+    request_id: int,
+    photo_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    return photos.photo_response(_photo(db, request_id, photo_id, current_user))
+
+# ✅ Photo thumbnail, JPEG no larger than size x size
+@router.get("/{request_id}/photos/{photo_id}/thumbnail")
+async def photo_thumbnail(
+    request_id: int,
+    photo_id: int,
+    size: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    sizes = photos.thumbnail_sizes()
+    if size is None:
+        size = sizes[0]
+    elif size not in sizes:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(map(str, sizes))}")
+    photo = await run_in_threadpool(_photo, db, request_id, photo_id, current_user)
+    return await photos.thumbnail_response(photo, size)
+
+# ✅ Remove a photo (its file goes with the next `python -m app.photos gc`)
+@router.delete("/{request_id}/photos/{photo_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_photo(
+    request_id: int,
+    photo_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    db.delete(_photo(db, request_id, photo_id, current_user))
+    db.commit()
+    return None
@@ -0,0 +1,43 @@
+# app/routers/me.py - tenant self-service: only the logged-in tenant's own data
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.routers.auth import get_current_user
+from .. import models, schemas
+from ..database import get_db
+from ..portal import get_portal
+
+router = APIRouter(prefix="/me", tags=["me"])
+
+
+def current_portal(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Dict:
+    portal = get_portal(db, current_user)
+    if portal is None:
+        raise HTTPException(status_code=404, detail="No tenant profile for this user")
+    return portal
+
+
+# Portal home page: profile, rentals, payments and maintenance requests in one response
+@router.get("", response_model=schemas.TenantPortal)
+def me(portal: Dict = Depends(current_portal)):
+    return portal
+
+
+@router.get("/rentals", response_model=List[schemas.PortalRental])
+def my_rentals(portal: Dict = Depends(current_portal)):
+    return portal["rentals"]
+
+
+@router.get("/payments", response_model=List[schemas.PortalPayment])
+def my_payments(portal: Dict = Depends(current_portal)):
+    return portal["payments"]
+
+
+@router.get("/maintenance", response_model=List[schemas.PortalMaintenance])
+def my_maintenance(portal: Dict = Depends(current_portal)):
+    return portal["maintenance"]
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+import io
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile, status
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.routers.auth import get_current_user
 from .. import models, schemas
 from ..database import get_db
-from ..utils import get_rental_or_404
+from ..notifications import notify_payments_completed
+from ..projection import PAYMENTS
+from ..reconcile import reconcile_statement
+from ..utils import check_if_match, get_many, get_rental_or_404, paginate, paginate_with_archive
 from sqlalchemy.orm import joinedload
 
 router = APIRouter(prefix="/payments", tags=["payments"])
@@ -21,21 +27,81 @@ def create_payment(p: schemas.PaymentCreate, db: Session = Depends(get_db)):
         status=p.status
     )
     db.add(db_p)
+    if p.status == models.PaymentStatus.completed.value:
+        db.flush()
+        notify_payments_completed(db, [db_p.id])
     db.commit()
     db.refresh(db_p)
     return db_p
 
+# 🟢 Reconcile a bank statement (CSV with date, amount and optional reference columns)
+@router.post("/reconcile", response_model=schemas.ReconcileReport)
+def reconcile_payments(
+    file: UploadFile = File(...),
+    window_days: Optional[int] = Query(None, ge=0, le=31),
+    date_format: Optional[str] = Query(None, description="strptime format, ISO dates by default"),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Admins reconcile everything; landlords only payments on their own apartments
+    if current_user.role.name == "Admin":
+        landlord_id = None
+    elif current_user.role.name == "Landlord":
+        landlord_id = current_user.id
+    else:
+        raise HTTPException(status_code=403, detail="Not allowed to reconcile payments")
+
+    # The upload is spooled to disk by Starlette; lines are decoded and matched as they are read
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return reconcile_statement(db, lines, window_days, date_format, landlord_id, dry_run)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        lines.detach()
+
 # 🟢 Get All Payments
 @router.get("/", response_model=List[schemas.PaymentResponse])
-def list_payments(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    payments = (
-        db.query(models.Payment)
-        .options(joinedload(models.Payment.rental))  # 👈 load rental too
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return payments
+def list_payments(
+    skip: int = 0,
+    limit: int = 50,
+    include_archived: bool = False,
+    ids: Optional[List[int]] = Query(None),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = PAYMENTS.parse(fields, expand)
+    if projection:
+        live_options = projection.options(models.Payment)
+        archived_options = projection.options(models.ArchivedPayment)
+    else:
+        # the nested RentalResponse needs its apartment's landlord and its tenant's user too
+        live_options = (joinedload(models.Payment.rental).options(
+            joinedload(models.Rental.apartment).joinedload(models.Apartment.landlord),
+            joinedload(models.Rental.tenant).joinedload(models.Tenant.user),
+        ),)
+        archived_options = (joinedload(models.ArchivedPayment.rental).options(
+            joinedload(models.ArchivedRental.apartment).joinedload(models.Apartment.landlord),
+            joinedload(models.ArchivedRental.tenant).joinedload(models.Tenant.user),
+        ),)
+
+    if ids:
+        payments = get_many(db, models.Payment, ids, *live_options)
+        if include_archived:
+            found = {p.id for p in payments}
+            payments += get_many(db, models.ArchivedPayment, [i for i in ids if i not in found], *archived_options)
+    else:
+        stmt = select(models.Payment).options(*live_options).order_by(models.Payment.id)
+        if include_archived:
+            archived = select(models.ArchivedPayment).options(*archived_options).order_by(models.ArchivedPayment.id)
+            payments = paginate_with_archive(db, stmt, archived, skip, limit)
+        else:
+            payments = paginate(db, stmt, skip, limit)
+
+    return projection.render(payments) if projection else payments
 
 # 🟢 Get One Payment by ID
 @router.get("/", response_model=List[schemas.PaymentResponse])
@@ -49,19 +115,28 @@ def get_payments(db: Session = Depends(get_db)):
 
 # 🟢 Update Payment (PUT)
 @router.put("/{payment_id}", response_model=schemas.PaymentResponse)
-def update_payment(payment_id: int, p: schemas.PaymentCreate, db: Session = Depends(get_db)):
+def update_payment(
+    payment_id: int,
+    p: schemas.PaymentCreate,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     payment = db.get(models.Payment, payment_id)
     if not payment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found")
+    check_if_match(payment, if_match)
 
     # Check if rental exists
     get_rental_or_404(db, p.rental_id)
 
+    completed_now = payment.status != models.PaymentStatus.completed and p.status == models.PaymentStatus.completed.value
     payment.rental_id = p.rental_id
     payment.payment_date = p.payment_date
     payment.amount = p.amount
     payment.payment_method = p.payment_method
     payment.status = p.status
+    if completed_now:
+        notify_payments_completed(db, [payment.id])
 
     db.commit()
     db.refresh(payment)
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 from .. import models, schemas
 from ..database import get_db
-from ..utils import get_apartment_or_404, get_rental_or_404
+from ..projection import RENTALS
+from ..utils import check_if_match, get_apartment_or_404, get_many, get_rental_or_404, paginate, paginate_with_archive
 
 router = APIRouter(prefix="/rentals", tags=["rentals"])
 
@@ -21,21 +23,62 @@ def create_rental(payload: schemas.RentalCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[schemas.RentalResponse])
-def list_rentals(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    rentals = db.query(models.Rental).options(
-        joinedload(models.Rental.apartment),
-        joinedload(models.Rental.tenant).joinedload(models.Tenant.user)
-    ).offset(skip).limit(limit).all()
-    return rentals
+def list_rentals(
+    skip: int = 0,
+    limit: int = 50,
+    include_archived: bool = False,
+    ids: Optional[List[int]] = Query(None),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = RENTALS.parse(fields, expand)
+    if projection:
+        live_options = projection.options(models.Rental)
+        archived_options = projection.options(models.ArchivedRental)
+    else:
+        live_options = (
+            joinedload(models.Rental.apartment).joinedload(models.Apartment.landlord),
+            joinedload(models.Rental.tenant).joinedload(models.Tenant.user),
+        )
+        archived_options = (
+            joinedload(models.ArchivedRental.apartment).joinedload(models.Apartment.landlord),
+            joinedload(models.ArchivedRental.tenant).joinedload(models.Tenant.user),
+        )
+
+    if ids:
+        rentals = get_many(db, models.Rental, ids, *live_options)
+        if include_archived:
+            found = {r.id for r in rentals}
+            rentals += get_many(db, models.ArchivedRental, [i for i in ids if i not in found], *archived_options)
+    else:
+        stmt = select(models.Rental).options(*live_options).order_by(models.Rental.id)
+        if include_archived:
+            archived = select(models.ArchivedRental).options(*archived_options).order_by(models.ArchivedRental.id)
+            rentals = paginate_with_archive(db, stmt, archived, skip, limit)
+        else:
+            rentals = paginate(db, stmt, skip, limit)
+
+    return projection.render(rentals) if projection else rentals
 
 @router.get("/{rental_id}", response_model=schemas.RentalResponse)
-def get_rental(rental_id: int, db: Session = Depends(get_db)):
+def get_rental(rental_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
+    if include_archived and not db.get(models.Rental, rental_id):
+        archived = db.get(models.ArchivedRental, rental_id)
+        if archived:
+            return archived
     rental = get_rental_or_404(db, rental_id)
     return rental
 
 @router.put("/{rental_id}", response_model=schemas.RentalResponse)
-def update_rental(rental_id: int, payload: schemas.RentalUpdate, db: Session = Depends(get_db)):
+def update_rental(
+    rental_id: int,
+    payload: schemas.RentalUpdate,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     db_r = get_rental_or_404(db, rental_id)
+    check_if_match(db_r, if_match)
 
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(db_r, field, value)
@@ -0,0 +1,42 @@
+# app/routers/statements.py - landlord monthly statements, served from stored snapshots
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from app.routers.auth import get_current_user
+from .. import models
+from ..database import get_db
+from ..statements import latest_statement, parse_period, to_csv
+
+router = APIRouter(prefix="/landlords", tags=["statements"])
+
+
+@router.get("/{landlord_id}/statements/{period}")
+def get_statement(
+    landlord_id: int,
+    period: str,
+    format: str = Query("json", pattern="^(json|csv)$"),
+    revision: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Admins may read any landlord's statements; landlords only their own
+    if current_user.role.name != "Admin" and not (current_user.role.name == "Landlord" and current_user.id == landlord_id):
+        raise HTTPException(status_code=403, detail="Not allowed to view these statements")
+    try:
+        parse_period(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    document = latest_statement(db, landlord_id, period, revision)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Statement not found (generated with `python -m app.statements generate`)")
+    if format == "csv":
+        return Response(
+            to_csv(json.loads(document)),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="statement-{landlord_id}-{period}.csv"'},
+        )
+    return Response(document, media_type="application/json")
@@ -1,11 +1,13 @@
 # app/routers/tenants.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import List, Optional
 from sqlalchemy.orm import Session, joinedload
 
 from .. import models, schemas
 from ..database import get_db
-from ..utils import get_tenant_or_404
+from ..projection import TENANTS
+from ..search import search_ids
+from ..utils import check_if_match, get_many, get_tenant_or_404
 
 router = APIRouter(prefix="/tenants", tags=["tenants"])
 
@@ -33,15 +35,37 @@ def create_tenant(t: schemas.TenantCreate, db: Session = Depends(get_db)):
     return db_t
 
 @router.get("/", response_model=List[schemas.TenantResponse])
-def list_tenants(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    tenants = (
-        db.query(models.Tenant)
-        .options(joinedload(models.Tenant.user))  # load related user
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return tenants
+def list_tenants(
+    skip: int = 0,
+    limit: int = 50,
+    ids: Optional[List[int]] = Query(None),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = TENANTS.parse(fields, expand)
+    options = projection.options(models.Tenant) if projection else [joinedload(models.Tenant.user)]  # load related user
+    if ids:
+        tenants = get_many(db, models.Tenant, ids, *options)
+    else:
+        tenants = (
+            db.query(models.Tenant)
+            .options(*options)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    return projection.render(tenants) if projection else tenants
+
+@router.get("/search", response_model=List[schemas.TenantResponse])
+def search_tenants(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    # Prefix search by phone number, best match first
+    ids = search_ids(db, models.Tenant, q, limit)
+    return get_many(db, models.Tenant, ids, joinedload(models.Tenant.user))
 
 @router.get("/{tenant_id}", response_model=schemas.TenantResponse)
 def get_tenant(tenant_id: int, db: Session = Depends(get_db)):
@@ -56,8 +80,14 @@ def get_tenant(tenant_id: int, db: Session = Depends(get_db)):
     return tenant
 
 @router.put("/{tenant_id}", response_model=schemas.TenantResponse)
-def update_tenant(tenant_id: int, t: schemas.TenantUpdate, db: Session = Depends(get_db)):
+def update_tenant(
+    tenant_id: int,
+    t: schemas.TenantUpdate,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     db_t = get_tenant_or_404(db, tenant_id)
+    check_if_match(db_t, if_match)
     if t.phone is not None:
         db_t.phone = t.phone
     if t.address is not None:
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, or_
+from typing import List, Optional
 from .. import schemas, models, utils
+from ..cache import cached
 from ..database import get_db
+from ..projection import USERS
+from ..search import search_ids
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 # PUBLIC: Get roles
 @router.get("/roles", response_model=List[schemas.Role])
+@cached("roles", List[schemas.Role], tags=["role"])
 def get_roles(db: Session = Depends(get_db)):
     roles = db.query(models.Role).all()
     return roles
@@ -96,8 +100,8 @@ def create_user(
     # Check existing
     existing_user = db.query(models.User).filter(
         or_(
-            models.User.username.ilike(user.username),
-            models.User.email.ilike(user.email)
+            func.lower(models.User.username) == user.username.lower(),
+            func.lower(models.User.email) == user.email.lower()
         )
     ).first()
     if existing_user:
@@ -129,17 +133,36 @@ def create_user(
 def read_users(
     skip: int = 0,
     limit: int = 100,
+    ids: Optional[List[int]] = Query(None),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     print("Requesting users")
-    users = (
-        db.query(models.User)
-        .join(models.Role, models.User.role_id == models.Role.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return users
+    projection = USERS.parse(fields, expand)
+    options = projection.options(models.User) if projection else []
+    if ids:
+        users = utils.get_many(db, models.User, ids, *(options or [joinedload(models.User.role)]))
+    else:
+        users = (
+            db.query(models.User)
+            .join(models.Role, models.User.role_id == models.Role.id)
+            .options(*options)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    return projection.render(users) if projection else users
+
+# SEARCH - Users by username/email prefix (declared before /{user_id})
+@router.get("/search", response_model=List[schemas.User])
+def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    ids = search_ids(db, models.User, q, limit)
+    return utils.get_many(db, models.User, ids, joinedload(models.User.role))
 
 # READ SINGLE - User
 @router.get("/{user_id}", response_model=schemas.User)
@@ -160,6 +183,7 @@ def read_user(
 def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     print(f"Updating user {user_id}")
@@ -167,6 +191,7 @@ def update_user(
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    utils.check_if_match(db_user, if_match)
     
     update_data = user_update.dict(exclude_unset=True)
     
@@ -177,7 +202,7 @@ def update_user(
     # Email validation
     if "email" in update_data and update_data["email"].lower() != db_user.email:
         email_exists = db.query(models.User).filter(
-            models.User.email.ilike(update_data["email"].lower()),
+            func.lower(models.User.email) == update_data["email"].lower(),
             models.User.id != user_id
         ).first()
         if email_exists:
@@ -1,7 +1,7 @@
 # app/schemas.py
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Any, Optional, List
 
 # ==========================
 # USER & AUTH SCHEMAS
@@ -39,6 +39,7 @@ class User(UserBase):
     id: int
     created_at: Optional[datetime] = None
     role: Optional[Role] = None
+    version: int  # send back in If-Match to update
 
 class UserInDB(User):
     hashed_password: str
@@ -100,10 +101,21 @@ class ApartmentResponse(ApartmentBase):
     landlord_id: int
     landlord: Optional[LandlordResponse]
     created_at: Optional[datetime]
+    version: int
+    # last fields: stored listing documents end with them (migration 0013)
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         orm_mode = True
 
+class ApartmentNearbyResponse(ApartmentResponse):
+    distance_m: float  # great-circle distance from the searched point
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    ids: List[int]
+
 
 # ==========================
 # TENANT SCHEMAS
@@ -126,6 +138,7 @@ class TenantResponse(TenantBase):
     user_id: int
     user: Optional[UserBase] 
     created_at: Optional[datetime]
+    version: int
     class Config:
         orm_mode = True
 
@@ -163,6 +176,8 @@ class RentalResponse(BaseModel):
     status: str
     total_amount: float
     created_at: Optional[datetime]
+    archived: bool = False
+    version: Optional[int] = None  # None for archived rentals, which can't be updated
 
     class Config:
         orm_mode = True
@@ -185,9 +200,28 @@ class PaymentCreate(PaymentBase):
 class PaymentResponse(PaymentBase):
     id: int
     rental: Optional[RentalResponse] = None
+    archived: bool = False
+    version: Optional[int] = None  # None for archived payments
     class Config:
         orm_mode = True
 
+class UnmatchedStatementLine(BaseModel):
+    line: int
+    reason: str
+    row: List[str]
+
+class ReconcileReport(BaseModel):
+    lines: int
+    matched: int
+    updated: int  # matched payments moved to completed (0 on a dry run)
+    unmatched: int
+    invalid: int
+    debits: int  # outgoing lines, ignored
+    pending_before: int
+    dry_run: bool
+    matched_payment_ids: List[int]  # capped, like unmatched_lines
+    unmatched_lines: List[UnmatchedStatementLine]
+
 
 # ==========================
 # MAINTENANCE REQUEST SCHEMAS
@@ -208,9 +242,81 @@ class MaintenanceResponse(MaintenanceBase):
     id: int
     apartment: Optional['ApartmentResponse'] = None
     tenant: Optional['TenantResponse'] = None
+    version: int
     class Config:
         orm_mode = True
 
+class MaintenancePhotoResponse(BaseModel):
+    id: int
+    request_id: int
+    filename: str
+    content_type: str
+    size: int  # bytes
+    width: int
+    height: int
+    sha256: str
+    created_at: Optional[datetime]
+    model_config = ConfigDict(from_attributes=True)
+
+class SlaPercentiles(BaseModel):
+    count: int
+    p50_hours: Optional[float]
+    p90_hours: Optional[float]
+    p99_hours: Optional[float]
+
+class SlaGroup(BaseModel):
+    # only the keys in SlaReport.group_by are set
+    landlord_id: Optional[int] = None
+    apartment_id: Optional[int] = None
+    month: Optional[str] = None  # "YYYY-MM" of the transition
+    start: SlaPercentiles  # opened -> in_progress
+    resolve: SlaPercentiles  # opened -> completed
+
+class SlaReport(BaseModel):
+    group_by: List[str]
+    relative_accuracy: float  # reported percentiles are within this fraction of the exact value
+    groups: List[SlaGroup]
+
+class MaintenanceSearchHit(BaseModel):
+    request: MaintenanceResponse
+    rank: float  # higher is better; only comparable within one response
+    snippet: str  # escaped HTML description excerpt, matched terms wrapped in <mark></mark>
+
+class MaintenanceSearchResults(BaseModel):
+    query: str
+    capped: bool  # more matches than were ranked (on Postgres the most recent were); add filters to narrow them
+    hits: List[MaintenanceSearchHit]
+
+
+# ==========================
+# TENANT PORTAL ("/me") SCHEMAS
+# ==========================
+
+class PortalRental(BaseModel):
+    id: int
+    apartment_id: int
+    apartment: Optional[ApartmentResponse]
+    start_date: Optional[date]
+    end_date: Optional[date]
+    status: str
+    total_amount: Optional[float]
+    created_at: Optional[datetime]
+    model_config = ConfigDict(from_attributes=True)
+
+class PortalPayment(PaymentBase):
+    id: int
+
+class PortalMaintenance(MaintenanceBase):
+    id: int
+    apartment: Optional[ApartmentResponse] = None
+
+class TenantPortal(BaseModel):
+    tenant: TenantResponse
+    rentals: List[PortalRental]  # newest first
+    payments: List[PortalPayment]  # every rental's payments, newest first
+    maintenance: List[PortalMaintenance]  # newest first
+    model_config = ConfigDict(from_attributes=True)
+
 
 # ==========================
 # COMBINED RELATIONSHIP RESPONSES (Optional)
@@ -225,3 +331,64 @@ class ApartmentWithDetails(ApartmentResponse):
     rentals: Optional[List[RentalResponse]]
     maintenance_requests: Optional[List[MaintenanceResponse]]
 
+
+
+# ==========================
+# BATCH SCHEMAS
+# ==========================
+
+class BatchSubRequest(BaseModel):
+    method: str = "GET"
+    path: str  # e.g. "/apartments/3" or "/tenants/?ids=1&ids=2"
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=25)
+
+class BatchSubResponse(BaseModel):
+    path: str
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+
+# ==========================
+# ANALYTICS SCHEMAS
+# ==========================
+
+class ApartmentOccupancy(BaseModel):
+    apartment_id: int
+    name: str
+    rent_price: Optional[float]
+    occupied_days: int
+    vacancy_days: int
+    occupancy_rate: float
+    revenue: float
+    avg_realized_rent: Optional[float]  # revenue per occupied month
+    realized_vs_list: Optional[float]  # avg_realized_rent / rent_price
+
+class OccupancyReport(BaseModel):
+    start: date
+    end: date
+    days: int
+    apartments_count: int
+    occupied_days: int
+    vacancy_days: int
+    occupancy_rate: float
+    revenue: float
+    apartments: List[ApartmentOccupancy]
+
+class ApartmentRevenue(BaseModel):
+    apartment_id: int
+    name: str
+    total: float
+    monthly: List[float]  # aligned with RevenueReport.months
+
+class RevenueReport(BaseModel):
+    start: date
+    end: date
+    months: List[str]  # "YYYY-MM"
+    total: float
+    monthly_totals: List[float]
+    apartments: List[ApartmentRevenue]
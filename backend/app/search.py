@@ -0,0 +1,177 @@
+# app/search.py - typeahead search over users (username/email) and tenants (phone)
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .changes import TRACKED_ENTITIES, oldest_available_seq, visible_until
+from .config import get_settings
+
+# Searchable columns per model with their rank: lower ranks sort first
+SEARCH_FIELDS = {
+    models.User: [("username", 0), ("email", 1)],
+    models.Tenant: [("phone", 0)],
+}
+
+
+def normalize(q: str) -> str:
+    return q.strip().lower()
+
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _rank(q: str, key: str, field_rank: int, pk: int) -> Tuple:
+    # exact matches first, then by field, then the shortest (closest) completion
+    return (key != q, field_rank, len(key), key, pk)
+
+
+def _top_ids(ranked: List[Tuple], limit: int) -> List[int]:
+    ids: List[int] = []
+    for entry in sorted(ranked):
+        pk = entry[-1]
+        if pk not in ids:
+            ids.append(pk)
+            if len(ids) == limit:
+                break
+    return ids
+
+
+def _db_search(db: Session, model, q: str, limit: int) -> List[int]:
+    """
+    Prefix match on lower(column), which Postgres answers from the C-collated
+    indexes of migration 0015 (range and order both). Each field contributes at
+    most `search_candidates` rows in index order, so a one-letter query never
+    sorts the whole table. Short of `limit` results, queries of 3+ characters
+    fall back to a substring match (the pg_trgm indexes) ranked below every
+    prefix hit.
+    """
+    candidates = get_settings().search_candidates
+    dialect = db.get_bind().dialect.name
+    sqlite = dialect == "sqlite"
+    escaped = _escape_like(q)
+    ranked = []
+    for pattern, offset in ((escaped + "%", 0), ("%" + escaped + "%", len(SEARCH_FIELDS[model]))):
+        if offset and (len(q) < 3 or len({r[-1] for r in ranked}) >= limit):
+            break
+        for name, field_rank in SEARCH_FIELDS[model]:
+            key = func.lower(getattr(model, name))
+            if not offset and dialect == "postgresql":
+                key = key.collate("C")  # the prefix index's expression; SQLite compares bytes anyway
+            where = [key.like(pattern, escape="\\")]
+            if not offset and sqlite:
+                # SQLite never uses an expression index for LIKE, but it does for a range
+                where += [key >= q, key < q + "\U0010ffff"]
+            rows = db.execute(select(model.id, key).where(*where).order_by(key).limit(candidates))
+            ranked.extend(_rank(q, value, field_rank + offset, pk) for pk, value in rows)
+    return _top_ids(ranked, limit)
+
+
+class PrefixIndex:
+    """
+    In-process sorted array of (key, field rank, id) answered with bisect.
+
+    It is loaded on first use and then follows the change feed: every search
+    first applies the user/tenant events committed since the last one, so
+    writes made through any worker show up on the next search. If the feed
+    was compacted past our position the index is rebuilt.
+    """
+
+    def __init__(self, model, fields: Sequence[Tuple[str, int]]):
+        self.model = model
+        self.entity = TRACKED_ENTITIES[model]
+        self.fields = list(fields)
+        self.entries: List[Tuple[str, int, int]] = []
+        self.values: Dict[int, Tuple[Optional[str], ...]] = {}
+        self.last_seq: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def _add(self, pk: int, values: Tuple[Optional[str], ...]):
+        self.values[pk] = values
+        for (_, field_rank), value in zip(self.fields, values):
+            if value:
+                bisect.insort(self.entries, (value.lower(), field_rank, pk))
+
+    def _remove(self, pk: int):
+        for (_, field_rank), value in zip(self.fields, self.values.pop(pk, ())):
+            if value:
+                entry = (value.lower(), field_rank, pk)
+                i = bisect.bisect_left(self.entries, entry)
+                if i < len(self.entries) and self.entries[i] == entry:
+                    del self.entries[i]
+
+    def load(self, db: Session):
+        # take the feed position first: events racing with the scan are replayed, which is idempotent
+        until = visible_until(db)
+        if until is None:
+            self.last_seq = db.scalar(select(func.max(models.ChangeEvent.seq))) or 0
+        else:
+            self.last_seq = until - 1
+        columns = [getattr(self.model, name) for name, _ in self.fields]
+        entries = []
+        values = {}
+        for row in db.execute(select(self.model.id, *columns).execution_options(yield_per=10000)):
+            pk, row_values = row[0], tuple(row[1:])
+            values[pk] = row_values
+            for (_, field_rank), value in zip(self.fields, row_values):
+                if value:
+                    entries.append((value.lower(), field_rank, pk))
+        entries.sort()
+        self.entries = entries
+        self.values = values
+        print(f"Search index for {self.entity} loaded: {len(values)} rows")
+
+    def catch_up(self, db: Session):
+        oldest = oldest_available_seq(db)
+        if self.last_seq is None or (oldest is not None and oldest > self.last_seq + 1):
+            self.load(db)
+            return
+        # every entity is read (a range scan on the primary key) so the position advances past all of them;
+        # it stops below any transaction still open, whose events may yet appear under newer ones
+        stmt = select(models.ChangeEvent.seq, models.ChangeEvent.entity, models.ChangeEvent.entity_id,
+                      models.ChangeEvent.op, models.ChangeEvent.changed).where(models.ChangeEvent.seq > self.last_seq)
+        until = visible_until(db)
+        if until is not None:
+            stmt = stmt.where(models.ChangeEvent.seq < until)
+        events = db.execute(stmt.order_by(models.ChangeEvent.seq))
+        for seq, entity, pk, op, changed in events:
+            self.last_seq = seq
+            if entity != self.entity:
+                continue
+            current = self.values.get(pk, (None,) * len(self.fields))
+            self._remove(pk)
+            if op != "delete":
+                changed = changed or {}
+                self._add(pk, tuple(changed.get(name, value) for (name, _), value in zip(self.fields, current)))
+
+    def search(self, q: str, limit: int) -> List[int]:
+        scan = get_settings().search_candidates * len(self.fields)
+        matches = []
+        i = bisect.bisect_left(self.entries, (q,))
+        while i < len(self.entries) and len(matches) < scan:
+            key, field_rank, pk = self.entries[i]
+            if not key.startswith(q):
+                break
+            matches.append(_rank(q, key, field_rank, pk))
+            i += 1
+        return _top_ids(matches, limit)
+
+
+INDEXES = {model: PrefixIndex(model, fields) for model, fields in SEARCH_FIELDS.items()}
+
+
+def search_ids(db: Session, model, q: str, limit: int) -> List[int]:
+    """Ranked ids of `model` rows matching `q`, best first."""
+    q = normalize(q)
+    if not q:
+        return []
+    if get_settings().search_index:
+        index = INDEXES[model]
+        with index.lock:
+            index.catch_up(db)
+            return index.search(q, limit)
+    return _db_search(db, model, q, limit)
@@ -0,0 +1,576 @@
+# app/sharding.py - landlord sharding: route landlord-owned rows to a shard, fan out the rest
+#
+# Enabled by SHARD_URLS ("eu=postgresql://...,us=postgresql://..."); DATABASE_URL is shard
+# "main". Every shard carries the full schema (python -m app.sharding migrate):
+#
+#   * Rows reachable from Apartment.landlord_id (apartments, rentals, payments, their
+#     archives, maintenance requests, their status history and photos) live on the
+#     landlord's shard: the landlord_shards directory if the landlord was moved, else a hash.
+#   * Everything else (users, roles, tenants, the change feed, SLA rollups, the
+#     directory itself) lives on main. Users, roles and tenants are mirrored to every
+#     shard after each commit so foreign keys from sharded rows hold.
+#   * Queries that touch a sharded table (ORM or Core, found in the statement's FROMs
+#     and subqueries) are sent to one shard when they filter on Apartment.landlord_id
+#     (or load from an object of that shard), otherwise to all of them and their rows
+#     concatenated. A fanned-out COUNT/SUM/MIN/MAX without GROUP BY is combined into
+#     one row; other top-level aggregates are refused rather than answered per shard.
+#     merged_page() gives paginated lists a global order.
+#   * Ids of sharded rows are taken from main (Postgres sequences, id_blocks on SQLite)
+#     so they are unique across shards and survive a move. Rows must therefore be
+#     inserted through the ORM, not with bulk Core inserts.
+import argparse
+import heapq
+import itertools
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from cachetools import LRUCache
+from sqlalchemy import delete, event, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.schema import Table
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, Label, UnaryExpression
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.selectable import CompoundSelect, ScalarSelect, Select, SelectBase
+
+from . import models
+from .changes import on_commit
+from .database import MAIN_SHARD, ShardedSessionLocal, SessionLocal, get_shard_router
+
+# Sharded child -> (relationship to its parent, parent model, foreign key attribute)
+PARENTS = {
+    models.Rental: ("apartment", models.Apartment, "apartment_id"),
+    models.MaintenanceRequest: ("apartment", models.Apartment, "apartment_id"),
+    models.ArchivedRental: ("apartment", models.Apartment, "apartment_id"),
+    models.Payment: ("rental", models.Rental, "rental_id"),
+    models.ArchivedPayment: ("rental", models.ArchivedRental, "rental_id"),
+    models.MaintenanceStatusChange: ("request", models.MaintenanceRequest, "request_id"),
+    models.MaintenancePhoto: ("request", models.MaintenanceRequest, "request_id"),
+}
+SHARDED_MODELS = {models.Apartment, *PARENTS}
+# Parents before children, the order a landlord's rows are copied in
+MOVE_ORDER = [
+    models.Apartment,
+    models.Rental,
+    models.Payment,
+    models.ArchivedRental,
+    models.ArchivedPayment,
+    models.MaintenanceRequest,
+    models.MaintenanceStatusChange,
+    models.MaintenancePhoto,
+]
+SHARDED_TABLES = {model.__table__ for model in SHARDED_MODELS}
+# Aggregates whose per-shard values combine into the global one, and how
+MERGEABLE_AGGREGATES = {"count": sum, "sum": sum, "min": min, "max": max}
+AGGREGATES = {
+    *MERGEABLE_AGGREGATES, "avg", "array_agg", "string_agg", "group_concat", "json_agg", "json_group_array",
+    "bool_and", "bool_or", "every", "stddev", "variance", "percentile_cont", "percentile_disc", "mode",
+}
+# Global rows sharded rows point at, in foreign key order; mirrored to every shard
+REFERENCE_MODELS = {"role": models.Role, "user": models.User, "tenant": models.Tenant}
+
+LANDLORD_COLUMN = models.Apartment.__table__.c.landlord_id
+COPY_CHUNK = 5000
+
+
+def _conjuncts(clause) -> Iterable:
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        for inner in clause.clauses:
+            yield from _conjuncts(inner)
+    else:
+        yield clause
+
+
+def landlord_ids(statement) -> Optional[Set[int]]:
+    """
+    Landlords a statement is restricted to by top-level AND conditions on
+    Apartment.landlord_id (= or IN), or None when it isn't restricted.
+    """
+    if hasattr(statement, "selects"):  # UNION: restricted only if every part is
+        parts = [landlord_ids(part) for part in statement.selects]
+        return set().union(*parts) if parts and all(p is not None for p in parts) else None
+    where = getattr(statement, "whereclause", None)
+    if where is None:
+        return None
+    for clause in _conjuncts(where):
+        if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+            continue
+        left = clause.left
+        if getattr(left, "table", None) is not LANDLORD_COLUMN.table or left.name != LANDLORD_COLUMN.name:
+            continue
+        value = clause.right.effective_value
+        if clause.operator is operators.eq:
+            return {value}
+        if clause.operator is operators.in_op:
+            return set(value)
+    return None
+
+
+def _is_aggregate(element) -> bool:
+    return isinstance(element, FunctionElement) and element.name.lower() in AGGREGATES
+
+
+def _has_aggregate(element) -> bool:
+    if _is_aggregate(element):
+        return True
+    if isinstance(element, (SelectBase, ScalarSelect)):
+        return False  # a subquery is evaluated next to its outer row, on that row's shard
+    return any(_has_aggregate(child) for child in element.get_children())
+
+
+def aggregate_merges(statement) -> Optional[List[Callable]]:
+    """
+    How to combine the one row each shard returns for a statement whose top
+    level aggregates: a function per column when every column is a COUNT, SUM,
+    MIN or MAX over all rows. None when the top level does not aggregate.
+    Raises ValueError for aggregates per-shard rows cannot be combined into
+    (GROUP BY, AVG, DISTINCT, an expression over an aggregate); such a query
+    must name a landlord or fan out itself (ShardRouter.fan_out).
+    """
+    if isinstance(statement, CompoundSelect):
+        for part in statement.selects:
+            if aggregate_merges(part) is not None:
+                raise ValueError("A UNION of aggregates cannot be combined across shards")
+        return None
+    if not isinstance(statement, Select):
+        return None
+    columns = [column.element if isinstance(column, Label) else column for column in statement.selected_columns]
+    if statement._group_by_clauses:
+        raise ValueError("GROUP BY across every shard would return one group per shard")
+    if not any(_has_aggregate(column) for column in columns):
+        return None
+    merges = []
+    for column in columns:
+        merge = MERGEABLE_AGGREGATES.get(column.name.lower()) if _is_aggregate(column) else None
+        distinct = any(  # COUNT(DISTINCT x) written as distinct(x) or func.distinct(x)
+            isinstance(element, UnaryExpression) and element.operator is operators.distinct_op
+            or isinstance(element, FunctionElement) and element.name.lower() == "distinct"
+            for element in visitors.iterate(column)
+        )
+        if merge is None or distinct:
+            raise ValueError(f"{column} cannot be combined across shards; filter on a landlord or fan out")
+        merges.append(merge)
+    return merges
+
+
+def merge_aggregate_rows(rows: List, merges: List[Callable]) -> tuple:
+    """One row from the per-shard rows of an aggregate statement (see aggregate_merges)."""
+    merged = []
+    for values, merge in zip(zip(*rows), merges):
+        present = [value for value in values if value is not None]
+        merged.append(merge(present) if present else None)
+    return tuple(merged)
+
+
+def _upsert(conn: Connection, table, rows: List[Dict]):
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["id"], set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != "id"}
+        ),
+        rows,
+    )
+
+
+class ShardRouter:
+    """Maps landlords to shards and implements the ShardedSession choosers (see app/database.py)."""
+
+    def __init__(self, engines: Dict[str, Engine], settings):
+        self.engines = engines
+        self.names = list(engines)
+        self.directory_ttl = settings.shard_directory_ttl_seconds
+        self.lock = threading.Lock()
+        self._directory: Dict[int, str] = {}
+        self._directory_loaded = float("-inf")
+        self._locations = LRUCache(maxsize=100_000)  # (model, id) -> shard, for children created by id
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(engines)), thread_name_prefix="shard")
+
+    # --- landlord -> shard
+
+    def hashed_shard(self, landlord_id: int) -> str:
+        return self.names[zlib.crc32(str(landlord_id).encode()) % len(self.names)]
+
+    def directory(self) -> Dict[int, str]:
+        with self.lock:
+            if time.monotonic() - self._directory_loaded > self.directory_ttl:
+                with self.engines[MAIN_SHARD].connect() as conn:
+                    rows = conn.execute(select(models.LandlordShard.landlord_id, models.LandlordShard.shard))
+                    self._directory = {landlord_id: shard for landlord_id, shard in rows}
+                self._directory_loaded = time.monotonic()
+            return self._directory
+
+    def forget_directory(self):
+        with self.lock:
+            self._directory_loaded = float("-inf")
+
+    def shard_for(self, landlord_id: int) -> str:
+        shard = self.directory().get(landlord_id)
+        if shard is not None and shard not in self.engines:
+            print(f"Landlord {landlord_id} is pinned to unknown shard {shard!r}; using its hash")
+            shard = None
+        return shard or self.hashed_shard(landlord_id)
+
+    def fan_out(self, fn: Callable[[str, Engine], object], names: Optional[Iterable[str]] = None) -> List:
+        """Run fn(name, engine) for every shard in parallel; results in shard order."""
+        names = list(names or self.names)
+        return list(self._pool.map(lambda name: fn(name, self.engines[name]), names))
+
+    def locate(self, session: Optional[Session], model, ident) -> str:
+        """Shard holding row `ident` of a sharded model: the session, a cache, then every shard."""
+        if session is not None:
+            for name in self.names:
+                if identity_key(model, ident, identity_token=name) in session.identity_map:
+                    return name
+        located = self._locations.get((model, ident))
+        if located is None:
+            query = select(model.id).where(model.id == ident)
+            if session is not None:
+                # through the session's own transactions: a parent it flushed (and let go of) is not committed yet
+                found = [name for name in self.names
+                         if session.connection(bind_arguments={"shard_id": name}).scalar(query) is not None]
+            else:
+                def has_row(name, engine):
+                    with engine.connect() as conn:
+                        return conn.scalar(query) is not None
+
+                found = [name for name, hit in zip(self.names, self.fan_out(has_row)) if hit]
+            if not found:
+                return MAIN_SHARD  # the insert fails on its foreign key like it would unsharded
+            located = self._locations[(model, ident)] = found[0]
+        return located
+
+    # --- ShardedSession choosers
+
+    def _shard_of(self, instance) -> str:
+        state = inspect(instance)
+        if state.key is not None:
+            return state.key[2]
+        if state.identity_token is not None:
+            return state.identity_token
+        model = type(instance)
+        if model is models.Apartment:
+            return self.shard_for(instance.landlord_id)
+        relationship, parent_model, foreign_key = PARENTS[model]
+        parent = state.dict.get(relationship)
+        if parent is not None:
+            return self._shard_of(parent)
+        return self.locate(state.session, parent_model, getattr(instance, foreign_key))
+
+    def child_shards(self, instance) -> List[str]:
+        """Shards holding rows that cascade from `instance` (a tenant's rentals may be anywhere)."""
+        return [self._shard_of(instance)] if type(instance) in SHARDED_MODELS else self.names
+
+    def shard_chooser(self, mapper, instance, clause=None, **kw) -> str:
+        if mapper is None or instance is None or mapper.class_ not in SHARDED_MODELS:
+            return MAIN_SHARD
+        return self._shard_of(instance)
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, execution_options, bind_arguments, **kw):
+        if mapper.class_ not in SHARDED_MODELS:
+            return [MAIN_SHARD]
+        if lazy_loaded_from is not None and lazy_loaded_from.mapper.class_ in SHARDED_MODELS:
+            return [lazy_loaded_from.identity_token]  # parents and children share a shard
+        located = self._locations.get((mapper.class_, primary_key[0]))
+        return [located] if located else self.names
+
+    def execute_chooser(self, context) -> List[str]:
+        # tables, not mappers: Core selects and UNIONs of ORM columns carry no mapper
+        tables = {element for element in visitors.iterate(context.statement) if isinstance(element, Table)}
+        classes = {mapper.class_ for mapper in context.all_mappers}
+        if not (tables & SHARDED_TABLES or classes & SHARDED_MODELS):
+            return [MAIN_SHARD]
+        loaded_from = context.lazy_loaded_from if context.is_select else None
+        if loaded_from is not None and loaded_from.mapper.class_ in SHARDED_MODELS:
+            return [loaded_from.identity_token]
+        if context.is_insert and getattr(context.statement, "select", None) is None:
+            raise ValueError("Rows of sharded tables must be added through the session, not a bulk INSERT")
+        landlords = landlord_ids(context.statement)
+        if landlords:
+            shards = sorted({self.shard_for(landlord_id) for landlord_id in landlords}, key=self.names.index)
+        else:
+            shards = self.names
+        if len(shards) > 1 and context.is_select:
+            aggregate_merges(context.statement)  # raises for aggregates the shards' rows can't be combined into
+        return shards
+
+    # --- ids
+
+    def allocate_ids(self, session: Session, table_name: str, count: int) -> List[int]:
+        """`count` ids for `table_name`, unique across shards, taken inside the session's main transaction."""
+        main = session.connection(bind_arguments={"shard_id": MAIN_SHARD})
+        if main.dialect.name == "postgresql":
+            # sequences are not transactional: no lock is held until commit
+            return list(main.scalars(
+                text("SELECT nextval(CAST(:seq AS regclass)) FROM generate_series(1, :n)"),
+                {"seq": f"{table_name}_id_seq", "n": count},
+            ))
+        blocks = models.IdBlock.__table__
+        end = main.scalar(
+            update(blocks).where(blocks.c.table_name == table_name)
+            .values(next_id=blocks.c.next_id + count).returning(blocks.c.next_id)
+        )
+        if end is None:
+            start = self.max_id(table_name) + 1
+            end = start + count
+            main.execute(blocks.insert().values(table_name=table_name, next_id=end))
+        return list(range(end - count, end))
+
+    def max_id(self, table_name: str) -> int:
+        table = models.Base.metadata.tables[table_name]
+
+        def highest(name, engine):
+            with engine.connect() as conn:
+                return conn.scalar(select(func.max(table.c.id))) or 0
+
+        return max(self.fan_out(highest))
+
+    # --- reference rows
+
+    def mirror(self, changed: Dict[str, Set[int]], deleted: Dict[str, Set[int]], names: Optional[List[str]] = None):
+        """Copy changed users/roles/tenants from main to the other shards and drop deleted ones."""
+        main = self.engines[MAIN_SHARD]
+        payload = {}
+        with main.connect() as conn:
+            for entity, model in REFERENCE_MODELS.items():
+                table = model.__table__
+                ids = changed.get(entity)
+                if ids is None:
+                    rows = conn.execute(select(table)).mappings().all()
+                else:
+                    rows = conn.execute(select(table).where(table.c.id.in_(ids))).mappings().all() if ids else []
+                payload[entity] = [dict(row) for row in rows]
+
+        def apply(name, engine):
+            with engine.begin() as conn:
+                for entity, model in REFERENCE_MODELS.items():
+                    _upsert(conn, model.__table__, payload[entity])
+                for entity, model in reversed(list(REFERENCE_MODELS.items())):
+                    if deleted.get(entity):
+                        conn.execute(delete(model.__table__).where(model.__table__.c.id.in_(deleted[entity])))
+
+        self.fan_out(apply, [n for n in (names or self.names) if n != MAIN_SHARD])
+
+    def sync_reference(self, names: Optional[List[str]] = None):
+        """Full copy of every reference table (new shards, or repair after a failed mirror)."""
+        self.mirror({entity: None for entity in REFERENCE_MODELS}, {}, names)
+
+
+def _assign_ids(session: Session, flush_context, instances):
+    router = get_shard_router()
+    pending: Dict[str, List] = {}
+    for obj in session.new:
+        if type(obj) in SHARDED_MODELS and obj.id is None:
+            pending.setdefault(type(obj).__table__.name, []).append(obj)
+    for table_name, objs in pending.items():
+        for obj, new_id in zip(objs, router.allocate_ids(session, table_name, len(objs))):
+            obj.id = new_id
+
+
+event.listen(ShardedSessionLocal, "before_flush", _assign_ids)
+
+
+@on_commit
+def _mirror_reference_rows(rows: List[Dict]):
+    router = get_shard_router()
+    if router is None:
+        return
+    changed: Dict[str, Set[int]] = {entity: set() for entity in REFERENCE_MODELS}
+    deleted: Dict[str, Set[int]] = {entity: set() for entity in REFERENCE_MODELS}
+    for row in rows:
+        if row["entity"] in REFERENCE_MODELS:
+            (deleted if row["op"] == "delete" else changed)[row["entity"]].add(row["entity_id"])
+    if any(changed.values()) or any(deleted.values()):
+        router.mirror(changed, deleted)
+
+
+def merged_page(stmt, key: Callable, skip: int, limit: int) -> List:
+    """
+    One page of an ORM select across every shard. `stmt` must be ordered by `key`:
+    each shard returns only its first skip + limit rows and heapq.merge interleaves
+    the sorted streams, so no shard ever sends more than a page's worth.
+    """
+    router = get_shard_router()
+
+    def page(name, engine):
+        db = SessionLocal()
+        try:
+            return db.scalars(stmt.limit(skip + limit), bind_arguments={"shard_id": name}).unique().all()
+        finally:
+            db.close()
+
+    return list(itertools.islice(heapq.merge(*router.fan_out(page), key=key), skip, skip + limit))
+
+
+# --- rebalancing
+
+
+def _owned_ids(model, landlord_id: int):
+    if model is models.Apartment:
+        return select(models.Apartment.id).where(models.Apartment.landlord_id == landlord_id)
+    _, parent_model, foreign_key = PARENTS[model]
+    return select(model.id).where(getattr(model, foreign_key).in_(_owned_ids(parent_model, landlord_id)))
+
+
+def copy_landlord(source: Engine, target: Engine, landlord_id: int, only_missing: bool = False) -> Dict[str, int]:
+    """Copy a landlord's rows between shards in one target transaction, keeping their ids."""
+    copied = {}
+    with source.connect() as src, target.begin() as dst:
+        for model in MOVE_ORDER:
+            table = model.__table__
+            rows = src.execute(
+                select(table).where(table.c.id.in_(_owned_ids(model, landlord_id))).order_by(table.c.id)
+                .execution_options(yield_per=COPY_CHUNK)
+            ).mappings()
+            count = 0
+            for chunk in rows.partitions(COPY_CHUNK):
+                chunk = [dict(row) for row in chunk]
+                if only_missing:
+                    present = set(dst.scalars(select(table.c.id).where(table.c.id.in_([r["id"] for r in chunk]))))
+                    chunk = [r for r in chunk if r["id"] not in present]
+                if chunk:
+                    dst.execute(table.insert(), chunk)
+                    count += len(chunk)
+            copied[table.name] = count
+    return copied
+
+
+def move_landlord(router: ShardRouter, landlord_id: int, target: str, settle_seconds: Optional[float] = None) -> Dict:
+    """
+    Move a landlord's rows to `target`: copy, repoint the directory, wait for every
+    worker's directory cache to expire, copy rows written meanwhile, then delete the
+    originals (ON DELETE CASCADE takes the children). Updates made to already-copied
+    rows during the move are not carried over, so pause that landlord's writes.
+    """
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard {target!r}; known: {', '.join(router.names)}")
+    source = router.shard_for(landlord_id)
+    if source == target:
+        return {"landlord_id": landlord_id, "source": source, "target": target, "copied": {}}
+
+    router.sync_reference([target])
+    copied = copy_landlord(router.engines[source], router.engines[target], landlord_id)
+
+    with router.engines[MAIN_SHARD].begin() as conn:
+        directory = models.LandlordShard.__table__
+        updated = conn.execute(
+            update(directory).where(directory.c.landlord_id == landlord_id)
+            .values(shard=target, moved_at=func.now())
+        )
+        if not updated.rowcount:
+            conn.execute(directory.insert().values(landlord_id=landlord_id, shard=target))
+    router.forget_directory()
+
+    time.sleep(router.directory_ttl if settle_seconds is None else settle_seconds)
+    late = copy_landlord(router.engines[source], router.engines[target], landlord_id, only_missing=True)
+    with router.engines[source].begin() as conn:
+        conn.execute(delete(models.Apartment.__table__).where(models.Apartment.landlord_id == landlord_id))
+    return {
+        "landlord_id": landlord_id,
+        "source": source,
+        "target": target,
+        "copied": {name: count + late.get(name, 0) for name, count in copied.items()},
+    }
+
+
+def migrate_shards(names: Optional[List[str]] = None):
+    """alembic upgrade head on every shard (main included)."""
+    import os
+    from alembic import command
+    from alembic.config import Config
+
+    from .config import get_settings
+    from .database import parse_shard_urls
+
+    settings = get_settings()
+    urls = {MAIN_SHARD: settings.require_database_url(), **parse_shard_urls(settings.shard_urls)}
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name, url in urls.items():
+        if names and name not in names:
+            continue
+        config = Config(os.path.join(backend, "alembic.ini"))
+        config.set_main_option("script_location", os.path.join(backend, "migrations"))
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+        print(f"Migrating shard {name}")
+        command.upgrade(config, "head")
+
+
+def init_ids(router: ShardRouter):
+    """Start every id counter on main above the highest id already present on any shard."""
+    with router.engines[MAIN_SHARD].begin() as conn:
+        for model in MOVE_ORDER:
+            table_name = model.__table__.name
+            highest = router.max_id(table_name)
+            if conn.dialect.name == "postgresql":
+                if highest:
+                    conn.execute(text("SELECT setval(CAST(:seq AS regclass), :value)"),
+                                 {"seq": f"{table_name}_id_seq", "value": highest})
+                continue
+            blocks = models.IdBlock.__table__
+            current = conn.scalar(select(blocks.c.next_id).where(blocks.c.table_name == table_name))
+            if current is None:
+                conn.execute(blocks.insert().values(table_name=table_name, next_id=highest + 1))
+            elif current <= highest:
+                conn.execute(update(blocks).where(blocks.c.table_name == table_name).values(next_id=highest + 1))
+            print(f"{table_name}: ids continue above {highest}")
+
+
+def status(router: ShardRouter) -> List[Dict]:
+    def counts(name, engine):
+        with engine.connect() as conn:
+            return {
+                "shard": name,
+                "landlords": conn.scalar(select(func.count(func.distinct(models.Apartment.landlord_id)))),
+                "apartments": conn.scalar(select(func.count()).select_from(models.Apartment)),
+                "rentals": conn.scalar(select(func.count()).select_from(models.Rental)),
+                "payments": conn.scalar(select(func.count()).select_from(models.Payment)),
+            }
+
+    return router.fan_out(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Landlord shard administration (needs SHARD_URLS)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="alembic upgrade head on every shard")
+    sub.add_parser("init-ids", help="start id counters above the ids already on the shards")
+    sub.add_parser("sync-reference", help="copy users, roles and tenants from main to every shard")
+    sub.add_parser("status", help="row counts per shard")
+    move = sub.add_parser("move", help="move a landlord to another shard")
+    move.add_argument("--landlord", type=int, required=True)
+    move.add_argument("--to", required=True, help="target shard name")
+    move.add_argument("--settle-seconds", type=float, default=None,
+                      help="wait before deleting the source rows (default SHARD_DIRECTORY_TTL_SECONDS)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_shards()
+        return
+    router = get_shard_router()
+    if router is None:
+        parser.error("SHARD_URLS is not set")
+    if args.command == "init-ids":
+        init_ids(router)
+    elif args.command == "sync-reference":
+        router.sync_reference()
+        print("Reference tables copied to every shard")
+    elif args.command == "status":
+        for row in status(router):
+            print("  ".join(f"{key}={value}" for key, value in row.items()))
+    elif args.command == "move":
+        result = move_landlord(router, args.landlord, args.to, args.settle_seconds)
+        print(f"Moved landlord {args.landlord} from {result['source']} to {result['target']}: {result['copied']}")
+
+
+if __name__ == "__main__":
+    main()
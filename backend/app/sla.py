@@ -0,0 +1,248 @@
+# app/sla.py - maintenance status history and SLA percentiles from rollup histograms
+import argparse
+import math
+from collections import defaultdict
+from datetime import datetime, time, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+# Relative accuracy of a reported percentile. Durations go into logarithmic
+# buckets [gamma^(i-1), gamma^i) seconds, the same scheme as DDSketch: two
+# histograms merge by adding counts, and any quantile read back is within
+# 2% of the true value. A year of seconds spans ~430 buckets.
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Transition -> metric it completes; both are measured from when the request was opened
+METRICS = {
+    models.MaintenanceStatus.in_progress: "start",
+    models.MaintenanceStatus.completed: "resolve",
+}
+_ORDER = list(models.MaintenanceStatus)
+_REACHES = {status: frozenset(_ORDER[:i + 1]) for i, status in enumerate(_ORDER)}
+QUANTILES = (0.5, 0.9, 0.99)
+GROUP_KEYS = ("landlord_id", "apartment_id", "month")
+
+
+def bucket_of(seconds: float) -> int:
+    """Histogram bucket for a duration; everything under a second shares bucket 0."""
+    if seconds < 1:
+        return 0
+    return max(1, math.ceil(math.log(seconds) / _LOG_GAMMA))
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative duration of a bucket, in seconds (within RELATIVE_ACCURACY of any value in it)."""
+    if bucket <= 0:
+        return 0.0
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+def quantiles(histogram: Dict[int, int], qs: Sequence[float] = QUANTILES) -> List[Optional[float]]:
+    """Quantiles in seconds of a {bucket: count} histogram; None for an empty one."""
+    total = sum(histogram.values())
+    if not total:
+        return [None for _ in qs]
+    buckets = sorted(histogram.items())
+    result = []
+    for q in qs:
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                result.append(bucket_value(bucket))
+                break
+    return result
+
+
+def _as_status(value) -> models.MaintenanceStatus:
+    return value if isinstance(value, models.MaintenanceStatus) else models.MaintenanceStatus(value)
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back naive; everything written here is UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _opened_at(req: models.MaintenanceRequest, history: List[models.MaintenanceStatusChange]) -> datetime:
+    # Requests created before status history existed only have their request_date
+    if history and history[0].from_status is None:
+        return _utc(history[0].changed_at)
+    return datetime.combine(req.request_date, time.min, tzinfo=timezone.utc)
+
+
+def _increment(db: Session, landlord_id: int, apartment_id: int, month: str, metric: str, bucket: int):
+    cell = dict(landlord_id=landlord_id, apartment_id=apartment_id, month=month, metric=metric, bucket=bucket)
+    table = models.MaintenanceSlaBucket.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(count=1, **cell)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=list(cell), set_={"count": table.c.count + 1}
+        ))
+        return
+    updated = db.execute(
+        update(table).where(*(table.c[k] == v for k, v in cell.items())).values(count=table.c.count + 1)
+    )
+    if not updated.rowcount:
+        db.execute(table.insert().values(count=1, **cell))
+
+
+def record_status_change(
+    db: Session,
+    req: models.MaintenanceRequest,
+    from_status,
+    at: Optional[datetime] = None,
+):
+    """
+    Append the transition from `from_status` to `req.status` (from_status None on
+    creation) and, if it completes a metric for the first time, add the duration
+    to the rollup. Call after the request is flushed, inside the same transaction.
+    """
+    to_status = _as_status(req.status)
+    from_status = _as_status(from_status) if from_status is not None else None
+    if from_status == to_status:
+        return
+    at = at or datetime.now(timezone.utc)
+
+    history = db.scalars(
+        select(models.MaintenanceStatusChange)
+        .where(models.MaintenanceStatusChange.request_id == req.id)
+        .order_by(models.MaintenanceStatusChange.id)
+    ).all()
+    db.add(models.MaintenanceStatusChange(
+        request_id=req.id, from_status=from_status, to_status=to_status, changed_at=at
+    ))
+
+    completed = _completed_metrics(to_status, _reached([c.to_status for c in history]))
+    if not completed:
+        return
+    opened_at = at if from_status is None else _opened_at(req, history)
+    seconds = max(0.0, (at - opened_at).total_seconds())
+    landlord_id = db.scalar(select(models.Apartment.landlord_id).where(models.Apartment.id == req.apartment_id))
+    for metric in completed:
+        _increment(db, landlord_id, req.apartment_id, f"{at:%Y-%m}", metric, bucket_of(seconds))
+
+
+def _reached(statuses: Iterable) -> frozenset:
+    # Skipping a status (pending -> completed) also reaches the ones before it
+    return frozenset().union(*(_REACHES[_as_status(s)] for s in statuses))
+
+
+def _completed_metrics(to_status: models.MaintenanceStatus, reached: frozenset) -> List[str]:
+    """Metrics a transition to `to_status` completes; a re-opened request keeps its first times."""
+    return [METRICS[status] for status in _REACHES[to_status] - reached if status in METRICS]
+
+
+def sla_report(
+    db: Session,
+    group_by: Iterable[str] = GROUP_KEYS,
+    landlord_id: Optional[int] = None,
+    apartment_id: Optional[int] = None,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+) -> Dict:
+    """
+    p50/p90/p99 time-to-start and time-to-resolve, in hours, per group.
+
+    Reads only the rollup rows (at most a few hundred per apartment and month);
+    the status history is never scanned.
+    """
+    group_by = [key for key in GROUP_KEYS if key in set(group_by)]
+    bucket = models.MaintenanceSlaBucket
+    keys = [getattr(bucket, key) for key in group_by]
+    # the database adds up the histograms of merged cells; Python only walks the buckets
+    stmt = select(*keys, bucket.metric, bucket.bucket, func.sum(bucket.count))\
+        .group_by(*keys, bucket.metric, bucket.bucket)
+    if landlord_id is not None:
+        stmt = stmt.where(bucket.landlord_id == landlord_id)
+    if apartment_id is not None:
+        stmt = stmt.where(bucket.apartment_id == apartment_id)
+    if start_month:
+        stmt = stmt.where(bucket.month >= start_month)
+    if end_month:
+        stmt = stmt.where(bucket.month <= end_month)
+
+    histograms: Dict[Tuple, Dict[str, Dict[int, int]]] = defaultdict(lambda: defaultdict(dict))
+    for row in db.execute(stmt):
+        *key, metric, index, count = row
+        histograms[tuple(key)][metric][index] = int(count)
+
+    groups = []
+    for key in sorted(histograms):
+        entry = dict(zip(group_by, key))
+        for metric in METRICS.values():
+            histogram = histograms[key][metric]
+            entry[metric] = {
+                "count": sum(histogram.values()),
+                **{
+                    f"p{round(q * 100)}_hours": round(v / 3600, 2) if v is not None else None
+                    for q, v in zip(QUANTILES, quantiles(histogram))
+                },
+            }
+        groups.append(entry)
+    return {"group_by": group_by, "relative_accuracy": RELATIVE_ACCURACY, "groups": groups}
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every rollup bucket from the status history (backfills, or after editing history by hand)."""
+    db.execute(delete(models.MaintenanceSlaBucket))
+    counts: Dict[Tuple, int] = defaultdict(int)
+    change = models.MaintenanceStatusChange
+    req = models.MaintenanceRequest
+    rows = db.execute(
+        select(req.id, req.request_date, req.apartment_id, models.Apartment.landlord_id,
+               change.from_status, change.to_status, change.changed_at)
+        .join(change, change.request_id == req.id)
+        .join(models.Apartment, models.Apartment.id == req.apartment_id)
+        .order_by(req.id, change.id)
+        .execution_options(yield_per=10000)
+    )
+    current, opened_at, reached = None, None, frozenset()
+    for request_id, request_date, apartment_id, landlord_id, from_status, to_status, changed_at in rows:
+        changed_at = _utc(changed_at)
+        if request_id != current:
+            current, reached = request_id, frozenset()
+            opened_at = changed_at if from_status is None else \
+                datetime.combine(request_date, time.min, tzinfo=timezone.utc)
+        seconds = max(0.0, (changed_at - opened_at).total_seconds())
+        for metric in _completed_metrics(_as_status(to_status), reached):
+            counts[(landlord_id, apartment_id, f"{changed_at:%Y-%m}", metric, bucket_of(seconds))] += 1
+        reached |= _REACHES[_as_status(to_status)]
+
+    if counts:
+        db.execute(models.MaintenanceSlaBucket.__table__.insert(), [
+            dict(zip(("landlord_id", "apartment_id", "month", "metric", "bucket"), key), count=count)
+            for key, count in counts.items()
+        ])
+    db.commit()
+    return len(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance SLA rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollup buckets from status history")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(db)} SLA buckets")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
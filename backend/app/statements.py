@@ -0,0 +1,362 @@
+# app/statements.py - monthly landlord statements, built set-based and stored as snapshots
+#
+# A statement covers one calendar month for one landlord: per apartment, the
+# rentals overlapping the month with what was paid in it and what is still
+# outstanding, completed payments received by method, and maintenance opened
+# and resolved. All landlords of a period are built from four grouped queries
+# (rentals with their payment totals, payments by method, maintenance by
+# status, resolutions) instead of walking apartments -> rentals -> payments
+# object by object, so a run costs one pass over the payments.
+#
+# Landlords are split into contiguous id ranges built in parallel, one
+# connection each; with SHARD_URLS every shard is also built in parallel on
+# its own engine. Documents are stored in landlord_statements and never
+# rewritten: `generate` fills in missing statements, `--regenerate` adds a new
+# revision for everyone, and GET /landlords/{id}/statements/{period} serves the
+# newest revision.
+import argparse
+import csv
+import io
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, literal, select, union_all
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .config import get_settings
+from .database import MAIN_SHARD, get_engine, get_shard_router
+
+METHODS = [method.value for method in models.PaymentMethod]
+INSERT_CHUNK = 1000
+CSV_COLUMNS = [
+    "apartment_id", "name", "rentals", "received", *(f"received_{method}" for method in METHODS),
+    "outstanding", "maintenance_opened", "maintenance_resolved",
+]
+
+
+def parse_period(period: str) -> Tuple[date, date]:
+    """'2026-09' -> (first day, last day); ValueError for anything else."""
+    try:
+        start = datetime.strptime(period, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Bad period {period!r}: expected YYYY-MM")
+    if period != start.strftime("%Y-%m"):
+        raise ValueError(f"Bad period {period!r}: expected YYYY-MM")
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _money(value) -> float:
+    return round(float(value or 0), 2)
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+# --- the four set-based queries, each limited to landlords in [low, high]
+
+def _apartments(conn: Connection, low: int, high: int):
+    apartment = models.Apartment
+    return conn.execute(
+        select(apartment.landlord_id, apartment.id, apartment.name, apartment.rent_price)
+        .where(apartment.landlord_id.between(low, high))
+        .order_by(apartment.landlord_id, apartment.id)
+    ).all()
+
+
+def _rentals(conn: Connection, low: int, high: int, start: date, end: date):
+    """Rentals overlapping the month (live and archived) with payments in the month and up to its end."""
+    completed = models.PaymentStatus.completed
+    selects = []
+    for rental, payment in ((models.Rental, models.Payment), (models.ArchivedRental, models.ArchivedPayment)):
+        paid = (
+            select(
+                payment.rental_id,
+                func.sum(payment.amount).label("paid_to_date"),
+                func.sum(case((payment.payment_date >= start, payment.amount), else_=0)).label("paid_in_period"),
+            )
+            # only this range's payments: every range would otherwise total everyone's
+            .join(rental, rental.id == payment.rental_id)
+            .join(models.Apartment, models.Apartment.id == rental.apartment_id)
+            .where(
+                models.Apartment.landlord_id.between(low, high),
+                payment.status == completed,
+                payment.payment_date <= end,
+            )
+            .group_by(payment.rental_id)
+            .subquery()
+        )
+        selects.append(
+            select(
+                rental.apartment_id, rental.id, rental.tenant_id, rental.start_date, rental.end_date,
+                rental.status, rental.total_amount, paid.c.paid_in_period, paid.c.paid_to_date,
+                literal(rental is models.ArchivedRental).label("archived"),
+            )
+            .join(models.Apartment, models.Apartment.id == rental.apartment_id)
+            .outerjoin(paid, paid.c.rental_id == rental.id)
+            .where(
+                models.Apartment.landlord_id.between(low, high),
+                rental.status != models.RentalStatus.cancelled,
+                rental.start_date <= end,
+                (rental.end_date.is_(None)) | (rental.end_date >= start),
+            )
+        )
+    rows = union_all(*selects).subquery()
+    return conn.execute(select(rows).order_by(rows.c.apartment_id, rows.c.start_date, rows.c.id)).all()
+
+
+def _payments_by_method(conn: Connection, low: int, high: int, start: date, end: date):
+    """Completed payments of the month per (apartment, method), with the apartment's total as a window sum."""
+    selects = []
+    for rental, payment in ((models.Rental, models.Payment), (models.ArchivedRental, models.ArchivedPayment)):
+        selects.append(
+            select(rental.apartment_id, payment.payment_method, payment.amount)
+            .join(rental, rental.id == payment.rental_id)
+            .join(models.Apartment, models.Apartment.id == rental.apartment_id)
+            .where(
+                models.Apartment.landlord_id.between(low, high),
+                payment.status == models.PaymentStatus.completed,
+                payment.payment_date.between(start, end),
+            )
+        )
+    rows = union_all(*selects).subquery()
+    amount = func.sum(rows.c.amount)
+    return conn.execute(
+        select(
+            rows.c.apartment_id, rows.c.payment_method, amount.label("amount"), func.count().label("count"),
+            func.sum(amount).over(partition_by=rows.c.apartment_id).label("apartment_total"),
+        ).group_by(rows.c.apartment_id, rows.c.payment_method)
+    ).all()
+
+
+def _maintenance(conn: Connection, low: int, high: int, start: date, end: date):
+    """Requests opened in the month per (apartment, current status), and requests completed in it per apartment."""
+    request = models.MaintenanceRequest
+    opened = conn.execute(
+        select(request.apartment_id, request.status, func.count())
+        .join(models.Apartment, models.Apartment.id == request.apartment_id)
+        .where(models.Apartment.landlord_id.between(low, high), request.request_date.between(start, end))
+        .group_by(request.apartment_id, request.status)
+    ).all()
+    change = models.MaintenanceStatusChange
+    resolved = conn.execute(
+        select(request.apartment_id, func.count(func.distinct(change.request_id)))
+        .join(request, request.id == change.request_id)
+        .join(models.Apartment, models.Apartment.id == request.apartment_id)
+        .where(
+            models.Apartment.landlord_id.between(low, high),
+            change.to_status == models.MaintenanceStatus.completed,
+            change.changed_at >= datetime.combine(start, time.min, tzinfo=timezone.utc),
+            change.changed_at < datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc),
+        )
+        .group_by(request.apartment_id)
+    ).all()
+    return opened, resolved
+
+
+def build_statements(conn: Connection, period: str, low: int, high: int) -> Dict[int, Dict]:
+    """Statement documents (without revision) for every landlord in [low, high] that has apartments."""
+    start, end = parse_period(period)
+    apartments = {}
+    by_landlord = defaultdict(list)
+    for landlord_id, apartment_id, name, rent_price in _apartments(conn, low, high):
+        apartment = {
+            "apartment_id": apartment_id,
+            "name": name,
+            "rent_price": _money(rent_price) if rent_price is not None else None,
+            "received": 0.0,
+            "received_by_method": {method: 0.0 for method in METHODS},
+            "payments": 0,
+            "outstanding": 0.0,
+            "rentals": [],
+            "maintenance": {"opened": 0, "opened_by_status": {}, "resolved": 0},
+        }
+        apartments[apartment_id] = apartment
+        by_landlord[landlord_id].append(apartment)
+
+    for row in _rentals(conn, low, high, start, end):
+        apartment = apartments.get(row.apartment_id)
+        if apartment is None:
+            continue
+        total = _money(row.total_amount) if row.total_amount is not None else None
+        paid_to_date = _money(row.paid_to_date)
+        outstanding = max(0.0, round(total - paid_to_date, 2)) if total is not None else 0.0
+        apartment["rentals"].append({
+            "rental_id": row.id,
+            "tenant_id": row.tenant_id,
+            "start_date": row.start_date.isoformat() if row.start_date else None,
+            "end_date": row.end_date.isoformat() if row.end_date else None,
+            "status": _value(row.status),
+            "archived": bool(row.archived),
+            "total_amount": total,
+            "paid_in_period": _money(row.paid_in_period),
+            "paid_to_date": paid_to_date,
+            "outstanding": outstanding,
+        })
+        apartment["outstanding"] = round(apartment["outstanding"] + outstanding, 2)
+
+    for row in _payments_by_method(conn, low, high, start, end):
+        apartment = apartments.get(row.apartment_id)
+        if apartment is None:
+            continue
+        apartment["received_by_method"][_value(row.payment_method)] = _money(row.amount)
+        apartment["received"] = _money(row.apartment_total)
+        apartment["payments"] += row.count
+
+    opened, resolved = _maintenance(conn, low, high, start, end)
+    for apartment_id, status, count in opened:
+        if apartment_id in apartments:
+            maintenance = apartments[apartment_id]["maintenance"]
+            maintenance["opened_by_status"][_value(status)] = count
+            maintenance["opened"] += count
+    for apartment_id, count in resolved:
+        if apartment_id in apartments:
+            apartments[apartment_id]["maintenance"]["resolved"] = count
+
+    statements = {}
+    for landlord_id, rows in by_landlord.items():
+        received_by_method = {method: _money(sum(a["received_by_method"][method] for a in rows)) for method in METHODS}
+        statements[landlord_id] = {
+            "landlord_id": landlord_id,
+            "period": period,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "totals": {
+                "apartments": len(rows),
+                "rentals": sum(len(a["rentals"]) for a in rows),
+                "received": _money(sum(a["received"] for a in rows)),
+                "received_by_method": received_by_method,
+                "payments": sum(a["payments"] for a in rows),
+                "outstanding": _money(sum(a["outstanding"] for a in rows)),
+                "maintenance_opened": sum(a["maintenance"]["opened"] for a in rows),
+                "maintenance_resolved": sum(a["maintenance"]["resolved"] for a in rows),
+            },
+            "apartments": rows,
+        }
+    return statements
+
+
+def _ranges(conn: Connection, parts: int) -> List[Tuple[int, int]]:
+    """Split the landlords that own apartments into `parts` contiguous id ranges of similar size."""
+    landlords = conn.scalars(
+        select(models.Apartment.landlord_id).distinct().order_by(models.Apartment.landlord_id)
+    ).all()
+    if not landlords:
+        return []
+    size = -(-len(landlords) // max(1, parts))
+    return [(landlords[i], landlords[min(i + size, len(landlords)) - 1]) for i in range(0, len(landlords), size)]
+
+
+def _sources() -> Dict[str, Engine]:
+    router = get_shard_router()
+    return dict(router.engines) if router is not None else {MAIN_SHARD: get_engine()}
+
+
+def generate(period: str, regenerate: bool = False, workers: Optional[int] = None) -> int:
+    """
+    Build every landlord's statement for `period` and store the ones that are
+    missing (all of them, as a new revision, with `regenerate`). Returns the
+    number of statements written.
+    """
+    parse_period(period)
+    workers = workers or get_settings().statement_workers
+    router = get_shard_router()
+    sources = _sources()
+
+    tasks = []
+    for name, engine in sources.items():
+        with engine.connect() as conn:
+            tasks += [(name, engine, low, high) for low, high in _ranges(conn, workers)]
+
+    def build(task):
+        name, engine, low, high = task
+        with engine.connect() as conn:
+            statements = build_statements(conn, period, low, high)
+        if router is not None:
+            # mid-move a landlord briefly has rows on two shards; the directory says which counts
+            statements = {l: s for l, s in statements.items() if router.shard_for(l) == name}
+        return statements
+
+    statements = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), workers * len(sources)))) as pool:
+        for part in pool.map(build, tasks):
+            statements.update(part)
+
+    table = models.LandlordStatement.__table__
+    with get_engine().begin() as conn:
+        latest = dict(conn.execute(
+            select(table.c.landlord_id, func.max(table.c.revision))
+            .where(table.c.period == period)
+            .group_by(table.c.landlord_id)
+        ).all())
+        rows = []
+        for landlord_id in sorted(statements):
+            if landlord_id in latest and not regenerate:
+                continue
+            revision = latest.get(landlord_id, 0) + 1
+            document = {**statements[landlord_id], "revision": revision}
+            rows.append({
+                "landlord_id": landlord_id,
+                "period": period,
+                "revision": revision,
+                "document": json.dumps(document, ensure_ascii=False, separators=(",", ":")),
+            })
+        for i in range(0, len(rows), INSERT_CHUNK):
+            conn.execute(insert(table), rows[i:i + INSERT_CHUNK])
+    return len(rows)
+
+
+def latest_statement(db, landlord_id: int, period: str, revision: Optional[int] = None) -> Optional[str]:
+    """The stored document (JSON text) of a statement: the newest revision unless one is given."""
+    statement = models.LandlordStatement
+    stmt = select(statement.document).where(statement.landlord_id == landlord_id, statement.period == period)
+    if revision is not None:
+        stmt = stmt.where(statement.revision == revision)
+    return db.scalars(stmt.order_by(statement.revision.desc()).limit(1)).first()
+
+
+def to_csv(document: Dict) -> str:
+    """One row per apartment plus a TOTAL row."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for apartment in document["apartments"]:
+        writer.writerow([
+            apartment["apartment_id"], apartment["name"], len(apartment["rentals"]), apartment["received"],
+            *(apartment["received_by_method"][method] for method in METHODS),
+            apartment["outstanding"], apartment["maintenance"]["opened"], apartment["maintenance"]["resolved"],
+        ])
+    totals = document["totals"]
+    writer.writerow([
+        "TOTAL", "", totals["rentals"], totals["received"],
+        *(totals["received_by_method"][method] for method in METHODS),
+        totals["outstanding"], totals["maintenance_opened"], totals["maintenance_resolved"],
+    ])
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Landlord monthly statements")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="build and store every landlord's statement for a month")
+    gen.add_argument("--period", default=None, help="YYYY-MM (default: last month)")
+    gen.add_argument("--regenerate", action="store_true",
+                     help="store a new revision for every landlord, not only the missing ones")
+    gen.add_argument("--workers", type=int, default=None, help="parallel landlord ranges (default STATEMENT_WORKERS)")
+    args = parser.parse_args()
+
+    period = args.period or (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    try:
+        written = generate(period, args.regenerate, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Stored {written} statements for {period}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# app/sweeper.py - end expired leases and free their apartments
+import argparse
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterator, Optional
+
+from sqlalchemy import exists, or_, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .changes import event_row, record_events
+from .config import get_settings
+from .database import SessionLocal, get_engine
+from .listings import refresh_listings
+from .notifications import notify_leases_expired
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, assume a single process
+    fcntl = None
+
+# Postgres advisory lock id shared by every worker (arbitrary, app-wide)
+LEADER_LOCK_KEY = 7_300_112
+
+
+@contextmanager
+def leader_lock(engine: Engine) -> Iterator[bool]:
+    """
+    Yield True in at most one process at a time, False everywhere else.
+
+    Postgres uses a session advisory lock, so workers on every host agree
+    (it needs DB_POOL_MODE=session; PgBouncer transaction mode can't hold it).
+    Other databases fall back to a file lock, which covers one host.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            acquired = conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY})
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_KEY})
+        return
+
+    if fcntl is None:
+        yield True
+        return
+    path = os.path.join(tempfile.gettempdir(), "apartment-rental-sweeper.lock")
+    with open(path, "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def sweep_expired_rentals(
+    db: Session,
+    today: Optional[date] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    End every active rental whose end_date is before `today` and free its apartment.
+
+    Each batch is one UPDATE over at most `batch_size` rentals, picked through the
+    partial index on active rentals by end_date, so a sweep costs O(expired) and
+    never scans finished history. Batches commit separately: the sweep can be
+    interrupted and simply re-run.
+    """
+    today = today or date.today()
+    batch_size = batch_size or get_settings().lease_sweep_batch_size
+    active = models.RentalStatus.active
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        expired = (
+            select(models.Rental.id)
+            .where(models.Rental.status == active, models.Rental.end_date < today)
+            .order_by(models.Rental.end_date)
+            .limit(batch_size)
+        )
+        ended = db.execute(
+            update(models.Rental)
+            .where(models.Rental.id.in_(expired.scalar_subquery()), models.Rental.status == active)
+            .values(status=models.RentalStatus.ended, version=models.Rental.version + 1)
+            .returning(models.Rental.id, models.Rental.apartment_id, models.Rental.version)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not ended:
+            break
+
+        # An apartment stays rented while any other lease on it is still running
+        still_rented = exists().where(
+            models.Rental.apartment_id == models.Apartment.id,
+            models.Rental.status == active,
+            or_(models.Rental.end_date.is_(None), models.Rental.end_date >= today),
+        )
+        freed = db.execute(
+            update(models.Apartment)
+            .where(
+                models.Apartment.id.in_({apartment_id for _, apartment_id, _ in ended}),
+                models.Apartment.status == models.ApartmentStatus.rented,
+                ~still_rented,
+            )
+            .values(status=models.ApartmentStatus.available, version=models.Apartment.version + 1)
+            .returning(models.Apartment.id, models.Apartment.version)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        record_events(db, [event_row("rental", rental_id, "update", {"status": "ended", "version": version})
+                           for rental_id, _, version in ended]
+                      + [event_row("apartment", apartment_id, "update", {"status": "available", "version": version})
+                         for apartment_id, version in freed])
+        refresh_listings(db, {apartment_id for _, apartment_id, _ in ended})
+        notify_leases_expired(db, [rental_id for rental_id, _, _ in ended])
+        db.commit()
+        total += len(ended)
+        batches += 1
+        print(f"Lease sweep: ended {len(ended)} rentals, freed {len(freed)} apartments")
+    return total
+
+
+def sweep_as_leader(today: Optional[date] = None, batch_size: Optional[int] = None) -> Optional[int]:
+    """Run one sweep if this process wins the leader lock; None when another process holds it."""
+    with leader_lock(get_engine()) as leader:
+        if not leader:
+            return None
+        db = SessionLocal()
+        try:
+            return sweep_expired_rentals(db, today, batch_size)
+        finally:
+            db.close()
+
+
+async def run_periodically(interval_seconds: float):
+    """In-process scheduler started by the app lifespan (LEASE_SWEEP_INTERVAL_SECONDS, 0 disables it)."""
+    while True:
+        try:
+            await run_in_threadpool(sweep_as_leader)
+        except Exception as e:
+            print(f"Lease sweep failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End expired leases and free their apartments")
+    parser.add_argument("--today", type=date.fromisoformat, default=None,
+                        help="treat this date as today (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--no-lock", action="store_true", help="skip the leader lock (e.g. single cron host)")
+    args = parser.parse_args()
+
+    if args.no_lock:
+        db = SessionLocal()
+        try:
+            total = sweep_expired_rentals(db, args.today, args.batch_size)
+        finally:
+            db.close()
+    else:
+        total = sweep_as_leader(args.today, args.batch_size)
+        if total is None:
+            print("Another process holds the sweeper lock; nothing done")
+            return
+    print(f"Done: {total} rentals ended")
+
+
+if __name__ == "__main__":
+    main()
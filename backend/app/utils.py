@@ -2,21 +2,16 @@
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from typing import Optional, Dict
-from dotenv import load_dotenv
-import os
+from typing import Optional, Dict, Iterable, List
 from fastapi import HTTPException, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
 from . import models
-
-load_dotenv()
-
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-if not SECRET_KEY:
-    raise ValueError("JWT_SECRET_KEY not found in .env file. Please set JWT_SECRET_KEY")
+from .config import get_settings
+from .database import get_shard_router
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -31,14 +26,14 @@ def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.utcnow() + timedelta(minutes=get_settings().access_token_expire_minutes)
     to_encode.update({"exp": expire, "type": "access_token"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, get_settings().require_jwt_secret_key(), algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[Dict]:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, get_settings().require_jwt_secret_key(), algorithms=[ALGORITHM])
         # Check if token is expired
         if payload.get("exp") and datetime.utcnow().timestamp() > payload["exp"]:
             return None
@@ -72,3 +67,81 @@ def get_rental_or_404(db: Session, rental_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rental not found")
     return rental
 
+
+def check_if_match(obj, if_match: Optional[str]):
+    """
+    412 unless the If-Match header names the row's current `version` (the
+    number from a response, bare or as an ETag: 3, "3", W/"3"; "*" matches any).
+
+    This only rejects clients that read an old version. The UPDATE itself is
+    a compare-and-swap on the version (version_id_col), so an update that lands
+    between this check and the commit fails too, with StaleDataError, which
+    main.py turns into the same 412.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return
+    versions = set()
+    for etag in if_match.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        etag = etag.strip('"')
+        if etag.isdigit():
+            versions.add(int(etag))
+    if obj.version not in versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Modified since it was read: current version is {obj.version}",
+        )
+
+
+def get_many(db: Session, model, ids: Iterable[int], *options) -> List:
+    """
+    Fetch rows by primary key in request order with one `WHERE id IN (...)`.
+
+    Objects already in the session's identity map (e.g. loaded by an earlier
+    sub-request of POST /batch) are reused instead of being queried again.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    missing = []
+    for pk in ids:
+        obj = db.identity_map.get(identity_key(model, pk))
+        if obj is not None:
+            found[pk] = obj
+        else:
+            missing.append(pk)
+    if missing:
+        query = db.query(model)
+        if options:
+            query = query.options(*options)
+        for obj in query.filter(model.id.in_(missing)).all():
+            found[obj.id] = obj
+    return [found[pk] for pk in ids if pk in found]
+
+def paginate(db: Session, stmt, skip: int, limit: int) -> List:
+    """
+    One page of an ORM select ordered by id. With SHARD_URLS set, offset and
+    limit would apply per shard, so the page is merged across them instead.
+    """
+    if get_shard_router() is not None:
+        from .sharding import merged_page
+        return merged_page(stmt, lambda row: row.id, skip, limit)
+    return db.scalars(stmt.offset(skip).limit(limit)).unique().all()
+
+def paginate_with_archive(db: Session, live_stmt, archived_stmt, skip: int, limit: int) -> List:
+    """Page through live rows first, then continue into the archive table (both selects ordered by id)."""
+    items = paginate(db, live_stmt, skip, limit)
+    if len(items) == limit:
+        return items
+    if items:
+        live_total = skip + len(items)
+    else:
+        live_total = db.scalar(select(func.count()).select_from(live_stmt.order_by(None).subquery()))
+    archived_skip = max(0, skip - live_total)
+    items += paginate(db, archived_stmt, archived_skip, limit - len(items))
+    return items
+    live_total = skip + len(items) if items else live_query.count()
+    archived_skip = max(0, skip - live_total)
+    items += archived_query.offset(archived_skip).limit(limit - len(items)).all()
+    return items
@@ -0,0 +1,99 @@
+# benchmarks/bench_admission.py - /health and cheap reads during a login flood
+#
+#   python benchmarks/bench_admission.py                    # 60 flooding clients for 5 s per mode
+#   python benchmarks/bench_admission.py --flooders 300 --seconds 10
+#
+# `--flooders` threads post logins (one bcrypt hash each) as fast as they can,
+# from one IP, while a prober times GET /health and GET /apartments/ every
+# 50 ms. "off" admits everything, so the flood holds every threadpool thread;
+# "on" uses the default rate and concurrency limits from app/config.py. The
+# clients run in-process and share the GIL, so compare modes, not absolute times.
+import argparse
+import dataclasses
+import os
+import threading
+import time
+from collections import Counter
+
+from common import percentile, prepare_database
+
+
+def seed(db):
+    from app import models, utils
+
+    for role_id, name in enumerate(("Admin", "Landlord", "Tenant"), start=1):
+        if db.get(models.Role, role_id) is None:
+            db.add(models.Role(id=role_id, name=name))
+    db.add(models.User(username="flood", email="flood@example.com",
+                       hashed_password=utils.get_password_hash("password1"), role_id=3))
+    db.commit()
+
+
+def run(client, mode: str, flooders: int, seconds: float):
+    from app import admission
+    from app.config import get_settings
+
+    middleware = admission._middlewares[-1]
+    settings = get_settings()
+    if mode == "off":
+        settings = dataclasses.replace(settings, rate_limits="", admission_route_limits="",
+                                       admission_max_concurrency=100000)
+    middleware.__init__(middleware.app, settings)
+
+    stop = time.perf_counter() + seconds
+    statuses = Counter()
+    probes = {"/health": [], "/apartments/": []}
+    lock = threading.Lock()
+
+    def flood():
+        while time.perf_counter() < stop:
+            response = client.post("/auth/login", data={"username": "flood", "password": "password1"})
+            with lock:
+                statuses[response.status_code] += 1
+
+    def probe():
+        while time.perf_counter() < stop:
+            for path, samples in probes.items():
+                started = time.perf_counter()
+                client.get(path)
+                samples.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=flood) for _ in range(flooders)] + [threading.Thread(target=probe)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    logins = "  ".join(f"{code}: {count}" for code, count in sorted(statuses.items()))
+    print(f"{mode:>3}: logins {logins}")
+    for path, samples in probes.items():
+        print(f"     {path:<13} p50 {percentile(samples, 50):8.1f} ms  p99 {percentile(samples, 99):8.1f} ms  "
+              f"max {max(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark admission control under a login flood")
+    parser.add_argument("--flooders", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LEASE_SWEEP_INTERVAL_SECONDS", "0")
+    prepare_database(args.database_url_from_env)
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.main import app
+
+    db = SessionLocal()
+    try:
+        seed(db)
+    finally:
+        db.close()
+    with TestClient(app, raise_server_exceptions=False) as client:
+        for mode in ("off", "on"):
+            run(client, mode, args.flooders, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_analytics.py - interval coverage and monthly bucketing at 10M rentals
+#
+#   python benchmarks/bench_analytics.py                         # 10M synthetic rentals, in memory
+#   python benchmarks/bench_analytics.py --rentals 1000000 --db  # also time the streaming query end to end
+#
+# The compute phase runs on synthetic columnar arrays, so it measures exactly what
+# app/analytics.py does after the query; a pure-Python version checks the result.
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from common import prepare_database
+
+
+def synthetic(rentals: int, apartments: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    groups = rng.integers(0, apartments, rentals)
+    starts = rng.integers(0, 3650, rentals)
+    ends = starts + rng.integers(1, 400, rentals)
+    return groups, starts, ends
+
+
+def python_covered_days(groups, starts, ends, n_groups):
+    covered = [0] * n_groups
+    by_group = {}
+    for g, s, e in zip(groups.tolist(), starts.tolist(), ends.tolist()):
+        by_group.setdefault(g, []).append((s, e))
+    for g, intervals in by_group.items():
+        intervals.sort()
+        reach = None
+        for s, e in intervals:
+            if reach is None or s > reach:
+                covered[g] += e - s
+                reach = e
+            elif e > reach:
+                covered[g] += e - reach
+                reach = e
+    return covered
+
+
+def bench_compute(rentals: int, apartments: int, check: int):
+    from app.analytics import covered_days
+
+    groups, starts, ends = synthetic(rentals, apartments)
+    started = time.perf_counter()
+    covered = covered_days(groups, starts, ends, apartments)
+    coverage_ms = (time.perf_counter() - started) * 1000
+
+    months = starts // 30
+    amounts = np.full(rentals, 1000.0)
+    started = time.perf_counter()
+    np.bincount(groups * 120 + months, weights=amounts, minlength=apartments * 120)
+    bucket_ms = (time.perf_counter() - started) * 1000
+    print(f"numpy  {rentals:>10} rentals / {apartments} apartments: "
+          f"coverage {coverage_ms:8.1f} ms, monthly buckets {bucket_ms:7.1f} ms")
+
+    # whole apartments, so the sample's intervals are complete
+    sample = groups < max(1, apartments * check // rentals)
+    started = time.perf_counter()
+    expected = python_covered_days(groups[sample], starts[sample], ends[sample], apartments)
+    python_ms = (time.perf_counter() - started) * 1000
+    got = covered_days(groups[sample], starts[sample], ends[sample], apartments)
+    assert list(got) == expected, "vectorized coverage disagrees with the reference"
+    print(f"python {len(groups[sample]):>10} rentals (reference check): {python_ms:8.1f} ms, results match")
+
+
+def bench_db(rentals: int, apartments: int):
+    from sqlalchemy import insert
+    from app import models
+    from app.analytics import occupancy_report, revenue_report
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        role = models.Role(name=f"Bench{time.time_ns()}")
+        db.add(role)
+        db.flush()
+        landlord = models.User(username=f"bench{time.time_ns()}", email=f"bench{time.time_ns()}@example.com",
+                               hashed_password="x", role_id=role.id)
+        db.add(landlord)
+        db.flush()
+        tenant = models.Tenant(user_id=landlord.id)
+        db.add(tenant)
+        db.flush()
+        db.execute(insert(models.Apartment), [
+            {"name": f"Apartment {i}", "rent_price": 1000, "landlord_id": landlord.id} for i in range(apartments)
+        ])
+        first_apartment = db.query(models.Apartment.id).order_by(models.Apartment.id).first()[0]
+        groups, starts, ends = synthetic(rentals, apartments)
+        epoch = date(2015, 1, 1)
+        batch = 100_000
+        for lo in range(0, rentals, batch):
+            db.execute(insert(models.Rental), [
+                {
+                    "apartment_id": first_apartment + int(g),
+                    "tenant_id": tenant.id,
+                    "start_date": epoch + timedelta(days=int(s)),
+                    "end_date": epoch + timedelta(days=int(e) - 1),
+                    "status": models.RentalStatus.ended,
+                    "total_amount": 1000,
+                }
+                for g, s, e in zip(groups[lo:lo + batch], starts[lo:lo + batch], ends[lo:lo + batch])
+            ])
+        db.commit()
+
+        start, end = date(2015, 1, 1), date(2025, 12, 31)
+        started = time.perf_counter()
+        report = occupancy_report(db, start, end, landlord.id)
+        occupancy_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        revenue_report(db, start, end, landlord.id)
+        revenue_ms = (time.perf_counter() - started) * 1000
+        print(f"db     {rentals:>10} rentals: /analytics/occupancy {occupancy_ms:8.1f} ms "
+              f"(rate {report['occupancy_rate']}), /analytics/revenue {revenue_ms:8.1f} ms")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analytics engine")
+    parser.add_argument("--rentals", type=int, default=10_000_000)
+    parser.add_argument("--apartments", type=int, default=50_000)
+    parser.add_argument("--check", type=int, default=200_000, help="rentals verified against pure Python")
+    parser.add_argument("--db", action="store_true", help="also seed a database and time the full reports")
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    bench_compute(args.rentals, args.apartments, args.check)
+    if args.db:
+        prepare_database(args.database_url_from_env)
+        bench_db(args.rentals, args.apartments)
+
+
+if __name__ == "__main__":
+    main()
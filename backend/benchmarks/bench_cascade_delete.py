@@ -0,0 +1,129 @@
+# benchmarks/bench_cascade_delete.py - time and memory of deleting an apartment with a long payment history
+#
+#   python benchmarks/bench_cascade_delete.py                  # throwaway SQLite database
+#   python benchmarks/bench_cascade_delete.py --sizes 1000 10000 100000
+#   DATABASE_URL=postgresql://... python benchmarks/bench_cascade_delete.py --database-url-from-env
+#
+# "passive" is what DELETE /apartments/{id} does now: one DELETE, the database
+# cascades. "loaded" reproduces the old ORM cascade by loading every child first.
+import argparse
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import prepare_database
+
+
+def seed(db, payments: int, rentals: int) -> int:
+    from sqlalchemy import insert
+    from app import models
+
+    role = db.query(models.Role).filter_by(name="Landlord").first()
+    if role is None:
+        role = models.Role(name="Landlord")
+        db.add(role)
+        db.flush()
+    suffix = f"{time.time_ns()}"
+    landlord = models.User(username=f"bench{suffix}", email=f"bench{suffix}@example.com",
+                           hashed_password="x", role_id=role.id)
+    tenant_user = models.User(username=f"tenant{suffix}", email=f"tenant{suffix}@example.com",
+                              hashed_password="x", role_id=role.id)
+    db.add_all([landlord, tenant_user])
+    db.flush()
+    apartment = models.Apartment(name="Bench", landlord_id=landlord.id)
+    tenant = models.Tenant(user_id=tenant_user.id)
+    db.add_all([apartment, tenant])
+    db.flush()
+
+    start = date(2000, 1, 1)
+    rental_ids = []
+    for i in range(rentals):
+        rental = models.Rental(apartment_id=apartment.id, tenant_id=tenant.id,
+                               start_date=start, end_date=start + timedelta(days=365),
+                               status=models.RentalStatus.ended, total_amount=1000)
+        db.add(rental)
+        db.flush()
+        rental_ids.append(rental.id)
+    db.execute(insert(models.Payment), [
+        {
+            "rental_id": rental_ids[i % rentals],
+            "payment_date": start + timedelta(days=i % 3650),
+            "amount": 1000,
+            "payment_method": models.PaymentMethod.bank_transfer,
+            "status": models.PaymentStatus.completed,
+        }
+        for i in range(payments)
+    ])
+    db.commit()
+    return apartment.id
+
+
+def delete_apartment(db, apartment_id: int, mode: str):
+    from sqlalchemy.orm import selectinload
+    from app import models
+
+    if mode == "loaded":
+        apartment = db.get(models.Apartment, apartment_id, options=[
+            selectinload(models.Apartment.rentals).selectinload(models.Rental.payments),
+            selectinload(models.Apartment.maintenance_requests),
+        ])
+    else:
+        apartment = db.get(models.Apartment, apartment_id)
+    db.delete(apartment)
+    db.commit()
+
+
+def run(payments: int, rentals: int, mode: str):
+    from sqlalchemy import event, func, select
+    from app import changes, models  # noqa: F401  (changes installs the change-feed hooks, as in the app)
+    from app.database import SessionLocal, get_engine
+
+    db = SessionLocal()
+    try:
+        apartment_id = seed(db, payments, rentals)
+        db.expunge_all()
+
+        statements = 0
+
+        def count(*args):
+            nonlocal statements
+            statements += 1
+
+        engine = get_engine()
+        event.listen(engine, "before_cursor_execute", count)
+        tracemalloc.start()
+        started = time.perf_counter()
+        delete_apartment(db, apartment_id, mode)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        event.remove(engine, "before_cursor_execute", count)
+
+        left = db.scalar(select(func.count()).select_from(models.Payment)
+                         .join(models.Rental).where(models.Rental.apartment_id == apartment_id))
+        assert left == 0, f"{left} payments survived the delete"
+        events = db.scalar(select(func.count()).select_from(models.ChangeEvent)
+                           .where(models.ChangeEvent.entity == "payment", models.ChangeEvent.op == "delete"))
+        print(f"{mode:>8} {payments:>9} payments  {elapsed_ms:9.1f} ms  "
+              f"peak {peak / 1024:9.1f} KiB  {statements:>6} statements  ({events} payment delete events so far)")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deleting an apartment with many payments")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rentals", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=["passive", "loaded"], choices=["passive", "loaded"])
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    for mode in args.modes:
+        for size in args.sizes:
+            run(size, args.rentals, mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_concurrent_updates.py - lost updates under concurrent read-modify-write
+#
+#   python benchmarks/bench_concurrent_updates.py                  # 8 clients x 25 increments each
+#   python benchmarks/bench_concurrent_updates.py --clients 32 --increments 50
+#   DATABASE_URL=postgresql://... python benchmarks/bench_concurrent_updates.py --database-url-from-env
+#
+# Every client repeatedly reads one apartment, adds 1 to its rent and PUTs it back.
+# "blind" sends no If-Match (last writer wins between a client's GET and PUT);
+# "if-match" sends the version it read and retries on 412. The final rent should
+# have grown by clients * increments: whatever is missing was lost.
+import argparse
+import os
+import threading
+import time
+
+from common import percentile, prepare_database
+
+
+def seed(db):
+    from app import models, utils
+
+    role = db.get(models.Role, 2) or models.Role(id=2, name="Landlord")
+    db.add(role)
+    landlord = models.User(username=f"bench{time.time_ns()}", email=f"bench{time.time_ns()}@example.com",
+                           hashed_password="x", role_id=role.id)
+    db.add(landlord)
+    db.flush()
+    apartment = models.Apartment(name="Contended", address="1 Main St", rent_price=0,
+                                 status=models.ApartmentStatus.available, landlord_id=landlord.id)
+    db.add(apartment)
+    db.commit()
+    token = utils.create_access_token(data={"sub": landlord.email, "user_id": landlord.id})
+    return apartment.id, landlord.id, {"Authorization": f"Bearer {token}"}
+
+
+def run(client, mode: str, apartment_id: int, landlord_id: int, headers, clients: int, increments: int):
+    start_rent = client.get(f"/apartments/{apartment_id}").json()["rent_price"]
+    conflicts = [0]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(increments):
+            while True:
+                started = time.perf_counter()
+                current = client.get(f"/apartments/{apartment_id}").json()
+                body = {key: current[key] for key in ("name", "address", "description", "status")}
+                body.update(rent_price=current["rent_price"] + 1, landlord_id=landlord_id)
+                extra = {"If-Match": f'"{current["version"]}"'} if mode == "if-match" else {}
+                response = client.put(f"/apartments/{apartment_id}", json=body, headers={**headers, **extra})
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code == 412:
+                    with lock:
+                        conflicts[0] += 1
+                    continue
+                response.raise_for_status()
+                break
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    final = client.get(f"/apartments/{apartment_id}").json()["rent_price"]
+    expected = clients * increments
+    print(f"{mode:>8}: rent +{final - start_rent:.0f} of +{expected}  lost {expected - (final - start_rent):.0f}  "
+          f"412 retries {conflicts[0]}  p50 {percentile(latencies, 50):6.1f} ms  p99 {percentile(latencies, 99):6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent update stress test")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--increments", type=int, default=25)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LEASE_SWEEP_INTERVAL_SECONDS", "0")
+    os.environ.setdefault("CACHE_TTL_SECONDS", "0")  # every GET reads the row, as a fresh client would
+    os.environ.setdefault("CACHE_STALE_SECONDS", "0")
+    prepare_database(args.database_url_from_env)
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.main import app
+
+    db = SessionLocal()
+    try:
+        apartment_id, landlord_id, headers = seed(db)
+    finally:
+        db.close()
+    with TestClient(app) as client:
+        for mode in ("blind", "if-match"):
+            run(client, mode, apartment_id, landlord_id, headers, args.clients, args.increments)
+
+
+if __name__ == "__main__":
+    main()
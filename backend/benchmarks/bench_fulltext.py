@@ -0,0 +1,99 @@
+# benchmarks/bench_fulltext.py - latency of GET /maintenance/search against a LIKE scan
+#
+#   python benchmarks/bench_fulltext.py                       # 200k requests in a throwaway SQLite database
+#   python benchmarks/bench_fulltext.py --requests 1000000
+#   DATABASE_URL=postgresql://... python benchmarks/bench_fulltext.py --database-url-from-env
+#
+# "fulltext" is app.fulltext.search_requests (index lookup, ranking, snippets and
+# the page's objects); "like" is the description ILIKE '%word%' scan it replaces,
+# newest first since it cannot rank.
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from common import percentile, prepare_database
+
+WORDS = (
+    "leak leaking water heater boiler broken window door lock sink toilet shower drain clogged mold "
+    "ceiling crack light switch outlet fridge oven stove noisy pipe radiator cold hot smell pest ant "
+    "roof tile floor carpet stain paint wall garage gate intercom elevator stairs balcony"
+).split()
+FILLER = "the a is and in of at since yesterday morning again still not working please fix".split()
+
+
+def seed(db, requests: int, batch: int = 20000):
+    from sqlalchemy import insert
+    from app import models
+
+    role = models.Role(name=f"Bench{time.time_ns()}")
+    db.add(role)
+    db.flush()
+    landlord = models.User(username=f"bench{time.time_ns()}", email=f"bench{time.time_ns()}@example.com",
+                           hashed_password="x", role_id=role.id)
+    db.add(landlord)
+    db.flush()
+    tenant = models.Tenant(user_id=landlord.id)
+    apartment = models.Apartment(name="Bench", landlord_id=landlord.id)
+    db.add_all([tenant, apartment])
+    db.flush()
+
+    rng = random.Random(42)
+    for start in range(0, requests, batch):
+        db.execute(insert(models.MaintenanceRequest), [
+            {"apartment_id": apartment.id, "tenant_id": tenant.id,
+             "description": " ".join(rng.choice(WORDS) if rng.random() < 0.4 else rng.choice(FILLER)
+                                     for _ in range(rng.randint(8, 40))),
+             "request_date": date(2025, 1, 1) + timedelta(days=rng.randrange(365)),
+             "status": rng.choice(list(models.MaintenanceStatus))}
+            for _ in range(start, min(requests, start + batch))
+        ])
+        db.commit()
+        print(f"seeded {min(requests, start + batch)} requests")
+
+
+def run(db, mode: str, queries: int):
+    from sqlalchemy import select
+    from app import models
+    from app.fulltext import search_requests
+
+    rng = random.Random(7)
+    samples = []
+    for _ in range(queries):
+        q = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+        started = time.perf_counter()
+        if mode == "fulltext":
+            search_requests(db, q)
+        else:
+            stmt = select(models.MaintenanceRequest).order_by(models.MaintenanceRequest.request_date.desc()).limit(20)
+            for word in q.split():
+                stmt = stmt.where(models.MaintenanceRequest.description.ilike(f"%{word}%"))
+            db.scalars(stmt).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{mode:>8}: p50 {percentile(samples, 50):7.2f} ms  p99 {percentile(samples, 99):7.2f} ms  "
+          f"max {max(samples):7.2f} ms over {queries} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark maintenance full-text search")
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["fulltext", "like"], choices=["fulltext", "like"])
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        seed(db, args.requests)
+        for mode in args.modes:
+            run(db, mode, args.queries)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
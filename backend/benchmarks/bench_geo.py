@@ -0,0 +1,79 @@
+# benchmarks/bench_geo.py - /apartments/nearby and /within latency as the listing table grows
+#
+#   python benchmarks/bench_geo.py                          # 10k, 100k and 1M listings
+#   DATABASE_URL=postgresql://... python benchmarks/bench_geo.py --database-url-from-env --sizes 1000000
+#
+# Listings are written straight into apartment_listings (no apartments behind
+# them: the geo queries only read the read model), spread over a 600 x 400 km
+# region. Each round adds listings up to the next size and times nearby
+# searches (2 km radius, status filter) and 0.05 degree map viewports at
+# random points; "scanned" is the mean number of listings in a nearby
+# search's box, the rows it reads. Latency should stay roughly flat while the table grows.
+import argparse
+import json
+import random
+import time
+
+from common import percentile, prepare_database
+
+
+def fill(db, start: int, stop: int, rng: random.Random, batch: int = 50000):
+    from sqlalchemy import insert
+    from app import geo, models
+
+    for low in range(start, stop, batch):
+        rows = []
+        for n in range(low + 1, min(stop, low + batch) + 1):
+            latitude, longitude = rng.uniform(50, 54), rng.uniform(10, 18)
+            status = rng.choice(("available", "rented", "maintenance"))
+            rows.append({
+                "apartment_id": n, "landlord_id": 1, "status": status, "rent_price": rng.randrange(500, 3000),
+                "occupied": False, "latitude": latitude, "longitude": longitude,
+                "geocell": geo.geocell(latitude, longitude),
+                "document": json.dumps({"id": n, "status": status, "latitude": latitude, "longitude": longitude}),
+            })
+        db.execute(insert(models.ApartmentListing.__table__), rows)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark geographic apartment search")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from sqlalchemy import func, select
+    from app import geo, models
+    from app.database import SessionLocal
+
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        have = db.scalar(select(func.count()).select_from(models.ApartmentListing)) or 0
+        for size in map(int, args.sizes.split(",")):
+            if size > have:
+                fill(db, have, size, rng)
+                have = size
+            points = [(rng.uniform(50.5, 53.5), rng.uniform(11, 17)) for _ in range(args.queries)]
+            nearby, within, scanned = [], [], 0
+            for latitude, longitude in points:
+                started = time.perf_counter()
+                hits = geo.nearby(db, latitude, longitude, 2000, 0, 50, 100000, status="available")
+                nearby.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                viewport = geo.within(db, latitude, longitude, latitude + 0.05, longitude + 0.05, 0, 200, 100000)
+                within.append((time.perf_counter() - started) * 1000)
+                scanned += len(geo.candidates(db, geo.circle_box(latitude, longitude, 2000), 100000))
+                assert hits is not None and viewport is not None
+            print(f"{size:>9} listings  nearby p50 {percentile(nearby, 50):6.2f} ms  p99 {percentile(nearby, 99):6.2f} ms  "
+                  f"within p50 {percentile(within, 50):6.2f} ms  p99 {percentile(within, 99):6.2f} ms  "
+                  f"scanned {scanned / len(points):6.1f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_jobs.py - job queue throughput with several workers claiming at once
+#
+#   python benchmarks/bench_jobs.py                         # 5000 jobs, 1/2/4 workers, 2 ms each
+#   DATABASE_URL=postgresql://... python benchmarks/bench_jobs.py --database-url-from-env --workers 1,4,16
+#
+# Each round queues --jobs jobs and drains them with that many app.jobs.Worker
+# instances (in threads, each with its own claims, as separate processes would
+# have). Every job must run exactly once; "dupes" counts the ones that did not.
+# SQLite commits one claim and one outcome per job through its single writer,
+# so workers only add throughput on Postgres.
+import argparse
+import threading
+import time
+from collections import Counter
+
+from common import prepare_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the background job queue")
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--job-ms", type=float, default=2)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app import jobs
+    from app.database import SessionLocal
+
+    runs = Counter()
+    lock = threading.Lock()
+
+    @jobs.job("bench.noop")
+    def noop(payload):
+        time.sleep(args.job_ms / 1000)
+        with lock:
+            runs[payload["n"]] += 1
+
+    for count in map(int, args.workers.split(",")):
+        runs.clear()
+        db = SessionLocal()
+        try:
+            jobs.enqueue_many(db, "bench.noop", [{"n": n} for n in range(args.jobs)])
+            db.commit()
+        finally:
+            db.close()
+        workers = [jobs.Worker(kinds=["bench.noop"]) for _ in range(count)]
+        threads = [threading.Thread(target=worker.run, kwargs={"drain": True}) for worker in workers]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        print(f"{count:3d} workers: {args.jobs / elapsed:8.0f} jobs/s  ran {len(runs)} of {args.jobs}  "
+              f"dupes {sum(n - 1 for n in runs.values())}")
+        jobs.purge(older_than_days=-1)
+
+
+if __name__ == "__main__":
+    main()
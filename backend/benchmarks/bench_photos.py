@@ -0,0 +1,166 @@
+# benchmarks/bench_photos.py - memory and event loop stalls while large photo uploads stream in
+#
+#   python benchmarks/bench_photos.py                       # 3 uploads of 10 photos of ~9 MB
+#   python benchmarks/bench_photos.py --uploads 5 --photos 10 --megapixels 24
+#
+# The app is driven as a bare ASGI callable (TestClient reads whole request
+# bodies into memory first): each upload's multipart body is handed over in
+# 64 KB chunks, as a server would. Meanwhile a prober calls GET /health every
+# 10 ms and a ticker measures how late the event loop wakes it. "heap peak" is
+# the most Python memory (tracemalloc) allocated at once above the baseline
+# while the uploads run; with streaming it stays around a few chunks, not the
+# total upload size.
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from common import percentile, prepare_database
+
+CHUNK = 64 * 1024
+BOUNDARY = "benchphotoboundary"
+
+
+def make_photo(megapixels: float) -> bytes:
+    from PIL import Image
+
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    noise = Image.effect_noise((width, height), 60).convert("RGB")  # noise barely compresses
+    out = io.BytesIO()
+    noise.save(out, "JPEG", quality=92)
+    return out.getvalue()
+
+
+def seed(db):
+    from app import models, utils
+
+    for role_id, name in enumerate(("Admin", "Landlord", "Tenant"), start=1):
+        db.add(models.Role(id=role_id, name=name))
+    landlord = models.User(username="landlord", email="landlord@example.com", hashed_password="x", role_id=2)
+    tenant_user = models.User(username="tenant", email="tenant@example.com", hashed_password="x", role_id=3)
+    db.add_all([landlord, tenant_user])
+    db.flush()
+    apartment = models.Apartment(name="A", address="1 Main St", rent_price=1000, landlord_id=landlord.id)
+    tenant = models.Tenant(user_id=tenant_user.id, phone="555")
+    db.add_all([apartment, tenant])
+    db.flush()
+    request = models.MaintenanceRequest(apartment_id=apartment.id, tenant_id=tenant.id, description="leak",
+                                        request_date=date.today())
+    db.add(request)
+    db.commit()
+    return request.id, utils.create_access_token(data={"sub": tenant_user.email, "user_id": tenant_user.id})
+
+
+async def call(app, method: str, path: str, token: str, body_chunks=(), content_type: str = ""):
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    if content_type:
+        headers.append((b"content-type", content_type.encode()))
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "headers": headers, "client": ("127.0.0.1", 1234), "server": ("test", 80)}
+    iterator = iter(body_chunks)
+    status = None
+
+    async def receive():
+        chunk = next(iterator, None)
+        await asyncio.sleep(0)  # a network read: give other tasks a turn
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def multipart(photo: bytes, photos: int):
+    for n in range(photos):
+        yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"p{n}.jpg\"\r\n"
+               f"Content-Type: image/jpeg\r\n\r\n").encode()
+        for start in range(0, len(photo), CHUNK):
+            yield photo[start:start + CHUNK]
+        yield b"\r\n"
+    yield f"--{BOUNDARY}--\r\n".encode()
+
+
+async def run(app, request_id: int, token: str, photo: bytes, uploads: int, photos: int):
+    done = asyncio.Event()
+    stalls, probes = [], []
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append((time.perf_counter() - started) * 1000 - 1)
+
+    async def prober():
+        while not done.is_set():
+            started = time.perf_counter()
+            await call(app, "GET", "/health", token)
+            probes.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.01)
+
+    async def upload():
+        return await call(app, "POST", f"/maintenance/{request_id}/photos", token, multipart(photo, photos),
+                          f"multipart/form-data; boundary={BOUNDARY}")
+
+    background = [asyncio.create_task(ticker()), asyncio.create_task(prober())]
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(upload() for _ in range(uploads)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*background)
+    return statuses, elapsed, stalls, probes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming photo uploads")
+    parser.add_argument("--uploads", type=int, default=3, help="concurrent upload requests")
+    parser.add_argument("--photos", type=int, default=10, help="photos per upload")
+    parser.add_argument("--megapixels", type=float, default=12)
+    args = parser.parse_args()
+
+    os.environ.setdefault("PHOTO_STORE_DIR", tempfile.mkdtemp())
+    os.environ["RATE_LIMITS"] = ""
+    prepare_database(False)
+    from app.database import SessionLocal
+    from app.main import app
+    from app import photos
+
+    db = SessionLocal()
+    try:
+        request_id, token = seed(db)
+    finally:
+        db.close()
+    photo = make_photo(args.megapixels)
+    total_mb = args.uploads * args.photos * len(photo) / 1e6
+    print(f"{args.uploads} uploads x {args.photos} photos of {len(photo) / 1e6:.1f} MB ({total_mb:.0f} MB in all)")
+
+    async def bench():
+        await run(app, request_id, token, photo, 1, 1)  # start the Pillow process pool
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        statuses, elapsed, stalls, probes = await run(app, request_id, token, photo, args.uploads, args.photos)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        print(f"statuses {sorted(set(statuses))}  {elapsed:.1f} s  ({total_mb / elapsed:.0f} MB/s)")
+        print(f"heap peak {peak / 1e6:.1f} MB over the baseline")
+        print(f"event loop lateness p50 {percentile(stalls, 50):.1f} ms  p99 {percentile(stalls, 99):.1f} ms  "
+              f"max {max(stalls):.1f} ms")
+        print(f"GET /health during uploads p50 {percentile(probes, 50):.1f} ms  p99 {percentile(probes, 99):.1f} ms")
+
+    try:
+        asyncio.run(bench())
+    finally:
+        photos.shutdown()
+
+
+if __name__ == "__main__":
+    main()
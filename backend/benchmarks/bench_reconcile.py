@@ -0,0 +1,119 @@
+# benchmarks/bench_reconcile.py - reconcile a large bank statement against pending payments
+#
+#   python benchmarks/bench_reconcile.py                          # 1M lines, 200k pending payments
+#   python benchmarks/bench_reconcile.py --lines 5000000 --pending 1000000
+#
+# Time and peak RSS growth of reconcile_statement(), reading the CSV from disk the
+# way POST /payments/reconcile reads its spooled upload.
+import argparse
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import prepare_database
+
+
+def seed(db, pending: int, rentals: int = 1000):
+    from sqlalchemy import insert
+    from app import models
+
+    role = models.Role(name=f"Bench{time.time_ns()}")
+    db.add(role)
+    db.flush()
+    user = models.User(username=f"bench{time.time_ns()}", email=f"bench{time.time_ns()}@example.com",
+                       hashed_password="x", role_id=role.id)
+    db.add(user)
+    db.flush()
+    apartment = models.Apartment(name="Bench", landlord_id=user.id)
+    tenant = models.Tenant(user_id=user.id)
+    db.add_all([apartment, tenant])
+    db.flush()
+    db.execute(insert(models.Rental), [
+        {"apartment_id": apartment.id, "tenant_id": tenant.id, "status": models.RentalStatus.active}
+        for _ in range(rentals)
+    ])
+    first_rental = db.query(models.Rental.id).order_by(models.Rental.id).first()[0]
+
+    rng = random.Random(3)
+    start = date(2024, 1, 1)
+    payments = []
+    for i in range(pending):
+        payments.append({
+            "rental_id": first_rental + rng.randrange(rentals),
+            "payment_date": start + timedelta(days=rng.randrange(365)),
+            "amount": rng.randrange(50000, 300000) / 100,
+            "payment_method": models.PaymentMethod.bank_transfer,
+            "status": models.PaymentStatus.pending,
+        })
+        if len(payments) == 50000:
+            db.execute(insert(models.Payment), payments)
+            payments = []
+    if payments:
+        db.execute(insert(models.Payment), payments)
+    db.commit()
+
+
+def write_statement(db, lines: int) -> str:
+    """Every pending payment appears once (shifted by up to 2 days); the rest is noise."""
+    from sqlalchemy import select
+    from app import models
+
+    rng = random.Random(5)
+    path = os.path.join(tempfile.mkdtemp(), "statement.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Amount", "Reference"])
+        written = 0
+        rows = db.execute(select(models.Payment.rental_id, models.Payment.payment_date, models.Payment.amount)
+                          .where(models.Payment.status == models.PaymentStatus.pending))
+        for rental_id, payment_date, amount in rows:
+            if written == lines:
+                break
+            shifted = payment_date + timedelta(days=rng.randint(-2, 2))
+            writer.writerow([shifted.isoformat(), f"{amount:.2f}", f"RENT-{rental_id} transfer"])
+            written += 1
+        while written < lines:
+            day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+            amount = rng.randrange(-50000, 300000) / 100
+            writer.writerow([day.isoformat(), f"{amount:.2f}", "card payment"])
+            written += 1
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bank statement reconciliation")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--pending", type=int, default=200_000)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app.database import SessionLocal
+    from app.reconcile import reconcile_statement
+
+    db = SessionLocal()
+    try:
+        seed(db, args.pending)
+        path = write_statement(db, args.lines)
+        db.expunge_all()
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        with open(path, newline="", encoding="utf-8-sig") as lines:
+            report = reconcile_statement(db, lines)
+        elapsed = time.perf_counter() - started
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        print(f"{report['lines']} lines, {report['pending_before']} pending: {report['matched']} matched, "
+              f"{report['updated']} updated, {report['unmatched']} unmatched in {elapsed:.2f} s; "
+              f"peak RSS grew {rss_growth / 1024:.1f} MiB")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_search.py - latency of the typeahead search behind /users/search
+#
+#   python benchmarks/bench_search.py                     # 200k users in a throwaway SQLite database
+#   python benchmarks/bench_search.py --users 2000000
+#   DATABASE_URL=postgresql://... python benchmarks/bench_search.py --database-url-from-env
+#
+# "sql" is the default LIKE 'q%' path, "index" the in-process sorted array (SEARCH_INDEX=1).
+import argparse
+import os
+import random
+import string
+import time
+
+from common import percentile, prepare_database
+
+
+def seed(db, users: int, batch: int = 50000):
+    from sqlalchemy import insert
+    from app import models
+
+    role = models.Role(name=f"Bench{time.time_ns()}")
+    db.add(role)
+    db.flush()
+    rng = random.Random(42)
+    suffix = time.time_ns()
+    for start in range(0, users, batch):
+        rows = []
+        for i in range(start, min(users, start + batch)):
+            name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+            rows.append({
+                "username": f"{name}{i}_{suffix}",
+                "email": f"{name[::-1]}{i}_{suffix}@example.com",
+                "hashed_password": "x",
+                "role_id": role.id,
+            })
+        db.execute(insert(models.User), rows)
+        db.commit()
+        print(f"seeded {min(users, start + batch)} users")
+
+
+def run(db, mode: str, queries: int):
+    from app import models
+    from app.config import get_settings
+    from app.search import search_ids
+
+    os.environ["SEARCH_INDEX"] = "1" if mode == "index" else "0"
+    get_settings.cache_clear()
+    search_ids(db, models.User, "warmup", 10)
+
+    rng = random.Random(7)
+    samples = []
+    for _ in range(queries):
+        q = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 4)))
+        started = time.perf_counter()
+        search_ids(db, models.User, q, 10)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{mode:>6}: p50 {percentile(samples, 50):7.2f} ms  p99 {percentile(samples, 99):7.2f} ms  "
+          f"max {max(samples):7.2f} ms over {queries} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user typeahead search")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", default=["sql", "index"], choices=["sql", "index"])
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        seed(db, args.users)
+        for mode in args.modes:
+            run(db, mode, args.queries)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
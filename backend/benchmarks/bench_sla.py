@@ -0,0 +1,126 @@
+# benchmarks/bench_sla.py - SLA percentiles from rollup buckets vs. rescanning the status history
+#
+#   python benchmarks/bench_sla.py                       # 500k resolved requests over 200 apartments
+#   python benchmarks/bench_sla.py --requests 2000000
+#
+# Seeds status history directly, builds the rollup with app.sla.rebuild(), then times
+# GET /maintenance/sla's query against an exact percentile computed from the history.
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from common import percentile, prepare_database
+
+
+def seed(db, requests: int, apartments: int):
+    from sqlalchemy import insert
+    from app import models
+
+    role = models.Role(name=f"Bench{time.time_ns()}")
+    db.add(role)
+    db.flush()
+    landlord = models.User(username=f"bench{time.time_ns()}", email=f"bench{time.time_ns()}@example.com",
+                           hashed_password="x", role_id=role.id)
+    db.add(landlord)
+    db.flush()
+    tenant = models.Tenant(user_id=landlord.id)
+    db.add(tenant)
+    db.flush()
+    db.execute(insert(models.Apartment), [
+        {"name": f"Apartment {i}", "landlord_id": landlord.id} for i in range(apartments)
+    ])
+    first_apartment = db.query(models.Apartment.id).order_by(models.Apartment.id).first()[0]
+
+    rng = random.Random(7)
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    batch = 20_000
+    for lo in range(0, requests, batch):
+        n = min(batch, requests - lo)
+        opened = [epoch + timedelta(seconds=rng.randrange(365 * 86400)) for _ in range(n)]
+        db.execute(insert(models.MaintenanceRequest), [
+            {"apartment_id": first_apartment + rng.randrange(apartments), "tenant_id": tenant.id,
+             "description": "bench", "request_date": at.date(), "status": models.MaintenanceStatus.completed}
+            for at in opened
+        ])
+        ids = [i for (i,) in db.query(models.MaintenanceRequest.id).order_by(models.MaintenanceRequest.id.desc())
+               .limit(n)][::-1]
+        changes = []
+        for request_id, at in zip(ids, opened):
+            started = at + timedelta(hours=rng.expovariate(1 / 6))
+            changes += [
+                {"request_id": request_id, "from_status": None,
+                 "to_status": models.MaintenanceStatus.pending, "changed_at": at},
+                {"request_id": request_id, "from_status": models.MaintenanceStatus.pending,
+                 "to_status": models.MaintenanceStatus.in_progress, "changed_at": started},
+                {"request_id": request_id, "from_status": models.MaintenanceStatus.in_progress,
+                 "to_status": models.MaintenanceStatus.completed,
+                 "changed_at": started + timedelta(hours=rng.lognormvariate(3, 1))},
+            ]
+        db.execute(insert(models.MaintenanceStatusChange), changes)
+    db.commit()
+    return landlord.id
+
+
+def exact_resolve_hours(db, landlord_id: int):
+    """What the report would cost without rollups: every resolution time, read back from history."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
+    from app import models
+
+    opened, done = aliased(models.MaintenanceStatusChange), aliased(models.MaintenanceStatusChange)
+    rows = db.execute(
+        select(opened.changed_at, done.changed_at)
+        .join(done, done.request_id == opened.request_id)
+        .join(models.MaintenanceRequest, models.MaintenanceRequest.id == opened.request_id)
+        .join(models.Apartment, models.Apartment.id == models.MaintenanceRequest.apartment_id)
+        .where(opened.from_status.is_(None), done.to_status == models.MaintenanceStatus.completed,
+               models.Apartment.landlord_id == landlord_id)
+    )
+    return [(end - start).total_seconds() / 3600 for start, end in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the maintenance SLA report")
+    parser.add_argument("--requests", type=int, default=500_000)
+    parser.add_argument("--apartments", type=int, default=200)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app.database import SessionLocal
+    from app.sla import rebuild, sla_report
+
+    db = SessionLocal()
+    try:
+        landlord_id = seed(db, args.requests, args.apartments)
+        started = time.perf_counter()
+        buckets = rebuild(db)
+        print(f"rebuild: {buckets} rollup buckets from {args.requests * 3} transitions "
+              f"in {time.perf_counter() - started:.2f} s")
+
+        started = time.perf_counter()
+        overall = sla_report(db, ["landlord_id"], landlord_id)["groups"][0]["resolve"]
+        rollup_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        per_cell = sla_report(db, landlord_id=landlord_id)
+        cells_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        hours = exact_resolve_hours(db, landlord_id)
+        exact = {p: percentile(hours, p) for p in (50, 90, 99)}
+        scan_ms = (time.perf_counter() - started) * 1000
+
+        print(f"rollup  landlord total {rollup_ms:8.1f} ms, {len(per_cell['groups'])} apartment/month groups "
+              f"{cells_ms:8.1f} ms")
+        print(f"history rescan         {scan_ms:8.1f} ms")
+        for p in (50, 90, 99):
+            approx = overall[f"p{p}_hours"]
+            print(f"  p{p}: rollup {approx:8.2f} h, exact {exact[p]:8.2f} h "
+                  f"({abs(approx - exact[p]) / exact[p]:.2%} off)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
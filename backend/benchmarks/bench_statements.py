@@ -0,0 +1,134 @@
+# benchmarks/bench_statements.py - building every landlord's monthly statement
+#
+#   python benchmarks/bench_statements.py                    # 200 landlords x 5 apartments, 2 years of payments
+#   python benchmarks/bench_statements.py --landlords 2000 --workers 8
+#   DATABASE_URL=postgresql://... python benchmarks/bench_statements.py --database-url-from-env
+#
+# "orm" walks landlord -> apartments -> rentals -> payments through lazy loads,
+# the way a statement was put together before; "set" is app.statements with one
+# worker and "parallel" with --workers. Both totals are compared so the
+# benchmark also checks the set-based figures. Doubling --landlords should
+# roughly double the "set" time (linear in payments). On SQLite the workers
+# share one file and the GIL, so "parallel" only pays off on Postgres.
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from common import prepare_database
+
+PERIOD = "2025-06"
+
+
+def seed(db, landlords: int, apartments: int, batch: int = 20000):
+    from sqlalchemy import insert, select
+    from app import models
+
+    role = db.get(models.Role, 2) or models.Role(id=2, name="Landlord")
+    db.add(role)
+    db.flush()
+    db.execute(insert(models.User), [
+        {"username": f"bench{i}", "email": f"bench{i}@example.com", "hashed_password": "x", "role_id": role.id}
+        for i in range(landlords)
+    ])
+    landlord_ids = db.scalars(select(models.User.id).where(models.User.username.like("bench%"))).all()
+    tenant = models.Tenant(user_id=landlord_ids[0])
+    db.add(tenant)
+    db.flush()
+    db.execute(insert(models.Apartment), [
+        {"name": f"Apartment {i}", "landlord_id": landlord_id, "rent_price": 1000}
+        for landlord_id in landlord_ids for i in range(apartments)
+    ])
+    apartment_ids = db.scalars(select(models.Apartment.id)).all()
+    db.execute(insert(models.Rental), [
+        {"apartment_id": apartment_id, "tenant_id": tenant.id, "start_date": date(2024, 7, 1),
+         "end_date": date(2026, 6, 30), "status": models.RentalStatus.active, "total_amount": 24000}
+        for apartment_id in apartment_ids
+    ])
+    rental_ids = db.scalars(select(models.Rental.id)).all()
+
+    rng = random.Random(42)
+    methods, statuses = list(models.PaymentMethod), list(models.PaymentStatus)
+    payments = [
+        {"rental_id": rental_id, "payment_date": date(2024, 7, 1) + timedelta(days=30 * month + rng.randrange(5)),
+         "amount": 1000, "payment_method": rng.choice(methods), "status": rng.choice(statuses)}
+        for rental_id in rental_ids for month in range(24)
+    ]
+    for start in range(0, len(payments), batch):
+        db.execute(insert(models.Payment), payments[start:start + batch])
+    db.commit()
+    print(f"seeded {len(landlord_ids)} landlords, {len(apartment_ids)} apartments, {len(payments)} payments")
+
+
+def orm_totals(db):
+    """Received in the period and outstanding per landlord, one object at a time."""
+    from app import models
+    from app.statements import parse_period
+
+    start, end = parse_period(PERIOD)
+    totals = {}
+    for landlord in db.query(models.User).join(models.Apartment).distinct():
+        received = outstanding = 0.0
+        for apartment in landlord.apartments:
+            for rental in apartment.rentals:
+                paid = 0.0
+                for payment in rental.payments:
+                    if payment.status is models.PaymentStatus.completed and payment.payment_date <= end:
+                        paid += float(payment.amount)
+                        if payment.payment_date >= start:
+                            received += float(payment.amount)
+                outstanding += max(0.0, float(rental.total_amount) - paid)
+        totals[landlord.id] = (round(received, 2), round(outstanding, 2))
+    return totals
+
+
+def set_totals(workers: int):
+    import json
+    from sqlalchemy import select
+    from app import models
+    from app.database import get_engine
+    from app.statements import generate
+
+    generate(PERIOD, regenerate=True, workers=workers)
+    table = models.LandlordStatement.__table__
+    with get_engine().connect() as conn:
+        revision = conn.scalar(select(table.c.revision).order_by(table.c.revision.desc()).limit(1))
+        documents = conn.scalars(
+            select(table.c.document).where(table.c.period == PERIOD, table.c.revision == revision)
+        ).all()
+    totals = {}
+    for document in map(json.loads, documents):
+        totals[document["landlord_id"]] = (document["totals"]["received"], document["totals"]["outstanding"])
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark landlord statement generation")
+    parser.add_argument("--landlords", type=int, default=200)
+    parser.add_argument("--apartments", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    prepare_database(args.database_url_from_env)
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        seed(db, args.landlords, args.apartments)
+        started = time.perf_counter()
+        expected = orm_totals(db)
+        print(f"     orm: {(time.perf_counter() - started) * 1000:8.0f} ms")
+    finally:
+        db.close()
+    for mode, workers in (("set", 1), ("parallel", args.workers)):
+        started = time.perf_counter()
+        totals = set_totals(workers)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{mode:>8}: {elapsed:8.0f} ms  ({len(totals)} statements, "
+              f"{'match' if totals == expected else 'MISMATCH'} with orm totals)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# benchmarks/check_query_plans.py - fail when a hot endpoint's queries get a worse plan
+#
+#   python benchmarks/check_query_plans.py                        # throwaway SQLite, compare to baseline
+#   python benchmarks/check_query_plans.py --database-url-from-env  # e.g. a scratch Postgres
+#   python benchmarks/check_query_plans.py --update               # accept the current plans
+#
+# Seeds a database, calls each endpoint in HOT_ENDPOINTS through the app while
+# recording the SELECTs it sends, and EXPLAINs every one of them (EXPLAIN QUERY
+# PLAN on SQLite, EXPLAIN (FORMAT JSON) on Postgres). A query fails the check when,
+# compared with query_plans.json for the same dialect, it
+#   * scans a table sequentially that it did not scan before,
+#   * needs more sorts (temp b-trees on SQLite),
+#   * costs more than --cost-tolerance above its baseline (Postgres only), or
+#   * is new: a different or additional query (an N+1 shows up here too).
+# Review the plans and rerun with --update to accept intended changes.
+import argparse
+import json
+import os
+import random
+import re
+import sys
+from collections import Counter
+from datetime import date, timedelta
+
+from common import BACKEND, prepare_database
+
+BASELINE = os.path.join(BACKEND, "benchmarks", "query_plans.json")
+PASSWORD = "benchmark-password"
+
+# name -> (method, path, auth) with {placeholders} filled from the seeded ids
+HOT_ENDPOINTS = {
+    "login": ("POST", "/auth/login", None),
+    "apartments.list": ("GET", "/apartments/", None),
+    "apartments.by_landlord": ("GET", "/apartments/?landlord_id={landlord_id}", None),
+    "apartments.filtered": ("GET", "/apartments/?status=available&max_rent=1500", None),
+    "apartments.projection": ("GET", "/apartments/?fields=id,name&expand=landlord", None),
+    "apartments.nearby": ("GET", "/apartments/nearby?lat=52.52&lon=13.40&radius=2000&status=available", None),
+    "apartments.within": ("GET", "/apartments/within?south=52.5&west=13.35&north=52.54&east=13.45", None),
+    "apartments.get": ("GET", "/apartments/{apartment_id}", None),
+    "rentals.list": ("GET", "/rentals/", None),
+    "rentals.get": ("GET", "/rentals/{rental_id}", None),
+    "payments.list": ("GET", "/payments/", None),
+    "maintenance.list": ("GET", "/maintenance/", None),
+    "maintenance.get": ("GET", "/maintenance/{request_id}", None),
+    "maintenance.sla": ("GET", "/maintenance/sla?landlord_id={landlord_id}", "admin"),
+    "maintenance.search": ("GET", "/maintenance/search?q=leaking+heater", "admin"),
+    "tenants.search": ("GET", "/tenants/search?q=555", None),
+    "users.search": ("GET", "/users/search?q=landlord1", "admin"),
+    "users.get": ("GET", "/users/{landlord_id}", "admin"),
+    "me": ("GET", "/me", "tenant"),
+    "changes": ("GET", "/changes/?since=0", "admin"),
+}
+
+
+def seed(db, scale: int):
+    """Deterministic data set; `scale` multiplies every table so plans see realistic row counts."""
+    from sqlalchemy import insert
+    from app import models, utils
+
+    rng = random.Random(42)
+    hashed = utils.get_password_hash(PASSWORD)
+    for role_id, name in enumerate(("Admin", "Landlord", "Tenant"), 1):
+        db.add(models.Role(id=role_id, name=name))
+    db.flush()
+
+    users = [{"id": 1, "username": "admin", "email": "admin@example.com", "hashed_password": hashed, "role_id": 1}]
+    landlords = list(range(2, 2 + 10 * scale))
+    tenant_users = list(range(landlords[-1] + 1, landlords[-1] + 1 + 100 * scale))
+    users += [{"id": i, "username": f"landlord{i}", "email": f"landlord{i}@example.com",
+               "hashed_password": hashed, "role_id": 2} for i in landlords]
+    users += [{"id": i, "username": f"tenant{i}", "email": f"tenant{i}@example.com",
+               "hashed_password": hashed, "role_id": 3} for i in tenant_users]
+    db.execute(insert(models.User.__table__), users)
+    db.execute(insert(models.Tenant.__table__), [
+        {"id": n, "user_id": user_id, "phone": f"555{n:07d}", "address": f"{n} Tenant St"}
+        for n, user_id in enumerate(tenant_users, 1)
+    ])
+    apartments = 200 * scale
+    statuses = list(models.ApartmentStatus)
+    places = random.Random(7)  # its own sequence, so coordinates leave the other columns as they were
+    db.execute(insert(models.Apartment.__table__), [
+        {"id": n, "name": f"Apartment {n}", "address": f"{n} Main St", "rent_price": rng.randrange(500, 3000),
+         "description": "seeded", "status": rng.choice(statuses), "landlord_id": rng.choice(landlords),
+         "latitude": 52.52 + places.uniform(-0.2, 0.2), "longitude": 13.40 + places.uniform(-0.3, 0.3)}
+        for n in range(1, apartments + 1)
+    ])
+    start = date(2022, 1, 1)
+    rentals = []
+    for n in range(1, 500 * scale + 1):
+        begins = start + timedelta(days=rng.randrange(1000))
+        rentals.append({"id": n, "apartment_id": rng.randrange(1, apartments + 1),
+                        "tenant_id": rng.randrange(1, len(tenant_users) + 1), "start_date": begins,
+                        "end_date": begins + timedelta(days=365), "total_amount": 12000,
+                        "status": rng.choice(list(models.RentalStatus))})
+    db.execute(insert(models.Rental.__table__), rentals)
+    db.execute(insert(models.Payment.__table__), [
+        {"rental_id": r["id"], "payment_date": r["start_date"] + timedelta(days=30 * m), "amount": 1000,
+         "payment_method": models.PaymentMethod.bank_transfer, "status": models.PaymentStatus.completed}
+        for r in rentals for m in range(4)
+    ])
+    words = ["leaking", "heater", "broken", "window", "sink", "door", "noisy", "mold", "light", "lock"]
+    db.execute(insert(models.MaintenanceRequest.__table__), [
+        {"id": n, "apartment_id": rng.randrange(1, apartments + 1), "tenant_id": rng.randrange(1, len(tenant_users) + 1),
+         "description": " ".join(rng.choices(words, k=8)), "request_date": start + timedelta(days=rng.randrange(1000)),
+         "status": rng.choice(list(models.MaintenanceStatus))}
+        for n in range(1, 300 * scale + 1)
+    ])
+    db.commit()
+    return {
+        "landlord_id": landlords[0], "landlord_name": f"landlord{landlords[0]}", "tenant_user_id": tenant_users[0],
+        "apartment_id": apartments // 2, "rental_id": len(rentals) // 2, "request_id": 1,
+    }
+
+
+def normalize(sql: str) -> str:
+    sql = " ".join(sql.split())
+    # expanded IN lists differ in length from run to run
+    sql = re.sub(r"\((?:\?, )+\?\)", "(?)", sql)
+    return re.sub(r"\((?:%\(\w+\)s, )+%\(\w+\)s\)", "(?)", sql)
+
+
+def explain(conn, statement: str, parameters) -> dict:
+    if conn.dialect.name == "postgresql":
+        raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        seq_scans, sorts, stack = [], 0, [plan]
+        while stack:
+            node = stack.pop()
+            if node["Node Type"] == "Seq Scan":
+                seq_scans.append(node["Relation Name"])
+            elif node["Node Type"] in ("Sort", "Incremental Sort"):
+                sorts += 1
+            stack.extend(node.get("Plans", []))
+        return {"seq_scans": sorted(set(seq_scans)), "sorts": sorts, "cost": plan["Total Cost"]}
+
+    details = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    seq_scans = sorted({d.split()[1] for d in details
+                        if d.startswith("SCAN ") and " USING " not in d and "CONSTANT ROW" not in d
+                        and " VIRTUAL TABLE INDEX " not in d})  # FTS5 lookups
+    sorts = sum(1 for d in details if d.startswith("USE TEMP B-TREE"))
+    return {"seq_scans": seq_scans, "sorts": sorts, "cost": None}
+
+
+def capture_plans(client, engine, ids, tokens) -> dict:
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        head = statement.lstrip().upper()
+        if not executemany and head.startswith(("SELECT", "WITH")) and head.rstrip() != "SELECT 1":
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    plans = {}
+    try:
+        for name, (method, path, auth) in HOT_ENDPOINTS.items():
+            statements.clear()
+            headers = {"Authorization": f"Bearer {tokens[auth]}"} if auth else {}
+            if name == "login":
+                response = client.post(path, data={"username": ids["landlord_name"], "password": PASSWORD})
+            else:
+                response = client.request(method, path.format(**ids), headers=headers)
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: {method} {path} returned {response.status_code}: {response.text[:200]}")
+            captured = list(statements)
+            with engine.connect() as conn:
+                plans[name] = [{"sql": normalize(sql), **explain(conn, sql, params)} for sql, params in captured]
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return plans
+
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    failures = []
+    for name, queries in current.items():
+        known = {q["sql"]: q for q in baseline.get(name, [])}
+        for query in queries:
+            before = known.get(query["sql"])
+            label = f"{name}: {query['sql'][:120]}"
+            if before is None:
+                failures.append(f"{label}\n    new query (not in the baseline)")
+                continue
+            new_scans = set(query["seq_scans"]) - set(before["seq_scans"])
+            if new_scans:
+                failures.append(f"{label}\n    new sequential scan of {', '.join(sorted(new_scans))}")
+            if query["sorts"] > before["sorts"]:
+                failures.append(f"{label}\n    sorts {before['sorts']} -> {query['sorts']}")
+            if query["cost"] is not None and before.get("cost") and query["cost"] > before["cost"] * (1 + tolerance):
+                failures.append(f"{label}\n    estimated cost {before['cost']} -> {query['cost']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query-plan regression check for hot endpoints")
+    parser.add_argument("--scale", type=int, default=10, help="data set size multiplier")
+    parser.add_argument("--update", action="store_true", help="write the current plans as the baseline")
+    parser.add_argument("--cost-tolerance", type=float, default=0.2)
+    parser.add_argument("--database-url-from-env", action="store_true",
+                        help="use DATABASE_URL (an empty scratch database) instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LEASE_SWEEP_INTERVAL_SECONDS", "0")
+    prepare_database(args.database_url_from_env)
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+    from app import listings, utils
+    from app.database import SessionLocal, get_engine
+    from app.main import app
+
+    engine = get_engine()
+    db = SessionLocal()
+    try:
+        ids = seed(db, args.scale)
+        listings.rebuild(db)
+        db.execute(text("ANALYZE"))
+        db.commit()
+    finally:
+        db.close()
+
+    def token(user_id, email):
+        return utils.create_access_token(data={"sub": email, "user_id": user_id})
+
+    tokens = {
+        "admin": token(1, "admin@example.com"),
+        "tenant": token(ids["tenant_user_id"], f"tenant{ids['tenant_user_id']}@example.com"),
+    }
+    with TestClient(app) as client:
+        current = capture_plans(client, engine, ids, tokens)
+
+    dialect = engine.dialect.name
+    baselines = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baselines = json.load(f)
+
+    if args.update:
+        baselines[dialect] = current
+        with open(BASELINE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {sum(len(q) for q in current.values())} {dialect} query plans to {BASELINE}")
+        return
+
+    if dialect not in baselines:
+        sys.exit(f"No {dialect} baseline in {BASELINE}; run with --update to record one")
+    failures = compare(baselines[dialect], current, args.cost_tolerance)
+    for name, queries in current.items():
+        scans = sorted({t for q in queries for t in q["seq_scans"]})
+        print(f"{name:24s} {len(queries):2d} queries" + (f"  seq scans: {', '.join(scans)}" if scans else ""))
+    if failures:
+        repeated = Counter(failures)  # an N+1 repeats the same new query per row
+        print(f"\n{len(repeated)} plan regression(s):")
+        for failure, count in repeated.items():
+            print(f"  {failure}" + (f" (x{count})" if count > 1 else ""))
+        sys.exit(1)
+    print("\nNo plan regressions")
+
+
+if __name__ == "__main__":
+    main()
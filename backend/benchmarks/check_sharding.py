@@ -0,0 +1,188 @@
+# benchmarks/check_sharding.py - the API answers the same over three SQLite shards as over one database
+#
+#   python benchmarks/check_sharding.py
+#
+# Seeds the same data twice, once into a single SQLite database and once into
+# main + two shards (SHARD_URLS="eu=...,us=..."; landlords are hashed onto all
+# three), then calls the read routes below and a few aggregates straight
+# through a session. Every answer must match the single database's. Each run
+# is a subprocess, since the engines and settings are created once per process.
+# Lists are compared in the order they come back, small pages included: with
+# SHARD_URLS set, offset and limit must apply to the merged list, not to each
+# shard's. The exit status is 1 on any difference.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from common import BACKEND
+
+SHARDS = ("eu", "us")
+LANDLORDS = 9
+TODAY = date(2026, 6, 30)
+START, END = date(2025, 7, 1), TODAY
+
+ROUTES = {
+    "analytics.occupancy": f"/analytics/occupancy?start={START}&end={END}",
+    "analytics.revenue": f"/analytics/revenue?start={START}&end={END}",
+    "analytics.revenue.landlord": f"/analytics/revenue?start={START}&end={END}&landlord_id={{landlord_id}}",
+    "apartments.list": "/apartments/?limit=1000",
+    "apartments.by_landlord": "/apartments/?landlord_id={landlord_id}",
+    "rentals.list": "/rentals/?limit=1000",
+    "rentals.with_archive": "/rentals/?include_archived=true&skip=1000&limit=1000",
+    "rentals.page": "/rentals/?limit=5",
+    "rentals.page.archive": "/rentals/?include_archived=true&skip={live_rentals}&limit=4",
+    "rentals.page.across": "/rentals/?include_archived=true&skip={live_rentals_2}&limit=5",
+    "payments.list": "/payments/?limit=1000",
+    "payments.page": "/payments/?skip=5&limit=5",
+    "payments.page.across": "/payments/?include_archived=true&skip={live_payments_2}&limit=5",
+    "maintenance.list": "/maintenance/?limit=1000",
+    "maintenance.page": "/maintenance/?limit=3",
+    "maintenance.page.skip": "/maintenance/?skip=10&limit=3",
+    "tenants.list": "/tenants/?limit=1000",
+}
+
+
+def seed(db):
+    from app import models, utils
+
+    rng = random.Random(7)
+    for role_id, name in enumerate(("Admin", "Landlord", "Tenant"), start=1):
+        db.add(models.Role(id=role_id, name=name))
+    admin = models.User(username="admin", email="admin@example.com", hashed_password="x", role_id=1)
+    landlords = [models.User(username=f"landlord{n}", email=f"landlord{n}@example.com", hashed_password="x", role_id=2)
+                 for n in range(LANDLORDS)]
+    tenant_users = [models.User(username=f"tenant{n}", email=f"tenant{n}@example.com", hashed_password="x", role_id=3)
+                    for n in range(20)]
+    db.add_all([admin, *landlords, *tenant_users])
+    db.flush()
+    tenants = [models.Tenant(user_id=user.id, phone=f"555{n:04d}") for n, user in enumerate(tenant_users)]
+    db.add_all(tenants)
+    db.commit()
+
+    for landlord in landlords:
+        for n in range(3):
+            apartment = models.Apartment(name=f"{landlord.username}-{n}", address=f"{n} Main St",
+                                         rent_price=rng.randint(8, 20) * 100, landlord_id=landlord.id)
+            db.add(apartment)
+            db.flush()
+            for k in range(2):
+                begin = TODAY - timedelta(days=rng.randint(30, 900))
+                ended = begin + timedelta(days=rng.randint(60, 400))
+                rental = models.Rental(
+                    apartment_id=apartment.id, tenant_id=rng.choice(tenants).id, start_date=begin,
+                    end_date=ended, total_amount=apartment.rent_price,
+                    status=models.RentalStatus.ended if ended < TODAY else models.RentalStatus.active,
+                )
+                db.add(rental)
+                db.flush()
+                for month in range(rng.randint(1, 6)):
+                    db.add(models.Payment(
+                        rental_id=rental.id, payment_date=begin + timedelta(days=30 * month), amount=apartment.rent_price,
+                        payment_method=models.PaymentMethod.bank_transfer,
+                        status=rng.choice([models.PaymentStatus.completed, models.PaymentStatus.pending]),
+                    ))
+            db.add(models.MaintenanceRequest(apartment_id=apartment.id, tenant_id=rng.choice(tenants).id,
+                                             description="dripping tap", request_date=TODAY - timedelta(days=n)))
+        db.commit()
+    token = utils.create_access_token(data={"sub": admin.email, "user_id": admin.id})
+    return landlords[0].id, token
+
+
+def _normalized(body):
+    """created_at dropped: the two runs seed at different times."""
+    if isinstance(body, dict):
+        return {key: _normalized(value) for key, value in body.items() if key != "created_at"}
+    if isinstance(body, list):
+        return [_normalized(item) for item in body]
+    return body
+
+
+def run(directory: str, sharded: bool):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'main.db')}"
+    os.environ["SHARD_URLS"] = ",".join(
+        f"{name}=sqlite:///{os.path.join(directory, name + '.db')}" for name in SHARDS
+    ) if sharded else ""
+    os.environ.setdefault("JWT_SECRET_KEY", "check-sharding")
+    os.environ["RATE_LIMITS"] = ""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    from app import models
+    from app.archive import archive_rentals
+    from app.database import SessionLocal, get_shard_router
+    from app.main import app
+    from app.sharding import migrate_shards
+
+    migrate_shards()
+    db = SessionLocal()
+    try:
+        landlord_id, token = seed(db)
+        archive_rentals(db, cutoff=TODAY - timedelta(days=180))
+        # Core and ORM aggregates that fan out when sharded
+        answers = {
+            "count(payments)": db.scalar(select(func.count()).select_from(models.Payment)),
+            "sum(payments.amount)": float(db.scalar(select(func.sum(models.Payment.amount)))),
+            "min/max(rentals.id)": list(db.execute(select(func.min(models.Rental.id), func.max(models.Rental.id))).one()),
+            "query.count(rentals)": db.query(models.Rental).count(),
+            "count(rentals_archive)": db.scalar(select(func.count()).select_from(models.ArchivedRental)),
+        }
+        router = get_shard_router()
+        if router is not None:
+            from app.sharding import status
+            print("rows per shard: " + "; ".join(
+                f"{row['shard']} {row['landlords']} landlords, {row['payments']} payments" for row in status(router)
+            ), file=sys.stderr)
+    finally:
+        db.close()
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    # pages that start just before the end of the live rows and continue into the archive
+    live_rentals, live_payments = answers["query.count(rentals)"], answers["count(payments)"]
+    counts = dict(landlord_id=landlord_id, live_rentals=live_rentals, live_rentals_2=live_rentals - 2,
+                  live_payments_2=live_payments - 2)
+    for name, path in ROUTES.items():
+        response = client.get(path.format(**counts), headers=headers)
+        answers[name] = [response.status_code, _normalized(response.json())]
+    print(json.dumps(answers, sort_keys=True, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a sharded and a single SQLite database through the API")
+    parser.add_argument("--run", choices=("single", "sharded"), help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run(args.dir, args.run == "sharded")
+        return
+
+    results = {}
+    for mode in ("single", "sharded"):
+        directory = tempfile.mkdtemp()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", mode, "--dir", directory],
+                             cwd=BACKEND, capture_output=True, text=True)
+        if out.returncode:
+            print(out.stdout, out.stderr)
+            sys.exit(f"{mode} run failed")
+        print(*(line for line in out.stderr.splitlines() if line.startswith("rows per shard")))
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    failures = 0
+    for name, expected in results["single"].items():
+        got = results["sharded"].get(name)
+        if got == expected:
+            print(f"ok    {name}")
+        else:
+            failures += 1
+            print(f"FAIL  {name}\n      single:  {json.dumps(expected)[:300]}\n      sharded: {json.dumps(got)[:300]}")
+    print(f"\n{failures} of {len(results['single'])} answers differ" if failures else "\nSharded answers match")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# benchmarks/common.py - shared setup for the benchmark scripts
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def prepare_database(use_env_url: bool):
+    """Point the app at a throwaway SQLite file (unless asked to use DATABASE_URL) and migrate it."""
+    if not use_env_url:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND, "migrations"))
+    command.upgrade(config, "head")
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
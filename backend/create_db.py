@@ -1,16 +1,13 @@
 import os
 import sys
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-from app.database import Base
-from app.models import Role, RoleEnum
+from app.config import get_settings
+from app.models import Role
 
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in .env")
+DATABASE_URL = get_settings().require_database_url()
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
@@ -27,9 +24,10 @@ def test_connection():
         return False
 
 def create_tables():
-    """Create all tables"""
-    Base.metadata.create_all(bind=engine)
-    print("Tables created successfully")
+    """Bring the schema up to date by running the Alembic migrations"""
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    command.upgrade(config, "head")
+    print("Migrations applied successfully")
 
 def seed_roles():
     """Seed roles and return their IDs"""
@@ -40,9 +38,9 @@ def seed_roles():
         db.commit()
         
         # Create roles
-        admin_role = Role(name=RoleEnum.admin)
-        landlord_role = Role(name=RoleEnum.landlord)
-        tenant_role = Role(name=RoleEnum.tenant)
+        admin_role = Role(name="Admin")
+        landlord_role = Role(name="Landlord")
+        tenant_role = Role(name="Tenant")
         
         db.add_all([admin_role, landlord_role, tenant_role])
         db.commit()
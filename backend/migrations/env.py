@@ -0,0 +1,75 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+from app.config import get_settings
+from app.database import Base
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+if not config.get_main_option("sqlalchemy.url"):
+    # ConfigParser interpolation: escape % in passwords
+    config.set_main_option("sqlalchemy.url", get_settings().require_database_url().replace("%", "%%"))
+
+target_metadata = Base.metadata
+
+# Indexes that only exist in migrations (expression / operator-class indexes autogenerate can't compare)
+MIGRATION_ONLY_INDEX_SUFFIXES = ("_prefix", "_trgm", "_tsv")
+# Full-text objects of 0009 that are not mapped: the Postgres generated column and
+# the SQLite FTS5 table (with its shadow tables)
+MIGRATION_ONLY_COLUMNS = {("maintenance_requests", "description_tsv")}
+MIGRATION_ONLY_TABLE_PREFIXES = ("maintenance_requests_fts",)
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == "index" and name.endswith(MIGRATION_ONLY_INDEX_SUFFIXES):
+        return False
+    if type_ == "table" and name.startswith(MIGRATION_ONLY_TABLE_PREFIXES):
+        return False
+    if type_ == "column" and (obj.table.name, name) in MIGRATION_ONLY_COLUMNS:
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can only ALTER by recreating the table
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,193 @@
+"""Baseline: the schema previously created by Base.metadata.create_all()
+
+Databases created before migrations existed should be marked with
+`alembic stamp 0001_baseline` instead of running this revision.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ENUMS = {
+    "apartment_status": ("available", "rented", "maintenance"),
+    "rental_status": ("active", "ended", "cancelled"),
+    "payment_status": ("pending", "completed", "failed"),
+    "payment_method": ("cash", "credit_card", "bank_transfer"),
+    "maintenance_status": ("pending", "in_progress", "completed"),
+}
+
+
+def enum(name: str) -> sa.Enum:
+    # Postgres types are created once up front; tables must not try to create them again
+    return sa.Enum(*ENUMS[name], name=name).with_variant(
+        postgresql.ENUM(*ENUMS[name], name=name, create_type=False), "postgresql"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name, values in ENUMS.items():
+            postgresql.ENUM(*values, name=name).create(bind, checkfirst=True)
+
+    op.create_table(
+        "roles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index("ix_roles_id", "roles", ["id"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("role_id", sa.Integer(), sa.ForeignKey("roles.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "apartments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("address", sa.Text()),
+        sa.Column("rent_price", sa.DECIMAL(10, 2)),
+        sa.Column("description", sa.Text()),
+        sa.Column("status", enum("apartment_status")),
+        sa.Column("landlord_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_apartments_id", "apartments", ["id"])
+
+    op.create_table(
+        "tenants",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("phone", sa.String(length=20)),
+        sa.Column("address", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tenants_id", "tenants", ["id"])
+
+    op.create_table(
+        "rentals",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("apartment_id", sa.Integer(), sa.ForeignKey("apartments.id"), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("start_date", sa.Date()),
+        sa.Column("end_date", sa.Date()),
+        sa.Column("status", enum("rental_status")),
+        sa.Column("total_amount", sa.DECIMAL(10, 2)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_rentals_id", "rentals", ["id"])
+
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("rental_id", sa.Integer(), sa.ForeignKey("rentals.id"), nullable=False),
+        sa.Column("payment_date", sa.Date(), nullable=False),
+        sa.Column("amount", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("payment_method", enum("payment_method"), nullable=False),
+        sa.Column("status", enum("payment_status"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_payments_id", "payments", ["id"])
+
+    op.create_table(
+        "rentals_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("apartment_id", sa.Integer(), sa.ForeignKey("apartments.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("start_date", sa.Date()),
+        sa.Column("end_date", sa.Date()),
+        sa.Column("status", enum("rental_status")),
+        sa.Column("total_amount", sa.DECIMAL(10, 2)),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_rentals_archive_apartment_id", "rentals_archive", ["apartment_id"])
+    op.create_index("ix_rentals_archive_tenant_id", "rentals_archive", ["tenant_id"])
+
+    op.create_table(
+        "payments_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("rental_id", sa.Integer(), sa.ForeignKey("rentals_archive.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("payment_date", sa.Date(), nullable=False),
+        sa.Column("amount", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("payment_method", enum("payment_method"), nullable=False),
+        sa.Column("status", enum("payment_status"), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_payments_archive_rental_id", "payments_archive", ["rental_id"])
+
+    op.create_table(
+        "maintenance_requests",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("apartment_id", sa.Integer(), sa.ForeignKey("apartments.id"), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("request_date", sa.Date(), nullable=False),
+        sa.Column("status", enum("maintenance_status")),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_maintenance_requests_id", "maintenance_requests", ["id"])
+
+    op.create_table(
+        "change_events",
+        sa.Column("seq", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("entity", sa.String(length=50), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column("changed", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("seq"),
+    )
+    op.create_index("ix_change_events_created_at", "change_events", ["created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        "change_events",
+        "maintenance_requests",
+        "payments_archive",
+        "rentals_archive",
+        "payments",
+        "rentals",
+        "tenants",
+        "apartments",
+        "users",
+        "roles",
+    ):
+        op.drop_table(table)
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name, values in ENUMS.items():
+            postgresql.ENUM(*values, name=name).drop(bind, checkfirst=True)
@@ -0,0 +1,45 @@
+"""Index the foreign keys every join and cascade walks
+
+Revision ID: 0002_foreign_key_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_foreign_key_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("users", "role_id"),
+    ("apartments", "landlord_id"),
+    ("tenants", "user_id"),
+    ("rentals", "apartment_id"),
+    ("rentals", "tenant_id"),
+    ("payments", "rental_id"),
+    ("maintenance_requests", "apartment_id"),
+    ("maintenance_requests", "tenant_id"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # build without blocking writes on tables that already hold data
+        with op.get_context().autocommit_block():
+            for table, column in INDEXES:
+                op.create_index(f"ix_{table}_{column}", table, [column], postgresql_concurrently=True)
+    else:
+        for table, column in INDEXES:
+            op.create_index(f"ix_{table}_{column}", table, [column])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in reversed(INDEXES):
+        op.drop_index(f"ix_{table}_{column}", table_name=table)
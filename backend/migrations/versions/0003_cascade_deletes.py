@@ -0,0 +1,65 @@
+"""Let the database cascade deletes of apartments, tenants and rentals
+
+Revision ID: 0003_cascade_deletes
+Revises: 0002_foreign_key_indexes
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_cascade_deletes"
+down_revision: Union[str, Sequence[str], None] = "0002_foreign_key_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referenced table); constraint names follow Postgres' default "<table>_<column>_fkey"
+FOREIGN_KEYS = [
+    ("rentals", "apartment_id", "apartments"),
+    ("rentals", "tenant_id", "tenants"),
+    ("payments", "rental_id", "rentals"),
+    ("maintenance_requests", "apartment_id", "apartments"),
+    ("maintenance_requests", "tenant_id", "tenants"),
+]
+
+# SQLite foreign keys are unnamed; batch mode names the reflected ones with this convention
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def _replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        clause = f" ON DELETE {ondelete}" if ondelete else ""
+        for table, column, referred in FOREIGN_KEYS:
+            name = f"{table}_{column}_fkey"
+            op.execute(
+                f"ALTER TABLE {table} DROP CONSTRAINT {name}, "
+                f"ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {referred} (id){clause} NOT VALID"
+            )
+        # Existing rows are checked after the swap has committed: VALIDATE only takes
+        # SHARE UPDATE EXCLUSIVE, but in the swap's transaction the exclusive lock
+        # from DROP CONSTRAINT would be held until the last table was validated
+        with op.get_context().autocommit_block():
+            for table, column, _ in FOREIGN_KEYS:
+                op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey")
+        return
+
+    for table in dict.fromkeys(t for t, _, _ in FOREIGN_KEYS):
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = f"{table}_{column}_fkey"
+                batch.drop_constraint(name, type_="foreignkey")
+                batch.create_foreign_key(name, referred, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_keys(None)
@@ -0,0 +1,57 @@
+"""Prefix and trigram indexes for /users/search and /tenants/search
+
+These are expression/operator-class indexes that autogenerate cannot
+compare; env.py leaves names ending in _prefix or _trgm alone.
+
+Revision ID: 0004_search_indexes
+Revises: 0003_cascade_deletes
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_search_indexes"
+down_revision: Union[str, Sequence[str], None] = "0003_cascade_deletes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column) searched as lower(column) LIKE 'q%'
+SEARCHED = [
+    ("users", "username"),
+    ("users", "email"),
+    ("tenants", "phone"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        for table, column in SEARCHED:
+            op.execute(f"CREATE INDEX ix_{table}_{column}_prefix ON {table} (lower({column}))")
+        return
+
+    # text_pattern_ops makes LIKE 'q%' an index range scan whatever the database collation;
+    # the trigram indexes serve the substring fallback
+    with op.get_context().autocommit_block():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, column in SEARCHED:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_prefix "
+                f"ON {table} (lower({column}) text_pattern_ops)"
+            )
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin (lower({column}) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    for table, column in reversed(SEARCHED):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_prefix")
+        if postgresql:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_trgm")
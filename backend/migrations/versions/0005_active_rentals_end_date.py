@@ -0,0 +1,36 @@
+"""Partial index on active rentals by end_date for the lease sweeper
+
+Revision ID: 0005_active_rentals_end_date
+Revises: 0004_search_indexes
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_active_rentals_end_date"
+down_revision: Union[str, Sequence[str], None] = "0004_search_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.text("status = 'active'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_rentals_active_end_date", "rentals", ["end_date"],
+                postgresql_where=ACTIVE, postgresql_concurrently=True,
+            )
+    else:
+        op.create_index("ix_rentals_active_end_date", "rentals", ["end_date"], sqlite_where=ACTIVE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_rentals_active_end_date", table_name="rentals")
@@ -0,0 +1,73 @@
+"""Maintenance status history and SLA rollup buckets
+
+Existing requests get no history rows: their first transition is measured
+from request_date (see app/sla.py).
+
+Revision ID: 0006_maintenance_sla
+Revises: 0005_active_rentals_end_date
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_maintenance_sla"
+down_revision: Union[str, Sequence[str], None] = "0005_active_rentals_end_date"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MAINTENANCE_STATUS = ("pending", "in_progress", "completed")
+
+
+def maintenance_status() -> sa.Enum:
+    # the Postgres type already exists (0001_baseline)
+    return sa.Enum(*MAINTENANCE_STATUS, name="maintenance_status").with_variant(
+        postgresql.ENUM(*MAINTENANCE_STATUS, name="maintenance_status", create_type=False), "postgresql"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "maintenance_status_changes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "request_id", sa.Integer(),
+            sa.ForeignKey("maintenance_requests.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("from_status", maintenance_status()),
+        sa.Column("to_status", maintenance_status(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_maintenance_status_changes_id", "maintenance_status_changes", ["id"])
+    op.create_index("ix_maintenance_status_changes_request_id", "maintenance_status_changes", ["request_id"])
+
+    op.create_table(
+        "maintenance_sla_buckets",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("landlord_id", sa.Integer(), nullable=False),
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.String(7), nullable=False),
+        sa.Column("metric", sa.String(10), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "landlord_id", "apartment_id", "month", "metric", "bucket", name="uq_maintenance_sla_buckets_cell"
+        ),
+    )
+    op.create_index("ix_maintenance_sla_buckets_landlord_id", "maintenance_sla_buckets", ["landlord_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_maintenance_sla_buckets_landlord_id", table_name="maintenance_sla_buckets")
+    op.drop_table("maintenance_sla_buckets")
+    op.drop_index("ix_maintenance_status_changes_request_id", table_name="maintenance_status_changes")
+    op.drop_index("ix_maintenance_status_changes_id", table_name="maintenance_status_changes")
+    op.drop_table("maintenance_status_changes")
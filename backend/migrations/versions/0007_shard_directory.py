@@ -0,0 +1,40 @@
+"""Landlord shard directory and cross-shard id counters
+
+Revision ID: 0007_shard_directory
+Revises: 0006_maintenance_sla
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_shard_directory"
+down_revision: Union[str, Sequence[str], None] = "0006_maintenance_sla"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "landlord_shards",
+        sa.Column("landlord_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.String(50), nullable=False),
+        sa.Column("moved_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("landlord_id"),
+    )
+    op.create_table(
+        "id_blocks",
+        sa.Column("table_name", sa.String(64), nullable=False),
+        sa.Column("next_id", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("table_name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("id_blocks")
+    op.drop_table("landlord_shards")
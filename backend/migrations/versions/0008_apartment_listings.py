@@ -0,0 +1,109 @@
+"""Apartment listing read model
+
+The table is filled from the existing apartments, so GET /apartments/ keeps
+answering right after the upgrade; app/listings.py keeps it current from then on.
+
+Revision ID: 0008_apartment_listings
+Revises: 0007_shard_directory
+Create Date: 2026-10-19 00:00:00
+
+"""
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Union
+
+from alembic import op
+from pydantic import BaseModel
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_apartment_listings"
+down_revision: Union[str, Sequence[str], None] = "0007_shard_directory"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+# the tables as of this revision
+apartments = sa.table(
+    "apartments",
+    sa.column("id", sa.Integer), sa.column("name", sa.String), sa.column("address", sa.String),
+    sa.column("rent_price", sa.Numeric), sa.column("description", sa.Text), sa.column("status", sa.String),
+    sa.column("landlord_id", sa.Integer), sa.column("created_at", sa.DateTime),
+)
+rentals = sa.table("rentals", sa.column("apartment_id", sa.Integer), sa.column("status", sa.String))
+users = sa.table("users", sa.column("id", sa.Integer), sa.column("username", sa.String))
+listings = sa.table(
+    "apartment_listings",
+    sa.column("apartment_id", sa.Integer), sa.column("landlord_id", sa.Integer), sa.column("status", sa.String),
+    sa.column("rent_price", sa.Numeric), sa.column("occupied", sa.Boolean), sa.column("document", sa.Text),
+)
+
+
+class Landlord(BaseModel):
+    id: int
+    username: str
+
+
+class Document(BaseModel):
+    """schemas.ApartmentResponse as of this revision; 0010 and 0013 append the fields added since."""
+    name: str
+    address: str
+    rent_price: float
+    description: Optional[str] = None
+    status: str
+    id: int
+    landlord_id: int
+    landlord: Optional[Landlord]
+    created_at: Optional[datetime]
+
+
+def _fill_listings(conn) -> None:
+    occupied = sa.exists().where(rentals.c.apartment_id == apartments.c.id, rentals.c.status == "active")
+    rows = conn.execute(
+        sa.select(apartments, users.c.username, occupied.label("occupied"))
+        .outerjoin(users, users.c.id == apartments.c.landlord_id)
+        .order_by(apartments.c.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for chunk in rows.partitions(BATCH_SIZE):
+        batch = []
+        for row in chunk:
+            landlord = {"id": row.landlord_id, "username": row.username} if row.username is not None else None
+            document = Document.model_validate({**row._mapping, "landlord": landlord}).model_dump(mode="json")
+            batch.append({
+                "apartment_id": row.id,
+                "landlord_id": row.landlord_id,
+                "status": row.status,
+                "rent_price": row.rent_price,
+                "occupied": bool(row.occupied),
+                # same encoding as FastAPI's JSONResponse (and app/listings.py)
+                "document": json.dumps(document, ensure_ascii=False, separators=(",", ":")),
+            })
+        conn.execute(listings.insert(), batch)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "apartment_listings",
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("landlord_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(20)),
+        sa.Column("rent_price", sa.DECIMAL(10, 2)),
+        sa.Column("occupied", sa.Boolean(), nullable=False),
+        sa.Column("document", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("apartment_id"),
+    )
+    op.create_index("ix_apartment_listings_landlord_id", "apartment_listings", ["landlord_id"])
+    op.create_index("ix_apartment_listings_status_rent_price", "apartment_listings", ["status", "rent_price"])
+    _fill_listings(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_apartment_listings_status_rent_price", table_name="apartment_listings")
+    op.drop_index("ix_apartment_listings_landlord_id", table_name="apartment_listings")
+    op.drop_table("apartment_listings")
@@ -0,0 +1,74 @@
+"""Full-text index over maintenance request descriptions
+
+Postgres: a stored tsvector generated column with a GIN index. Adding the
+column rewrites maintenance_requests once; the index is built CONCURRENTLY.
+SQLite: an external-content FTS5 table kept in sync by triggers. SQLite batch
+migrations that recreate maintenance_requests drop those triggers; such a
+migration must create them again (copy them from here).
+
+Neither is mapped on the model (see env.py MIGRATION_ONLY_*); app/fulltext.py
+queries them directly.
+
+Revision ID: 0009_maintenance_fulltext
+Revises: 0008_apartment_listings
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_maintenance_fulltext"
+down_revision: Union[str, Sequence[str], None] = "0008_apartment_listings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER maintenance_requests_fts_insert AFTER INSERT ON maintenance_requests BEGIN
+        INSERT INTO maintenance_requests_fts (rowid, description) VALUES (new.id, new.description);
+    END""",
+    """CREATE TRIGGER maintenance_requests_fts_delete AFTER DELETE ON maintenance_requests BEGIN
+        INSERT INTO maintenance_requests_fts (maintenance_requests_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END""",
+    """CREATE TRIGGER maintenance_requests_fts_update AFTER UPDATE OF description ON maintenance_requests BEGIN
+        INSERT INTO maintenance_requests_fts (maintenance_requests_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO maintenance_requests_fts (rowid, description) VALUES (new.id, new.description);
+    END""",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        op.execute(
+            "CREATE VIRTUAL TABLE maintenance_requests_fts USING fts5("
+            "description, content='maintenance_requests', content_rowid='id', tokenize='porter unicode61')"
+        )
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(trigger)
+        op.execute("INSERT INTO maintenance_requests_fts (maintenance_requests_fts) VALUES ('rebuild')")
+        return
+
+    op.execute(
+        "ALTER TABLE maintenance_requests ADD COLUMN description_tsv tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_maintenance_requests_description_tsv "
+            "ON maintenance_requests USING gin (description_tsv)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        for name in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS maintenance_requests_fts_{name}")
+        op.execute("DROP TABLE IF EXISTS maintenance_requests_fts")
+        return
+    op.execute("DROP INDEX IF EXISTS ix_maintenance_requests_description_tsv")
+    op.execute("ALTER TABLE maintenance_requests DROP COLUMN IF EXISTS description_tsv")
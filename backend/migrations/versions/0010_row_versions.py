@@ -0,0 +1,44 @@
+"""Row version counters for optimistic concurrency
+
+Adds `version` (starting at 1) to every table with an update endpoint. The
+ORM maps it as version_id_col, so each UPDATE compares and bumps it. Both
+ADD COLUMN forms are metadata-only on Postgres 11+ and SQLite, so no table is
+rewritten. Stored apartment listings get "version": 1 appended to match.
+
+Revision ID: 0010_row_versions
+Revises: 0009_maintenance_fulltext
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0010_row_versions"
+down_revision: Union[str, Sequence[str], None] = "0009_maintenance_fulltext"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("users", "apartments", "tenants", "rentals", "payments", "maintenance_requests")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")))
+    # documents are ApartmentResponse JSON, whose last field is now version
+    op.execute(sa.text(
+        "UPDATE apartment_listings SET document = "
+        "substr(document, 1, length(document) - 1) || ',\"version\"\\:1}'"  # \: is a literal colon, not a bind
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # plain ALTER TABLE ... DROP COLUMN (SQLite 3.35+): a batch copy of
+    # maintenance_requests would drop the full-text triggers from 0009
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} DROP COLUMN version")
+    # listings keep a stale "version" key until `python -m app.listings --rebuild`
@@ -0,0 +1,49 @@
+"""Apartment coordinates and the listing geocell index
+
+Adds latitude/longitude to apartments (filled by `python -m app.geocode`) and,
+copied from them, to apartment_listings together with the Z-order geocell
+that app/geo.py searches through a plain btree index. Every ADD COLUMN is
+nullable without a default, so no table is rewritten. Stored listing
+documents get "latitude": null, "longitude": null appended to match
+ApartmentResponse.
+
+Revision ID: 0013_apartment_locations
+Revises: 0012_jobs
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0013_apartment_locations"
+down_revision: Union[str, Sequence[str], None] = "0012_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("apartments", "apartment_listings"):
+        op.add_column(table, sa.Column("latitude", sa.Float(), nullable=True))
+        op.add_column(table, sa.Column("longitude", sa.Float(), nullable=True))
+    op.add_column("apartment_listings", sa.Column("geocell", sa.BigInteger(), nullable=True))
+    op.create_index("ix_apartment_listings_geocell", "apartment_listings", ["geocell"], unique=False)
+    # documents are ApartmentResponse JSON, whose last fields are now latitude and longitude
+    op.execute(sa.text(
+        "UPDATE apartment_listings SET document = "
+        "substr(document, 1, length(document) - 1) || ',\"latitude\"\\:null,\"longitude\"\\:null}'"
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_apartment_listings_geocell", table_name="apartment_listings")
+    # plain ALTER TABLE ... DROP COLUMN (SQLite 3.35+), as in 0010
+    for column in ("geocell", "longitude", "latitude"):
+        op.execute(f"ALTER TABLE apartment_listings DROP COLUMN {column}")
+    for column in ("longitude", "latitude"):
+        op.execute(f"ALTER TABLE apartments DROP COLUMN {column}")
+    # listings keep stale "latitude"/"longitude" keys until `python -m app.listings --rebuild`
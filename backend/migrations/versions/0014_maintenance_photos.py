@@ -0,0 +1,48 @@
+"""Photos attached to maintenance requests
+
+Revision ID: 0014_maintenance_photos
+Revises: 0013_apartment_locations
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0014_maintenance_photos"
+down_revision: Union[str, Sequence[str], None] = "0013_apartment_locations"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "maintenance_photos",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("request_id", sa.Integer(), nullable=False),
+        sa.Column("sha256", sa.String(64), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("content_type", sa.String(50), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=False),
+        sa.Column("height", sa.Integer(), nullable=False),
+        sa.Column("uploaded_by", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["request_id"], ["maintenance_requests.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["uploaded_by"], ["users.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_maintenance_photos_id", "maintenance_photos", ["id"])
+    op.create_index("ix_maintenance_photos_request_id", "maintenance_photos", ["request_id"])
+    op.create_index("ix_maintenance_photos_sha256", "maintenance_photos", ["sha256"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_maintenance_photos_sha256", table_name="maintenance_photos")
+    op.drop_index("ix_maintenance_photos_request_id", table_name="maintenance_photos")
+    op.drop_index("ix_maintenance_photos_id", table_name="maintenance_photos")
+    op.drop_table("maintenance_photos")
@@ -0,0 +1,55 @@
+"""C-collated prefix indexes for /users/search and /tenants/search
+
+The text_pattern_ops indexes of 0004 serve LIKE 'q%' but not the search's
+ORDER BY: their operators (~<~) are not the collation's, so under a non-C
+database collation every prefix match was fetched and sorted. An index on
+lower(column) COLLATE "C" serves both the prefix range and the order. Postgres
+only; SQLite compares bytes already.
+
+Revision ID: 0015_search_prefix_collation
+Revises: 0014_maintenance_photos
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0015_search_prefix_collation"
+down_revision: Union[str, Sequence[str], None] = "0014_maintenance_photos"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCHED = [
+    ("users", "username"),
+    ("users", "email"),
+    ("tenants", "phone"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # the new index is built before the old one goes, so searches never lose theirs
+    with op.get_context().autocommit_block():
+        for table, column in SEARCHED:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_collate_c_prefix "
+                f'ON {table} ((lower({column}) COLLATE "C"))'
+            )
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_prefix")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for table, column in reversed(SEARCHED):
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_prefix "
+                f"ON {table} (lower({column}) text_pattern_ops)"
+            )
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_collate_c_prefix")
@@ -0,0 +1,51 @@
+"""Never reuse the ids of archived rentals and payments on SQLite
+
+Archiving (app/archive.py) moves rows to rentals_archive / payments_archive
+keeping their ids. A plain INTEGER PRIMARY KEY on SQLite hands out max(id) + 1,
+so once the highest live row had been archived the next rental took its id:
+two rentals answered to it, and archiving the new one failed on the archive's
+primary key. AUTOINCREMENT only ever goes up. The tables are rebuilt with it
+and their counters start past the archived ids as well. Postgres sequences
+never go back; nothing to do there.
+
+Revision ID: 0016_never_reuse_archived_ids
+Revises: 0015_search_prefix_collation
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0016_never_reuse_archived_ids"
+down_revision: Union[str, Sequence[str], None] = "0015_search_prefix_collation"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# live table -> its archive
+ARCHIVED = {"rentals": "rentals_archive", "payments": "payments_archive"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table, archive in ARCHIVED.items():
+        with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+            pass
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', coalesce(max(id), 0) "
+            f"FROM (SELECT max(id) AS id FROM {table} UNION ALL SELECT max(id) FROM {archive})"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in reversed(list(ARCHIVED)):
+        # the reflected table has no AUTOINCREMENT; rebuilding from it drops the keyword
+        with op.batch_alter_table(table, recreate="always"):
+            pass
@@ -0,0 +1,41 @@
+"""Maintenance requests by (request_date, id) for full-text search candidates
+
+On Postgres, /maintenance/search ranks the most recent matches first
+(app/fulltext.py). With this index a common term is answered by walking it
+backwards and checking each row against the query until enough match, rather
+than sorting every match. Built concurrently on Postgres.
+
+Revision ID: 0017_maintenance_request_date_index
+Revises: 0016_never_reuse_archived_ids
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0017_maintenance_request_date_index"
+down_revision: Union[str, Sequence[str], None] = "0016_never_reuse_archived_ids"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "ix_maintenance_requests_request_date_id"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX, "maintenance_requests", ["request_date", "id"], postgresql_concurrently=True)
+        return
+    op.create_index(INDEX, "maintenance_requests", ["request_date", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(INDEX, table_name="maintenance_requests", postgresql_concurrently=True)
+        return
+    op.drop_index(INDEX, table_name="maintenance_requests")